@@ -65,6 +65,7 @@ class Artifact:
         self._metadata_workspaced = None  # Boolean of whether it's a workspaced artifact
         self._metadata_workspaced_dependencies = None  # List of which dependencies are workspaced from the artifact
         self._cached = None  # Boolean of whether the artifact is cached
+        self._split_index = None  # Split domain index loaded from the artifact
 
     # get_files():
     #
@@ -77,6 +78,47 @@ class Artifact:
         files_digest = self._get_field_digest("files")
         return CasBasedDirectory(self._cas, digest=files_digest)
 
+    # get_split_index():
+    #
+    # Get the split domain membership of the artifact files, as
+    # precomputed when the artifact was created.
+    #
+    # Returns:
+    #    (dict): The position of each path of the files in the split domain bitmaps
+    #    (dict): The range of positions of the subtree of each non-empty directory
+    #    (dict): The bitmap of the paths belonging to each split domain, as an int
+    #
+    #    Or None, if the artifact has no split domain index
+    #
+    def get_split_index(self):
+        if self._split_index is None:
+            artifact = self._get_proto()
+            if not artifact.split_domains:
+                return None
+
+            positions = {}
+            subtrees = {}
+
+            # A directory is listed right before the paths below it
+            parents = []
+            for position, path in enumerate(self.get_files().list_relative_paths()):
+                while parents and not path.startswith(parents[-1][0]):
+                    prefix, start = parents.pop()
+                    if position - start > 1:
+                        subtrees[prefix[:-1]] = (start, position)
+
+                positions[path] = position
+                parents.append((path + os.sep, position))
+
+            for prefix, start in parents:
+                if len(positions) - start > 1:
+                    subtrees[prefix[:-1]] = (start, len(positions))
+
+            bitmaps = {domain.name: int.from_bytes(domain.paths, "little") for domain in artifact.split_domains}
+            self._split_index = (positions, subtrees, bitmaps)
+
+        return self._split_index
+
     # get_buildtree():
     #
     # Get a virtual directory for the artifact buildtree content
@@ -137,11 +179,12 @@ class Artifact:
     #    sourcesvdir (Directory): Virtual Directoy object for the staged sources
     #    buildresult (tuple): bool, short desc and detailed desc of result
     #    publicdata (dict): dict of public data to commit to artifact metadata
+    #    splits (dict): The compiled regular expression of each split domain
     #
     # Returns:
     #    (int): The size of the newly cached artifact
     #
-    def cache(self, sandbox_build_dir, collectvdir, sourcesvdir, buildresult, publicdata):
+    def cache(self, sandbox_build_dir, collectvdir, sourcesvdir, buildresult, publicdata, splits=None):
 
         context = self._context
         element = self._element
@@ -173,6 +216,10 @@ class Artifact:
             artifact.files.CopyFrom(filesvdir._get_digest())
             size += filesvdir.get_size()
 
+            # Store split domain index
+            if splits:
+                self._index_splits(artifact, filesvdir, splits)
+
         # Store public data
         with utils._tempnamedfile_name(dir=self._tmpdir) as tmpname:
             _yaml.roundtrip_dump(publicdata, tmpname)
@@ -216,6 +263,8 @@ class Artifact:
             with utils.save_file_atomic(path, mode="wb") as f:
                 f.write(artifact.SerializeToString())
 
+        self._forget_proto()
+
         return size
 
     # cached_buildtree()
@@ -401,30 +450,19 @@ class Artifact:
         if self._cached is not None:
             return self._cached
 
-        context = self._context
-
         artifact = self._load_proto()
         if not artifact:
             self._cached = False
             return False
 
-        # Determine whether directories are required
-        require_directories = context.require_artifact_directories
-        # Determine whether file contents are required as well
-        require_files = context.require_artifact_files or self._element._artifact_files_required()
+        files_digest, with_files, digests = self._get_required_digests(artifact)
 
         # Check whether 'files' subdirectory is available, with or without file contents
-        if (
-            require_directories
-            and str(artifact.files)
-            and not self._cas.contains_directory(artifact.files, with_files=require_files)
-        ):
+        if files_digest and not self._cas.contains_directory(files_digest, with_files=with_files):
             self._cached = False
             return False
 
         # Check whether public data and logs are available
-        logfile_digests = [logfile.digest for logfile in artifact.logs]
-        digests = [artifact.public_data] + logfile_digests
         if not self._cas.contains_files(digests):
             self._cached = False
             return False
@@ -452,8 +490,10 @@ class Artifact:
     # is cached or not.
     #
     def reset_cached(self):
+        self._forget_proto()
         self._proto = None
         self._cached = None
+        self._split_index = None
 
     # set_cached()
     #
@@ -461,9 +501,11 @@ class Artifact:
     # This is used as optimization when we know the artifact is available.
     #
     def set_cached(self):
+        self._forget_proto()
         self._proto = self._load_proto()
         assert self._proto
         self._cached = True
+        self._split_index = None
 
     # pull()
     #
@@ -499,17 +541,85 @@ class Artifact:
     def _load_proto(self):
         key = self.get_extract_key()
 
-        proto_path = os.path.join(self._artifactdir, self._element.get_artifact_name(key=key))
-        artifact = ArtifactProto()
-        try:
-            with open(proto_path, mode="r+b") as f:
-                artifact.ParseFromString(f.read())
-        except FileNotFoundError:
-            return None
+        return self._context.artifactcache.load_proto(self._element.get_artifact_name(key=key))
+
+    # _forget_proto()
+    #
+    # Forget the protos loaded for this artifact, as the artifact
+    # may have been replaced in the local cache.
+    #
+    def _forget_proto(self):
+        artifacts = self._context.artifactcache
+        for key in (self._cache_key, self._weak_cache_key):
+            if key:
+                artifacts.forget_proto(self._element.get_artifact_name(key=key))
+
+    # _get_required_digests()
+    #
+    # Determine which parts of the artifact need to be available
+    # for the artifact to be considered cached.
+    #
+    # Args:
+    #     artifact (Artifact): The loaded artifact proto
+    #
+    # Returns:
+    #     (Digest): The digest of the 'files' directory to check, or None
+    #     (bool): Whether the file contents of the 'files' directory are required
+    #     (list): The digests of the public data and log files
+    #
+    def _get_required_digests(self, artifact):
+        context = self._context
+
+        # Determine whether directories are required
+        require_directories = context.require_artifact_directories
+        # Determine whether file contents are required as well
+        require_files = context.require_artifact_files or self._element._artifact_files_required()
 
-        os.utime(proto_path)
+        files_digest = None
+        if require_directories and str(artifact.files):
+            files_digest = artifact.files
 
-        return artifact
+        logfile_digests = [logfile.digest for logfile in artifact.logs]
+        digests = [artifact.public_data] + logfile_digests
+
+        return files_digest, require_files, digests
+
+    # _index_splits()
+    #
+    # Record the split domain membership of the files in the artifact
+    # proto, as one bitmap per split domain over the paths listed by
+    # Directory.list_relative_paths().
+    #
+    # Args:
+    #     artifact (Artifact): The artifact proto to record the index in
+    #     filesvdir (Directory): The artifact files
+    #     splits (dict): The compiled regular expression of each split domain
+    #
+    def _index_splits(self, artifact, filesvdir, splits):
+        paths = list(filesvdir.list_relative_paths())
+        for name, regex in splits.items():
+            bitmap = bytearray((len(paths) + 7) // 8)
+            for position, path in enumerate(paths):
+                # Absolute path is required for matching
+                if regex.match(os.path.join(os.sep, path)):
+                    bitmap[position >> 3] |= 1 << (position & 7)
+
+            domain = artifact.split_domains.add()
+            domain.name = name
+            domain.paths = bytes(bitmap)
+
+    # _set_cached_state()
+    #
+    # Set the cached state as resolved by ArtifactCache.query_cached()
+    #
+    # Args:
+    #     artifact (Artifact): The loaded artifact proto, or None
+    #     cached (bool): Whether the artifact is cached
+    #
+    def _set_cached_state(self, artifact, cached):
+        self._proto = artifact if cached else None
+        self._cached = cached
+        self._split_index = None
 
     # _get_proto()
     #
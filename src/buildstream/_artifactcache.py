@@ -19,6 +19,7 @@
 #        Tristan Maat <tristan.maat@codethink.co.uk>
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 import grpc
 
 from ._assetcache import AssetCache
@@ -30,6 +31,9 @@ from . import utils
 
 REMOTE_ASSET_ARTIFACT_URN_TEMPLATE = "urn:fdc:buildstream.build:2020:artifact:{}"
 
+# The maximum number of concurrent queries when querying remotes in bulk
+_MAX_REMOTE_QUERIES = 32
+
 
 # An ArtifactCache manages artifacts.
 #
@@ -48,6 +52,16 @@ class ArtifactCache(AssetCache):
         self._basedir = context.artifactdir
         os.makedirs(self._basedir, exist_ok=True)
 
+        # Whether artifacts are available in the index remotes, by artifact name,
+        # as queried in this session
+        self._remote_refs = {}
+
+        # Artifact protos loaded in this session, by artifact name
+        self._protos = {}
+
+        # Artifact names whose mtime is updated at the end of the session
+        self._pending_mtimes = set()
+
     def update_mtime(self, ref):
         try:
             os.utime(os.path.join(self._basedir, ref))
@@ -61,6 +75,62 @@ class ArtifactCache(AssetCache):
     def preflight(self):
         self.cas.preflight()
 
+    # release_resources():
+    #
+    # Release resources used by the ArtifactCache, this updates the
+    # mtimes of the artifacts which were loaded in this session.
+    #
+    def release_resources(self):
+        for ref in self._pending_mtimes:
+            try:
+                os.utime(os.path.join(self._basedir, ref))
+            except FileNotFoundError:
+                pass
+        self._pending_mtimes.clear()
+
+        super().release_resources()
+
+    # load_proto():
+    #
+    # Load the proto of an artifact in the local cache.
+    #
+    # Protos are only read once per session, the returned proto must
+    # not be modified. Marks the artifact as used in this session.
+    #
+    # Args:
+    #     ref (str): The artifact name
+    #
+    # Returns:
+    #     (Artifact): The artifact proto, or None if the artifact is not cached
+    #
+    def load_proto(self, ref):
+        artifact = self._protos.get(ref)
+        if artifact is None:
+            artifact = artifact_pb2.Artifact()
+            try:
+                with open(os.path.join(self._basedir, ref), mode="r+b") as f:
+                    artifact.ParseFromString(f.read())
+            except FileNotFoundError:
+                return None
+
+            self._protos[ref] = artifact
+
+        self._pending_mtimes.add(ref)
+
+        return artifact
+
+    # forget_proto():
+    #
+    # Forget the proto loaded for an artifact, such that it is read
+    # again from the local cache the next time it is loaded. This must
+    # be called when an artifact may have been replaced.
+    #
+    # Args:
+    #     ref (str): The artifact name
+    #
+    def forget_proto(self, ref):
+        self._protos.pop(ref, None)
+
     # contains():
     #
     # Check whether the artifact for the specified Element is already available
@@ -77,6 +147,47 @@ class ArtifactCache(AssetCache):
 
         return os.path.exists(os.path.join(self._basedir, ref))
 
+    # query_cached():
+    #
+    # Resolve the cached state of many artifacts at once.
+    #
+    # This is equivalent to calling Artifact.cached() on each of the
+    # artifacts, but the local cache is queried with a few large
+    # requests instead of a couple of requests per artifact.
+    #
+    # Args:
+    #     artifacts ([Artifact]): The artifacts to query
+    #
+    def query_cached(self, artifacts):
+        queries = []
+        directories = {}
+        blobs = []
+        for artifact in artifacts:
+            proto = artifact._load_proto()
+            if not proto:
+                artifact._set_cached_state(None, False)
+                continue
+
+            files_digest, with_files, digests = artifact._get_required_digests(proto)
+            if files_digest:
+                directories.setdefault(with_files, []).append(files_digest)
+            blobs.extend(digests)
+
+            queries.append((artifact, proto, files_digest, with_files, digests))
+
+        missing_directories = set()
+        for with_files, digests in directories.items():
+            for digest in self.cas.missing_directories(digests, with_files=with_files):
+                missing_directories.add((digest.hash, with_files))
+
+        missing_blobs = {digest.hash for digest in self.cas.missing_blobs(blobs)}
+
+        for artifact, proto, files_digest, with_files, digests in queries:
+            cached = not any(digest.hash in missing_blobs for digest in digests)
+            if files_digest and (files_digest.hash, with_files) in missing_directories:
+                cached = False
+            artifact._set_cached_state(proto, cached)
+
     # list_artifacts():
     #
     # List artifacts in this cache in LRU order.
@@ -100,6 +211,8 @@ class ArtifactCache(AssetCache):
     #                          generated by `Element.get_artifact_name`)
     #
     def remove(self, ref):
+        self.forget_proto(ref)
+
         try:
             self._remove_ref(ref)
         except AssetCacheError as e:
@@ -180,6 +293,10 @@ class ArtifactCache(AssetCache):
         artifact_name = element.get_artifact_name(key=key)
         uri = REMOTE_ASSET_ARTIFACT_URN_TEMPLATE.format(artifact_name)
 
+        if self._remote_refs.get(artifact_name) is False:
+            element.info("Remotes do not have artifact {} cached".format(display_key))
+            return False
+
         errors = []
         # Start by pulling our artifact proto, so that we know which
         # blobs to pull
@@ -299,6 +416,7 @@ class ArtifactCache(AssetCache):
             return
 
         utils.safe_link(os.path.join(self._basedir, oldref), os.path.join(self._basedir, newref))
+        self.forget_proto(newref)
 
     # fetch_missing_blobs():
     #
@@ -368,6 +486,11 @@ class ArtifactCache(AssetCache):
 
         project = element._get_project()
         ref = element.get_artifact_name()
+
+        cached = self._remote_refs.get(ref)
+        if cached is not None:
+            return cached
+
         for remote in self._index_remotes[project]:
             remote.init()
 
@@ -376,6 +499,71 @@ class ArtifactCache(AssetCache):
 
         return False
 
+    # query_remotes()
+    #
+    # Query the index remotes for many artifacts at once. The queries
+    # are issued concurrently and the answers are remembered for the
+    # rest of the session, see remote_contains().
+    #
+    # Failing queries are ignored, the errors will be reported when
+    # actually trying to pull the artifacts.
+    #
+    # Args:
+    #    element_keys (list): A list of (Element, cache key) tuples to query
+    #
+    def query_remotes(self, element_keys):
+        queries = {}
+        for element, key in element_keys:
+            if key is None:
+                continue
+
+            ref = element.get_artifact_name(key=key)
+            remotes = self._index_remotes.get(element._get_project())
+            if remotes and ref not in self._remote_refs:
+                queries[ref] = (element, key, remotes)
+
+        if not queries:
+            return
+
+        # Initialize the remotes before querying them from multiple threads
+        for _, _, remotes in queries.values():
+            for remote in remotes:
+                remote.init()
+
+        with ThreadPoolExecutor(max_workers=_MAX_REMOTE_QUERIES) as executor:
+            results = executor.map(
+                self._query_remotes, queries.keys(), [remotes for _, _, remotes in queries.values()]
+            )
+
+            for (ref, (element, key, remotes)), cached in zip(queries.items(), results):
+                if cached is None:
+                    continue
+
+                self._remote_refs[ref] = cached
+                if not cached:
+                    display_key = key[: self.context.log_key_length]
+                    for remote in remotes:
+                        element.info("Remote ({}) does not have artifact {} cached".format(remote, display_key))
+
+    # remote_contains()
+    #
+    # Check whether an artifact is available in the index remotes,
+    # without contacting the remotes.
+    #
+    # Args:
+    #    element (Element): The element
+    #    key (str): The cache key of the artifact
+    #
+    # Returns:
+    #    (bool): Whether the artifact is available remotely, or None if
+    #            this was not queried in this session
+    #
+    def remote_contains(self, element, key):
+        if key is None:
+            return None
+
+        return self._remote_refs.get(element.get_artifact_name(key=key))
+
     ################################################
     #             Local Private Methods            #
     ################################################
@@ -527,6 +715,7 @@ class ArtifactCache(AssetCache):
             os.makedirs(os.path.dirname(artifact_path), exist_ok=True)
             with utils.save_file_atomic(artifact_path, mode="wb") as f:
                 f.write(artifact.SerializeToString())
+            self.forget_proto(artifact_name)
 
             if str(artifact.files):
                 __pull_digest(artifact.files)
@@ -568,3 +757,27 @@ class ArtifactCache(AssetCache):
             if e.code() != grpc.StatusCode.NOT_FOUND:
                 raise ArtifactError("Error when querying with status {}: {}".format(e.code().name, e.details()))
             return False
+
+    # _query_remotes()
+    #
+    # Query whether the artifact is available in any of the given remotes.
+    # A remote which fails to answer does not prevent querying the others.
+    #
+    # Args:
+    #    ref (str): The artifact name
+    #    remotes (list): The initialized remotes to query
+    #
+    # Returns:
+    #    (bool): Whether the artifact is available, or None if it was not found
+    #            and some of the remotes failed to answer
+    #
+    def _query_remotes(self, ref, remotes):
+        failed = False
+        for remote in remotes:
+            try:
+                if self._query_remote(ref, remote):
+                    return True
+            except (ArtifactError, AssetCacheError):
+                failed = True
+
+        return None if failed else False
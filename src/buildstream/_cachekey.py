@@ -49,6 +49,11 @@ def is_key(key):
     return not any(ch not in _HEX_DIGITS for ch in key)
 
 
+# Serialize a value for a cache key
+def _dumps(value):
+    return ujson.dumps(value, sort_keys=True, escape_forward_slashes=False)
+
+
 # generate_key()
 #
 # Generate an sha256 hex digest from the given value. The value
@@ -62,5 +67,51 @@ def is_key(key):
 #    (str): An sha256 hex digest of the given value
 #
 def generate_key(value):
-    ustring = ujson.dumps(value, sort_keys=True, escape_forward_slashes=False).encode("utf-8")
+    ustring = _dumps(value).encode("utf-8")
     return hashlib.sha256(ustring).hexdigest()
+
+
+# PartialKey()
+#
+# A precomputed partial cache key for a dictionary which is extended
+# with a single varying field for each key, such as the dependencies
+# of an element.
+#
+# The invariant part of the dictionary is only serialized once, the
+# generated keys are identical to the keys generate_key() would return
+# for the complete dictionary.
+#
+# Args:
+#    value (dict): The invariant part of the dictionary
+#    field (str): The name of the varying field
+#
+class PartialKey:
+    def __init__(self, value, field):
+        assert field not in value
+
+        # Keys are serialized in sorted order, split the dictionary
+        # around the position of the varying field
+        head = _dumps({key: val for key, val in value.items() if key < field})
+        tail = _dumps({key: val for key, val in value.items() if key > field})
+
+        head = head[:-1] + ("," if head != "{}" else "") + _dumps(field) + ":"
+        tail = ("," if tail != "{}" else "") + tail[1:]
+
+        self._hash = hashlib.sha256(head.encode("utf-8"))
+        self._tail = tail.encode("utf-8")
+
+    # generate_key()
+    #
+    # Generate the key for the complete dictionary
+    #
+    # Args:
+    #    value: The value of the varying field
+    #
+    # Returns:
+    #    (str): An sha256 hex digest of the complete dictionary
+    #
+    def generate_key(self, value):
+        sha = self._hash.copy()
+        sha.update(_dumps(value).encode("utf-8"))
+        sha.update(self._tail)
+        return sha.hexdigest()
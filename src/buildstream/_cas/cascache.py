@@ -18,14 +18,19 @@
 #  Authors:
 #        Jürg Billeter <juerg.billeter@codethink.co.uk>
 
+import hashlib
 import itertools
+import json
 import os
 import stat
 import contextlib
 import ctypes
 import multiprocessing
 import signal
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List
 
 import grpc
@@ -37,12 +42,24 @@ from .._protos.build.buildgrid import local_cas_pb2
 from .. import _signals, utils
 from ..types import FastEnum, SourceRef
 from .._exceptions import CASCacheError
+from .._message import Message, MessageType
 
 from .casdprocessmanager import CASDProcessManager
-from .casremote import _CASBatchRead, _CASBatchUpdate
+from .casremote import _CASBatchRead, _CASBatchUpdate, _MAX_PAYLOAD_BYTES
 
 _BUFFER_SIZE = 65536
 
+# The maximum number of threads used to check out a directory tree
+_MAX_CHECKOUT_THREADS = 16
+
+# The maximum number of parsed Directory objects to keep in memory
+_DIRECTORY_CACHE_SIZE = 4096
+
+# Files modified less than this many nanoseconds before a directory is
+# imported may be modified again without changing their mtime, the
+# digests of such directories are not recorded in the import index.
+_IMPORT_INDEX_RACY_NS = 2 * 1000000000
+
 
 # Refresh interval for disk usage of local cache in seconds
 _CACHE_USAGE_REFRESH = 5
@@ -77,11 +94,24 @@ class CASCache:
     ):
         self.casdir = os.path.join(path, "cas")
         self.tmpdir = os.path.join(path, "tmp")
+        self.importindexdir = os.path.join(path, "import-index")
         os.makedirs(self.tmpdir, exist_ok=True)
 
         self._cache_usage_monitor = None
         self._cache_usage_monitor_forbidden = False
 
+        # Recently used Directory objects, by hash, in LRU order
+        self._directory_cache = OrderedDict()
+        self._directory_cache_lock = threading.Lock()
+        self._directory_cache_hits = 0
+        self._directory_cache_misses = 0
+
+        # Hashes of the blobs which are known to be present on remotes, by
+        # the local instance name of the remote. This is recorded in the job
+        # process which uploads the blobs and discarded when the job exits,
+        # it only spares repeated checks within a single job.
+        self._remote_blobs = {}
+
         self._casd_process_manager = None
         self._casd_channel = None
         if casd:
@@ -131,6 +161,16 @@ class CASCache:
     # Release resources used by CASCache.
     #
     def release_resources(self, messenger=None):
+        if messenger and (self._directory_cache_hits or self._directory_cache_misses):
+            messenger.message(
+                Message(
+                    MessageType.DEBUG,
+                    "Directory cache: {} hits, {} misses".format(
+                        self._directory_cache_hits, self._directory_cache_misses
+                    ),
+                )
+            )
+
         if self._cache_usage_monitor:
             self._cache_usage_monitor.release_resources()
 
@@ -139,6 +179,52 @@ class CASCache:
             self._casd_process_manager.release_resources(messenger)
             self._casd_process_manager = None
 
+    # get_directory():
+    #
+    # Get the parsed Directory object of the specified digest.
+    #
+    # The most recently used Directory objects are kept in memory,
+    # so the returned object must not be modified.
+    #
+    # Args:
+    #     digest (Digest): The digest of the Directory object
+    #
+    # Returns:
+    #     (Directory): The Directory object
+    #
+    # Raises:
+    #     FileNotFoundError: If the Directory object is not in the local cache
+    #
+    def get_directory(self, digest):
+        with self._directory_cache_lock:
+            directory = self._directory_cache.get(digest.hash)
+            if directory is not None:
+                self._directory_cache.move_to_end(digest.hash)
+                self._directory_cache_hits += 1
+                return directory
+
+            self._directory_cache_misses += 1
+
+        directory = remote_execution_pb2.Directory()
+        with open(self.objpath(digest), "rb") as f:
+            directory.ParseFromString(f.read())
+
+        with self._directory_cache_lock:
+            self._directory_cache[digest.hash] = directory
+            if len(self._directory_cache) > _DIRECTORY_CACHE_SIZE:
+                self._directory_cache.popitem(last=False)
+
+        return directory
+
+    # get_directory_cache_stats():
+    #
+    # Returns:
+    #     (int): The number of get_directory() calls answered from memory
+    #     (int): The number of get_directory() calls which read the object
+    #
+    def get_directory_cache_stats(self):
+        return self._directory_cache_hits, self._directory_cache_misses
+
     # contains_files():
     #
     # Check whether file digests exist in the local CAS cache
@@ -185,6 +271,44 @@ class CASCache:
                 raise CASCacheError("Unsupported buildbox-casd version: FetchTree unimplemented") from e
             raise
 
+    # missing_directories():
+    #
+    # Determine which of the specified directories are not available in the
+    # cache, i.e. dangling. The FetchTree requests are issued concurrently
+    # instead of waiting for each reply in turn.
+    #
+    # Args:
+    #     digests ([Digest]): The directory digests to check
+    #     with_files (bool): Whether to check files as well
+    #
+    # Returns: List of missing directory Digest objects
+    #
+    def missing_directories(self, digests, *, with_files):
+        local_cas = self.get_local_cas()
+
+        missing_directories = []
+        # Limit the number of requests in flight
+        for digests_group in _grouper(iter(digests), 512):
+            futures = []
+            for digest in digests_group:
+                request = local_cas_pb2.FetchTreeRequest()
+                request.root_digest.CopyFrom(digest)
+                request.fetch_file_blobs = with_files
+                futures.append((digest, local_cas.FetchTree.future(request)))
+
+            for digest, future in futures:
+                try:
+                    future.result()
+                except grpc.RpcError as e:
+                    if e.code() == grpc.StatusCode.NOT_FOUND:
+                        missing_directories.append(digest)
+                        continue
+                    if e.code() == grpc.StatusCode.UNIMPLEMENTED:
+                        raise CASCacheError("Unsupported buildbox-casd version: FetchTree unimplemented") from e
+                    raise
+
+        return missing_directories
+
     # checkout():
     #
     # Checkout the specified directory digest.
@@ -195,49 +319,41 @@ class CASCache:
     #     can_link (bool): Whether we can create hard links in the destination
     #
     def checkout(self, dest, tree, *, can_link=False):
-        os.makedirs(dest, exist_ok=True)
-
-        directory = remote_execution_pb2.Directory()
-
-        with open(self.objpath(tree), "rb") as f:
-            directory.ParseFromString(f.read())
+        subdirs = self._checkout_directory(dest, tree, can_link)
+        if not subdirs:
+            return
 
-        for filenode in directory.files:
-            # regular file, create hardlink
-            fullpath = os.path.join(dest, filenode.name)
+        threads = min(_MAX_CHECKOUT_THREADS, os.cpu_count() or 1)
+        if threads == 1:
+            while subdirs:
+                subdir_dest, subdir_tree = subdirs.pop()
+                subdirs.extend(self._checkout_directory(subdir_dest, subdir_tree, can_link))
+            return
 
-            node_properties = filenode.node_properties
-            if node_properties.HasField("mtime"):
-                mtime = utils._parse_protobuf_timestamp(node_properties.mtime)
-            else:
-                mtime = None
+        # Check out the subdirectories concurrently, most of the time is
+        # spent in file system calls, which release the GIL
+        with ThreadPoolExecutor(max_workers=threads) as executor:
 
-            if can_link and mtime is None:
-                utils.safe_link(self.objpath(filenode.digest), fullpath)
-            else:
-                utils.safe_copy(self.objpath(filenode.digest), fullpath, copystat=False)
-                if mtime is not None:
-                    utils._set_file_mtime(fullpath, mtime)
+            def checkout_subdirs(subdirs):
+                for subdir_dest, subdir_tree in subdirs:
+                    futures.append(executor.submit(checkout_subdir, subdir_dest, subdir_tree))
 
-            if filenode.is_executable:
-                st = os.stat(fullpath)
-                mode = st.st_mode
-                if mode & stat.S_IRUSR:
-                    mode |= stat.S_IXUSR
-                if mode & stat.S_IRGRP:
-                    mode |= stat.S_IXGRP
-                if mode & stat.S_IROTH:
-                    mode |= stat.S_IXOTH
-                os.chmod(fullpath, mode)
+            def checkout_subdir(subdir_dest, subdir_tree):
+                checkout_subdirs(self._checkout_directory(subdir_dest, subdir_tree, can_link))
 
-        for dirnode in directory.directories:
-            fullpath = os.path.join(dest, dirnode.name)
-            self.checkout(fullpath, dirnode.digest, can_link=can_link)
+            futures = []
+            checkout_subdirs(subdirs)
 
-        for symlinknode in directory.symlinks:
-            # symlink
-            fullpath = os.path.join(dest, symlinknode.name)
-            os.symlink(symlinknode.target, fullpath)
+            try:
+                # Each subdirectory is checked out before its own
+                # subdirectories are submitted, so all the work is done
+                # once there are no more futures to wait for
+                while futures:
+                    futures.pop().result()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
 
     # pull_tree():
     #
@@ -330,18 +446,86 @@ class CASCache:
 
         return digest
 
+    # add_objects():
+    #
+    # Hash and write several objects to CAS, using as few requests as
+    # possible. Objects which are already in CAS are not sent again.
+    #
+    # Args:
+    #     buffers ([bytes]): The byte buffers to add
+    #
+    # Returns:
+    #     ([Digest]): The digests of the added objects, in the same order
+    #
+    def add_objects(self, buffers):
+        digests = [utils._message_digest(buffer) for buffer in buffers]
+
+        if len(digests) > 1:
+            missing_blobs = {digest.hash for digest in self._find_missing_blobs(digests)}
+        else:
+            # Not worth an additional request
+            missing_blobs = {digest.hash for digest in digests}
+
+        requests = []
+        request = None
+        request_size = 0
+        for digest, buffer in zip(digests, buffers):
+            if digest.hash not in missing_blobs:
+                continue
+            missing_blobs.remove(digest.hash)
+
+            if digest.size_bytes > _MAX_PAYLOAD_BYTES:
+                # Too large for a batch request
+                self.add_object(buffer=buffer)
+                continue
+
+            if request is None or request_size + digest.size_bytes > _MAX_PAYLOAD_BYTES:
+                request = remote_execution_pb2.BatchUpdateBlobsRequest()
+                requests.append(request)
+                request_size = 0
+
+            blob_request = request.requests.add()
+            blob_request.digest.CopyFrom(digest)
+            blob_request.data = buffer
+            request_size += digest.size_bytes
+
+        cas = self.get_cas()
+        for request in requests:
+            batch_response = cas.BatchUpdateBlobs(request)
+
+            for response in batch_response.responses:
+                if response.status.code == code_pb2.RESOURCE_EXHAUSTED:
+                    raise CASCacheError("Cache too full", reason="cache-too-full")
+                if response.status.code != code_pb2.OK:
+                    raise CASCacheError("Failed to add blob {}: {}".format(response.digest.hash, response.status.code))
+
+        return digests
+
     # import_directory():
     #
     # Import directory tree into CAS.
     #
+    # With `use_index`, the digest of the imported directory is recorded
+    # along with the inode, size and mtime of every file in the tree. A later
+    # import of the same path, even in another session, then only needs to
+    # stat() the tree to find that it is unmodified, instead of having
+    # buildbox-casd hash all the files again. Any change in the tree causes
+    # the whole directory to be imported again.
+    #
     # Args:
     #     path (str): Path to directory to import
     #     properties Optional[List[str]]: List of properties to request
+    #     use_index (bool): Whether to use the import index
     #
     # Returns:
     #     (Digest): The digest of the imported directory
     #
-    def import_directory(self, path: str, properties: Optional[List[str]] = None) -> SourceRef:
+    def import_directory(
+        self, path: str, properties: Optional[List[str]] = None, *, use_index: bool = False
+    ) -> SourceRef:
+        if use_index:
+            return self._import_directory_indexed(path, properties)
+
         local_cas = self.get_local_cas()
 
         request = local_cas_pb2.CaptureTreeRequest()
@@ -375,15 +559,70 @@ class CASCache:
     #
     # Determine which blobs of a directory tree are missing on the remote.
     #
+    # The tree is checked top-down, one level of directories at a time,
+    # and only the directories which are missing on the remote are
+    # descended into. A directory which is present on the remote is
+    # assumed to be complete, as is the case when it was uploaded along
+    # with its contents. Blobs found on the remote are remembered for the
+    # rest of the job and not checked again.
+    #
     # Args:
+    #     remote (CASRemote): The remote to check
     #     digest (Digest): The directory digest
     #
     # Returns: List of missing Digest objects
     #
     def remote_missing_blobs_for_directory(self, remote, digest):
-        required_blobs = self.required_blobs_for_directory(digest)
-
-        return self.remote_missing_blobs(remote, required_blobs)
+        instance_name = remote.local_cas_instance_name
+        remote_blobs = self._remote_blobs.setdefault(instance_name, set())
+
+        missing_blobs = {}
+        seen = {digest.hash}
+        directories = [digest] if digest.hash not in remote_blobs else []
+        files = []
+
+        # The files of a level of directories are checked along with
+        # the directories of the next level
+        while directories or files:
+            blobs = directories + files
+            missing_hashes = set()
+            for missing_digest in self._find_missing_blobs(blobs, instance_name=instance_name):
+                missing_blobs[missing_digest.hash] = missing_digest
+                missing_hashes.add(missing_digest.hash)
+
+            remote_blobs.update(blob.hash for blob in blobs if blob.hash not in missing_hashes)
+
+            subdirectories = []
+            files = []
+            for directory_digest in directories:
+                if directory_digest.hash not in missing_hashes:
+                    continue
+
+                directory = self.get_directory(directory_digest)
+                for filenode in directory.files:
+                    if filenode.digest.hash not in seen and filenode.digest.hash not in remote_blobs:
+                        seen.add(filenode.digest.hash)
+                        files.append(filenode.digest)
+                for dirnode in directory.directories:
+                    if dirnode.digest.hash not in seen and dirnode.digest.hash not in remote_blobs:
+                        seen.add(dirnode.digest.hash)
+                        subdirectories.append(dirnode.digest)
+
+            directories = subdirectories
+
+        return list(missing_blobs.values())
+
+    # forget_remote_blobs():
+    #
+    # Forget which blobs were found on the remote in this job, such
+    # that they are checked again, e.g. when the remote turned out to be
+    # missing blobs of a directory which it has.
+    #
+    # Args:
+    #     remote (CASRemote): The remote
+    #
+    def forget_remote_blobs(self, remote):
+        self._remote_blobs.pop(remote.local_cas_instance_name, None)
 
     # remote_missing_blobs():
     #
@@ -395,31 +634,20 @@ class CASCache:
     # Returns: List of missing Digest objects
     #
     def remote_missing_blobs(self, remote, blobs):
-        cas = self.get_cas()
-        instance_name = remote.local_cas_instance_name
-
-        missing_blobs = dict()
-        # Limit size of FindMissingBlobs request
-        for required_blobs_group in _grouper(iter(blobs), 512):
-            request = remote_execution_pb2.FindMissingBlobsRequest(instance_name=instance_name)
-
-            for required_digest in required_blobs_group:
-                d = request.blob_digests.add()
-                d.CopyFrom(required_digest)
-
-            try:
-                response = cas.FindMissingBlobs(request)
-            except grpc.RpcError as e:
-                if e.code() == grpc.StatusCode.INVALID_ARGUMENT and e.details().startswith("Invalid instance name"):
-                    raise CASCacheError("Unsupported buildbox-casd version: FindMissingBlobs failed") from e
-                raise
-
-            for missing_digest in response.missing_blob_digests:
-                d = remote_execution_pb2.Digest()
-                d.CopyFrom(missing_digest)
-                missing_blobs[d.hash] = d
+        return self._find_missing_blobs(blobs, instance_name=remote.local_cas_instance_name)
 
-        return missing_blobs.values()
+    # missing_blobs():
+    #
+    # Determine which blobs are missing in the local cache, using
+    # as few FindMissingBlobs requests as possible.
+    #
+    # Args:
+    #     blobs ([Digest]): List of digests to check
+    #
+    # Returns: List of missing Digest objects
+    #
+    def missing_blobs(self, blobs):
+        return self._find_missing_blobs(blobs)
 
     # local_missing_blobs():
     #
@@ -451,10 +679,7 @@ class CASCache:
 
         yield directory_digest
 
-        directory = remote_execution_pb2.Directory()
-
-        with open(self.objpath(directory_digest), "rb") as f:
-            directory.ParseFromString(f.read())
+        directory = self.get_directory(directory_digest)
 
         for filenode in directory.files:
             yield filenode.digest
@@ -467,19 +692,97 @@ class CASCache:
     #             Local Private Methods            #
     ################################################
 
+    def _find_missing_blobs(self, blobs, *, instance_name=""):
+        cas = self.get_cas()
+
+        missing_blobs = dict()
+        # Limit size of FindMissingBlobs request
+        for required_blobs_group in _grouper(iter(blobs), 512):
+            request = remote_execution_pb2.FindMissingBlobsRequest(instance_name=instance_name)
+
+            for required_digest in required_blobs_group:
+                d = request.blob_digests.add()
+                d.CopyFrom(required_digest)
+
+            try:
+                response = cas.FindMissingBlobs(request)
+            except grpc.RpcError as e:
+                if e.code() == grpc.StatusCode.INVALID_ARGUMENT and e.details().startswith("Invalid instance name"):
+                    raise CASCacheError("Unsupported buildbox-casd version: FindMissingBlobs failed") from e
+                raise
+
+            for missing_digest in response.missing_blob_digests:
+                d = remote_execution_pb2.Digest()
+                d.CopyFrom(missing_digest)
+                missing_blobs[d.hash] = d
+
+        return missing_blobs.values()
+
+    # _checkout_directory():
+    #
+    # Checkout the files and symlinks of a single directory, without
+    # recursing into its subdirectories.
+    #
+    # Args:
+    #     dest (str): The destination path
+    #     tree (Digest): The directory digest to extract
+    #     can_link (bool): Whether we can create hard links in the destination
+    #
+    # Returns:
+    #     (list): The (path, Digest) tuples of the subdirectories to check out
+    #
+    def _checkout_directory(self, dest, tree, can_link):
+        os.makedirs(dest, exist_ok=True)
+
+        directory = self.get_directory(tree)
+
+        for filenode in directory.files:
+            # regular file, create hardlink
+            fullpath = os.path.join(dest, filenode.name)
+
+            node_properties = filenode.node_properties
+            if node_properties.HasField("mtime"):
+                mtime = utils._parse_protobuf_timestamp(node_properties.mtime)
+            else:
+                mtime = None
+
+            if can_link and mtime is None:
+                utils.safe_link(self.objpath(filenode.digest), fullpath)
+            else:
+                utils.safe_copy(self.objpath(filenode.digest), fullpath, copystat=False)
+                if mtime is not None:
+                    utils._set_file_mtime(fullpath, mtime)
+
+            if filenode.is_executable:
+                st = os.stat(fullpath)
+                mode = st.st_mode
+                if mode & stat.S_IRUSR:
+                    mode |= stat.S_IXUSR
+                if mode & stat.S_IRGRP:
+                    mode |= stat.S_IXGRP
+                if mode & stat.S_IROTH:
+                    mode |= stat.S_IXOTH
+                os.chmod(fullpath, mode)
+
+        for symlinknode in directory.symlinks:
+            # symlink
+            fullpath = os.path.join(dest, symlinknode.name)
+            os.symlink(symlinknode.target, fullpath)
+
+        return [(os.path.join(dest, dirnode.name), dirnode.digest) for dirnode in directory.directories]
+
     def _reachable_refs_dir(self, reachable, tree, update_mtime=False, check_exists=False):
         if tree.hash in reachable:
             return
         try:
             if update_mtime:
                 os.utime(self.objpath(tree))
+            elif check_exists and not os.path.exists(self.objpath(tree)):
+                raise FileNotFoundError
 
             reachable.add(tree.hash)
 
-            directory = remote_execution_pb2.Directory()
-
-            with open(self.objpath(tree), "rb") as f:
-                directory.ParseFromString(f.read())
+            directory = self.get_directory(tree)
 
         except FileNotFoundError:
             if check_exists:
@@ -565,6 +868,90 @@ class CASCache:
 
         return batch
 
+    # _import_directory_indexed():
+    #
+    # Import a directory tree into CAS, reusing the digest recorded
+    # in the import index if the tree is unmodified.
+    #
+    # Args:
+    #     path (str): Path to directory to import
+    #     properties Optional[List[str]]: List of properties to request
+    #
+    # Returns:
+    #     (Digest): The digest of the imported directory
+    #
+    def _import_directory_indexed(self, path, properties):
+        path = os.path.abspath(path)
+        key = json.dumps([path, sorted(properties or [])]).encode()
+        indexpath = os.path.join(self.importindexdir, hashlib.sha256(key).hexdigest())
+
+        start_time = utils._time_ns()
+        try:
+            signature, newest_mtime = self._stat_directory(path)
+        except OSError:
+            # Let buildbox-casd report the error
+            return self.import_directory(path, properties)
+
+        try:
+            with open(indexpath, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            entry = None
+
+        if entry is not None and entry.get("signature") == signature:
+            digest = remote_execution_pb2.Digest(hash=entry["hash"], size_bytes=entry["size_bytes"])
+            if self.contains_directory(digest, with_files=True):
+                return digest
+
+        digest = self.import_directory(path, properties)
+
+        if newest_mtime < start_time - _IMPORT_INDEX_RACY_NS:
+            with contextlib.suppress(OSError):
+                os.makedirs(self.importindexdir, exist_ok=True)
+                with utils.save_file_atomic(indexpath, "w", encoding="utf-8") as f:
+                    json.dump({"signature": signature, "hash": digest.hash, "size_bytes": digest.size_bytes}, f)
+
+        return digest
+
+    # _stat_directory():
+    #
+    # Calculate a signature of the metadata of all entries in a directory
+    # tree, which changes when any of the entries is modified.
+    #
+    # Args:
+    #     path (str): Path to the directory
+    #
+    # Returns:
+    #     (str): The signature of the directory tree
+    #     (int): The newest mtime of all entries, in nanoseconds
+    #
+    # Raises:
+    #     (OSError): If the directory tree cannot be read
+    #
+    def _stat_directory(self, path):
+        signature = hashlib.sha256()
+        newest_mtime = 0
+
+        stack = [path]
+        while stack:
+            directory = stack.pop()
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+
+            for entry in entries:
+                st = entry.stat(follow_symlinks=False)
+                signature.update(
+                    "{}\0{}\0{}\0{}\0{}\0".format(
+                        os.path.relpath(entry.path, path), st.st_mode, st.st_ino, st.st_size, st.st_mtime_ns
+                    ).encode()
+                )
+                newest_mtime = max(newest_mtime, st.st_mtime_ns)
+
+                if stat.S_ISDIR(st.st_mode):
+                    stack.append(entry.path)
+
+        return signature.hexdigest(), newest_mtime
+
     # _fetch_directory():
     #
     # Fetches remote directory and adds it to content addressable store.
@@ -658,11 +1045,15 @@ class CASCache:
     def send_blobs(self, remote, digests):
         batch = _CASBatchUpdate(remote)
 
+        sent_blobs = []
         for digest in digests:
             batch.add(digest)
+            sent_blobs.append(digest.hash)
 
         batch.send()
 
+        self._remote_blobs.setdefault(remote.local_cas_instance_name, set()).update(sent_blobs)
+
     def _send_directory(self, remote, digest):
         required_blobs = self.required_blobs_for_directory(digest)
 
@@ -31,7 +31,9 @@ from ._artifactcache import ArtifactCache
 from ._elementsourcescache import ElementSourcesCache
 from ._sourcecache import SourceCache
 from ._cas import CASCache, CASLogLevel
-from .types import _CacheBuildTrees, _PipelineSelection, _SchedulerErrorAction
+from ._jobhistory import JobHistory
+from ._yamlcache import YamlCache
+from .types import _CacheBuildTrees, _PipelineSelection, _SchedulerErrorAction, _SchedulingMode
 from ._workspaces import Workspaces, WorkspaceProjectCache
 from .node import Node
 from .sandbox import SandboxRemote
@@ -134,6 +136,18 @@ class Context:
         # What to do when a build fails in non interactive mode
         self.sched_error_action = None
 
+        # How ready elements are prioritized by the scheduler
+        self.sched_mode = None
+
+        # Maximum number of elements processed by a single non-build job
+        self.sched_batch_size = None
+
+        # Maximum number of connections used to download a single file
+        self.sched_download_connections = None
+
+        # Maximum number of sources of a single element fetched concurrently
+        self.sched_fetchers_per_element = None
+
         # Maximum jobs per build
         self.build_max_jobs = None
 
@@ -179,6 +193,8 @@ class Context:
         self._workspaces = None
         self._workspace_project_cache = WorkspaceProjectCache()
         self._cascache = None
+        self._jobhistory = None
+        self._yamlcache = None
 
     # __enter__()
     #
@@ -204,6 +220,12 @@ class Context:
         if self._cascache:
             self._cascache.release_resources(self.messenger)
 
+        if self._jobhistory:
+            self._jobhistory.close()
+
+        if self._yamlcache:
+            self._yamlcache.close()
+
     # load()
     #
     # Loads the configuration files
@@ -379,12 +401,28 @@ class Context:
 
         # Load scheduler config
         scheduler = defaults.get_mapping("scheduler")
-        scheduler.validate_keys(["on-error", "fetchers", "builders", "pushers", "network-retries"])
+        scheduler.validate_keys(
+            [
+                "on-error",
+                "fetchers",
+                "builders",
+                "pushers",
+                "network-retries",
+                "scheduling",
+                "batch-size",
+                "download-connections",
+                "fetchers-per-element",
+            ]
+        )
         self.sched_error_action = scheduler.get_enum("on-error", _SchedulerErrorAction)
+        self.sched_mode = scheduler.get_enum("scheduling", _SchedulingMode)
         self.sched_fetchers = scheduler.get_int("fetchers")
         self.sched_builders = scheduler.get_int("builders")
         self.sched_pushers = scheduler.get_int("pushers")
         self.sched_network_retries = scheduler.get_int("network-retries")
+        self.sched_batch_size = scheduler.get_int("batch-size")
+        self.sched_download_connections = scheduler.get_int("download-connections")
+        self.sched_fetchers_per_element = scheduler.get_int("fetchers-per-element")
 
         # Load build config
         build = defaults.get_mapping("build")
@@ -439,6 +477,20 @@ class Context:
 
         return self._sourcecache
 
+    @property
+    def jobhistory(self):
+        if not self._jobhistory:
+            self._jobhistory = JobHistory(os.path.join(self.cachedir, "job-history.db"))
+
+        return self._jobhistory
+
+    @property
+    def yamlcache(self):
+        if not self._yamlcache:
+            self._yamlcache = YamlCache(os.path.join(self.cachedir, "yaml-cache"))
+
+        return self._yamlcache
+
     # add_project():
     #
     # Add a project to the context.
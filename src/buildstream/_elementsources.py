@@ -16,6 +16,7 @@
 #  License along with this library. If not, see <http://www.gnu.org/licenses/>.
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from typing import TYPE_CHECKING, Iterator
 
@@ -207,10 +208,13 @@ class ElementSources:
     #
     # Fetch the combined or individual element sources.
     #
+    # Args:
+    #   fetchers (int): The maximum number of sources to fetch concurrently
+    #
     # Raises:
     #    SourceError: If one of the element sources has an error
     #
-    def fetch(self):
+    def fetch(self, *, fetchers=1):
         if self.cached():
             return
 
@@ -220,36 +224,51 @@ class ElementSources:
             return
 
         # Otherwise, fetch individual sources
-        self.fetch_sources()
+        self.fetch_sources(fetchers=fetchers)
 
     # fetch_sources():
     #
     # Fetch the individual element sources.
     #
+    # Sources which do not depend on previous sources are fetched
+    # concurrently when `fetchers` allows it, sources which require
+    # the previous sources wait for all of them to be fetched first.
+    #
     # Args:
     #   fetch_original (bool): Always fetch original source
     #   stop (Source): Only fetch sources listed before this source
+    #   fetchers (int): The maximum number of sources to fetch concurrently
     #
     # Raises:
     #    SourceError: If one of the element sources has an error
     #
-    def fetch_sources(self, *, fetch_original=False, stop=None):
+    def fetch_sources(self, *, fetch_original=False, stop=None, fetchers=1):
+        sources = []
         for source in self._sources:
             if source == stop:
                 break
+            sources.append(source)
 
-            if (
-                fetch_original
-                or source.BST_REQUIRES_PREVIOUS_SOURCES_FETCH
-                or source.BST_REQUIRES_PREVIOUS_SOURCES_STAGE
-            ):
-                # Source depends on previous sources, it cannot be stored in
-                # CAS-based source cache on its own. Fetch original source
-                # if it's not in the plugin-specific cache yet.
-                if not source._is_cached():
-                    self._fetch_original_source(source)
-            else:
-                self._fetch_source(source)
+        if fetchers <= 1 or len(sources) <= 1:
+            for source in sources:
+                self._fetch_any_source(source, fetch_original)
+            return
+
+        with ThreadPoolExecutor(max_workers=min(fetchers, len(sources))) as executor:
+            pending = []
+            try:
+                for source in sources:
+                    if source.BST_REQUIRES_PREVIOUS_SOURCES_FETCH or source.BST_REQUIRES_PREVIOUS_SOURCES_STAGE:
+                        self._wait_for_fetches(pending)
+                        self._fetch_any_source(source, fetch_original)
+                    else:
+                        pending.append(executor.submit(self._fetch_any_source, source, fetch_original))
+
+                self._wait_for_fetches(pending)
+            finally:
+                # Do not start fetching any more sources after an error
+                for future in pending:
+                    future.cancel()
 
     # get_unique_key():
     #
@@ -387,6 +406,43 @@ class ElementSources:
         for source in self.sources():
             source._preflight()
 
+    # _fetch_any_source():
+    #
+    # Fetch a single source, either into the local CAS-based source
+    # cache or as an original source, whichever applies to the source.
+    #
+    # Args:
+    #   source (Source): The source to fetch
+    #   fetch_original (bool): Always fetch original source
+    #
+    def _fetch_any_source(self, source, fetch_original):
+        if fetch_original or source.BST_REQUIRES_PREVIOUS_SOURCES_FETCH or source.BST_REQUIRES_PREVIOUS_SOURCES_STAGE:
+            # Source depends on previous sources, it cannot be stored in
+            # CAS-based source cache on its own. Fetch original source
+            # if it's not in the plugin-specific cache yet.
+            if not source._is_cached():
+                self._fetch_original_source(source)
+        else:
+            self._fetch_source(source)
+
+    # _wait_for_fetches():
+    #
+    # Wait for concurrently fetched sources, in the order they were
+    # submitted, such that the error of the first failing source is
+    # reported.
+    #
+    # Args:
+    #   pending (list): The futures of the fetched sources, this list
+    #                   is emptied as the fetches complete
+    #
+    # Raises:
+    #    SourceError: If one of the fetched sources has an error
+    #
+    def _wait_for_fetches(self, pending):
+        while pending:
+            pending[0].result()
+            pending.pop(0)
+
     # _fetch_source():
     #
     # Fetch a single source into the local CAS-based source cache
@@ -25,6 +25,8 @@
 import os
 import re
 import shutil
+import stat
+import subprocess
 from io import StringIO
 from tempfile import TemporaryFile
 
@@ -35,9 +37,12 @@ from .types import CoreWarnings
 from . import utils
 from .types import FastEnum
 from .utils import move_atomic, DirectoryExistsError
+from .storage._casbaseddirectory import CasBasedDirectory
+from .storage.directory import VirtualDirectoryError, _FileType
 
 GIT_MODULES = ".gitmodules"
 EXACT_TAG_PATTERN = r"(?P<tag>.*)-0-g(?P<commit>.*)"
+OBJECT_POOL_PATTERN = r"[A-Za-z0-9][A-Za-z0-9._-]*"
 
 # Warnings
 WARN_INCONSISTENT_SUBMODULE = "inconsistent-submodule"
@@ -54,6 +59,28 @@ def _strip_tag(rev):
     return rev.split("-g")[-1]
 
 
+# A file object reading a limited number of bytes from a stream,
+# used to read the objects written by `git cat-file --batch`
+class _BoundedReader:
+    def __init__(self, stream, size):
+        self._stream = stream
+        self._remaining = size
+
+    def read(self, size=-1):
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+
+        data = self._stream.read(size)
+        self._remaining -= len(data)
+        return data
+
+    # Skip the part of the object which was not read
+    def drain(self):
+        while self._remaining:
+            if not self.read(65536):
+                raise EOFError("Unexpected end of stream")
+
+
 # This class represents a single Git repository. The Git source needs to account for
 # submodules, but we don't want to cache them all under the umbrella of the
 # superproject - so we use this class which caches them independently, according
@@ -68,9 +95,11 @@ def _strip_tag(rev):
 #    ref (str): Specified 'ref' from the source configuration
 #    primary (bool): Whether this is the primary URL for the source
 #    tags (list): Tag configuration; see _GitSourceBase._load_tags
+#    object_pool (str): The name of the object pool to share objects with
+#                       other mirrors, if any
 #
 class _GitMirror(SourceFetcher):
-    def __init__(self, source, path, url, ref, *, primary=False, tags=None):
+    def __init__(self, source, path, url, ref, *, primary=False, tags=None, object_pool=None):
 
         super().__init__()
         self.source = source
@@ -81,20 +110,52 @@ class _GitMirror(SourceFetcher):
         self.primary = primary
         self.mirror = os.path.join(source.get_mirror_directory(), utils.url_directory_name(url))
 
+        # The objects of mirrors sharing an object pool are fetched into the
+        # pool, which every mirror uses as an alternate object store. The refs
+        # of each mirror are kept in their own namespace in the pool.
+        self.object_pool = None
+        self.pool_namespace = None
+        if object_pool:
+            self.object_pool = os.path.join(source.get_mirror_directory(), "object-pools", object_pool)
+            self.pool_namespace = "refs/mirrors/{}".format(utils.url_directory_name(url))
+
     # _ensure_repo():
     #
     # Ensures that the Git repository exists at the mirror location and is configured
     # to fetch from the given URL
     #
     def _ensure_repo(self):
-        if not os.path.exists(self.mirror):
+        self._ensure_bare_repo(self.mirror)
+
+        if self.object_pool:
+            self._ensure_bare_repo(self.object_pool)
+
+            pool_objects = os.path.join(self.object_pool, "objects")
+            alternates = os.path.join(self.mirror, "objects", "info", "alternates")
+            try:
+                with open(alternates, "r") as f:
+                    current = f.read().splitlines()
+            except FileNotFoundError:
+                current = []
+
+            if pool_objects not in current:
+                os.makedirs(os.path.dirname(alternates), exist_ok=True)
+                with utils.save_file_atomic(alternates, "w") as f:
+                    f.write("".join(line + "\n" for line in current + [pool_objects]))
+
+    # _ensure_bare_repo():
+    #
+    # Ensures that a bare Git repository exists at the given location
+    #
+    def _ensure_bare_repo(self, path):
+        if not os.path.exists(path):
             with self.source.tempdir() as tmpdir:
                 self.source.call(
                     [self.source.host_git, "init", "--bare", tmpdir], fail="Failed to initialise repository",
                 )
 
                 try:
-                    move_atomic(tmpdir, self.mirror)
+                    move_atomic(tmpdir, path)
                 except DirectoryExistsError:
                     # Another process was quicker to download this repository.
                     # Let's discard our own
@@ -102,10 +163,57 @@ class _GitMirror(SourceFetcher):
                 except OSError as e:
                     raise SourceError(
                         "{}: Failed to move created repository from '{}' to '{}': {}".format(
-                            self.source, tmpdir, self.mirror, e
+                            self.source, tmpdir, path, e
                         )
                     ) from e
 
+    # _fetch_refs():
+    #
+    # Fetches refs from a remote repository into the mirror, through
+    # the object pool if the mirror uses one.
+    #
+    # Args:
+    #     url (str): The URL to fetch from
+    #     refspecs (list): The refspecs to fetch, mapping remote refs to local refs
+    #     depth (int): The depth of a shallow fetch, if any
+    #     prune (bool): Whether to remove local refs which no longer exist on the remote
+    #     kwargs: Keyword arguments passed to Source.call()
+    #
+    # Returns:
+    #     (int): The exit code of git
+    #
+    def _fetch_refs(self, url, refspecs, *, depth=None, prune=False, **kwargs):
+        options = ["--prune"] if prune else []
+
+        if not self.object_pool:
+            if depth:
+                options.append("--depth={}".format(depth))
+            return self.source.call(
+                [self.source.host_git, "fetch", *options, url, *refspecs], cwd=self.mirror, **kwargs
+            )
+
+        # The object pool is never shallow, as a shallow repository
+        # cannot serve as an alternate object store
+        pool_refspecs = []
+        mirror_refspecs = []
+        for refspec in refspecs:
+            src, dst = refspec.lstrip("+").split(":")
+            pool_ref = "{}/{}".format(self.pool_namespace, dst[len("refs/") :])
+            pool_refspecs.append("+{}:{}".format(src, pool_ref))
+            mirror_refspecs.append("+{}:{}".format(pool_ref, dst))
+
+        exit_code = self.source.call(
+            [self.source.host_git, "fetch", *options, url, *pool_refspecs], cwd=self.object_pool, **kwargs
+        )
+        if exit_code != 0:
+            return exit_code
+
+        # The objects are all found in the alternate object store,
+        # this only updates the refs of the mirror
+        return self.source.call(
+            [self.source.host_git, "fetch", *options, self.object_pool, *mirror_refspecs], cwd=self.mirror, **kwargs
+        )
+
     def _fetch(self, url, fetch_all=False):
         self._ensure_repo()
 
@@ -133,16 +241,7 @@ class _GitMirror(SourceFetcher):
                     )
                     fetch_all = True
                 else:
-                    exit_code = self.source.call(
-                        [
-                            self.source.host_git,
-                            "fetch",
-                            "--depth=1",
-                            url,
-                            "+refs/tags/{tag}:refs/tags/{tag}".format(tag=tag),
-                        ],
-                        cwd=self.mirror,
-                    )
+                    exit_code = self._fetch_refs(url, ["+refs/tags/{tag}:refs/tags/{tag}".format(tag=tag)], depth=1)
                     if exit_code != 0:
                         self.source.status(
                             "{}: Failed to fetch tag '{}' from {}. Fetching all Git refs".format(self.source, tag, url)
@@ -150,18 +249,12 @@ class _GitMirror(SourceFetcher):
                         fetch_all = True
 
         if fetch_all:
-            self.source.call(
-                [
-                    self.source.host_git,
-                    "fetch",
-                    "--prune",
-                    url,
-                    "+refs/heads/*:refs/heads/*",
-                    "+refs/tags/*:refs/tags/*",
-                ],
+            self._fetch_refs(
+                url,
+                ["+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*"],
+                prune=True,
                 fail="Failed to fetch from remote git repository: {}".format(url),
                 fail_temporarily=True,
-                cwd=self.mirror,
             )
 
     def fetch(self, alias_override=None):  # pylint: disable=arguments-differ
@@ -298,6 +391,81 @@ class _GitMirror(SourceFetcher):
 
         self._rebuild_git(fullpath)
 
+    # stage_directory():
+    #
+    # Stage the tree of the commit into a CasBasedDirectory, reading the
+    # files straight from the object database into CAS instead of checking
+    # them out into a working tree first.
+    #
+    # Checkouts still have to be used when a tree has .gitattributes, as
+    # these may require filters or conversions when checking out files,
+    # and when tags are configured, to build the dummy .git directory.
+    #
+    # Args:
+    #     directory (CasBasedDirectory): The root directory of the source
+    #
+    def stage_directory(self, directory):
+        _, output = self.source.check_output(
+            [self.source.host_git, "ls-tree", "-r", "-z", "--full-tree", self.ref],
+            fail="Failed to list the tree of git ref {}".format(self.ref),
+            cwd=self.mirror,
+        )
+
+        entries = []
+        for record in output.split("\0"):
+            if record:
+                info, path = record.split("\t", 1)
+                mode, _, sha = info.split()
+                entries.append((int(mode, 8), sha, path))
+
+        if self.tags or any(os.path.basename(path) == ".gitattributes" for _, _, path in entries):
+            with self.source.tempdir() as tmpdir:
+                self.stage(tmpdir)
+                directory.import_files(tmpdir)
+            return
+
+        subdir = directory.descend(*self.path.split(os.sep), create=True)
+        with subprocess.Popen(
+            [self.source.host_git, "cat-file", "--batch"],
+            cwd=self.mirror,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        ) as process:
+            try:
+                subdir._import_file_objects(self._read_objects(process, entries))
+            finally:
+                process.stdin.close()
+                process.stdout.close()
+
+        if process.returncode != 0:
+            raise SourceError("{}: Failed to read objects of git ref {}".format(self.source, self.ref))
+
+    # Translate tree entries to entries for CasBasedDirectory._import_file_objects(),
+    # reading the objects from a `git cat-file --batch` process
+    def _read_objects(self, process, entries):
+        for mode, sha, path in entries:
+            if stat.S_ISDIR(mode) or mode == 0o160000:
+                # Submodules are staged as empty directories, as in a checkout
+                yield path, _FileType.DIRECTORY, None, False
+                continue
+
+            process.stdin.write("{}\n".format(sha).encode("ascii"))
+            process.stdin.flush()
+
+            header = process.stdout.readline().split()
+            if len(header) != 3:
+                raise SourceError("{}: Failed to read git object {} for {}".format(self.source, sha, path))
+
+            blob = _BoundedReader(process.stdout, int(header[2]))
+            if stat.S_ISLNK(mode):
+                yield path, _FileType.SYMLINK, os.fsdecode(blob.read()), False
+            else:
+                yield path, _FileType.REGULAR_FILE, blob, bool(mode & stat.S_IXUSR)
+
+            blob.drain()
+            # Each object is followed by a newline
+            process.stdout.read(1)
+
     def init_workspace(self, directory):
         fullpath = os.path.join(directory, self.path)
         url = self.source.translate_url(self.url)
@@ -510,7 +678,17 @@ class _GitSourceBase(Source):
     def configure(self, node):
         ref = node.get_str("ref", None)
 
-        config_keys = ["url", "track", "ref", "submodules", "checkout-submodules", "ref-format", "track-tags", "tags"]
+        config_keys = [
+            "url",
+            "track",
+            "ref",
+            "submodules",
+            "checkout-submodules",
+            "ref-format",
+            "track-tags",
+            "tags",
+            "object-pool",
+        ]
         node.validate_keys(config_keys + Source.COMMON_CONFIG_KEYS)
 
         tags_node = node.get_sequence("tags", [])
@@ -520,8 +698,19 @@ class _GitSourceBase(Source):
         tags = self._load_tags(node)
         self.track_tags = node.get_bool("track-tags", default=False)
 
+        object_pool = node.get_str("object-pool", None)
+        if object_pool is not None and not re.fullmatch(OBJECT_POOL_PATTERN, object_pool):
+            provenance = node.get_scalar("object-pool").get_provenance()
+            raise SourceError("{}: Invalid object pool name: '{}'".format(provenance, object_pool))
+
         self.original_url = node.get_str("url")
-        self.mirror = self.BST_MIRROR_CLASS(self, "", self.original_url, ref, tags=tags, primary=True)
+        # Only pass the object pool when configured, to support
+        # mirror classes which do not accept an object pool
+        mirror_kwargs = {}
+        if object_pool is not None:
+            mirror_kwargs["object_pool"] = object_pool
+
+        self.mirror = self.BST_MIRROR_CLASS(self, "", self.original_url, ref, tags=tags, primary=True, **mirror_kwargs)
         self.tracking = node.get_str("track", None)
 
         self.ref_format = node.get_enum("ref-format", _RefFormat, _RefFormat.SHA1)
@@ -656,6 +845,8 @@ class _GitSourceBase(Source):
             return ref, tags
 
     def init_workspace(self, directory):
+        if self.BST_STAGE_VIRTUAL_DIRECTORY:
+            directory = directory._get_underlying_directory()
         with self.timed_activity('Setting up workspace "{}"'.format(directory), silent_nested=True):
             self.mirror.init_workspace(directory)
             for mirror in self._recurse_submodules(configure=True):
@@ -665,9 +856,24 @@ class _GitSourceBase(Source):
         # Stage the main repo in the specified directory
         #
         with self.timed_activity("Staging {}".format(self.mirror.url), silent_nested=True):
-            self.mirror.stage(directory)
-            for mirror in self._recurse_submodules(configure=True):
-                mirror.stage(directory)
+            if not self.BST_STAGE_VIRTUAL_DIRECTORY:
+                self.mirror.stage(directory)
+                for mirror in self._recurse_submodules(configure=True):
+                    mirror.stage(directory)
+            elif isinstance(directory, CasBasedDirectory):
+                # As a core plugin, we use private API to write the
+                # files straight from the git object database into CAS
+                try:
+                    self.mirror.stage_directory(directory)
+                    for mirror in self._recurse_submodules(configure=True):
+                        mirror.stage_directory(directory)
+                except VirtualDirectoryError as e:
+                    raise SourceError("{}: Error staging source: {}".format(self, e)) from e
+            else:
+                directory = directory._get_underlying_directory()
+                self.mirror.stage(directory)
+                for mirror in self._recurse_submodules(configure=True):
+                    mirror.stage(directory)
 
     def get_source_fetchers(self):
         self.mirror.mark_download_url(self.mirror.url)
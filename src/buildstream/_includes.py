@@ -148,7 +148,11 @@ class Includes:
         if key not in self._loaded:
             try:
                 self._loaded[key] = _yaml.load(
-                    file_path, shortname=shortname, project=project, copy_tree=self._copy_tree
+                    file_path,
+                    shortname=shortname,
+                    project=project,
+                    copy_tree=self._copy_tree,
+                    cache=current_loader.load_context.context.yamlcache,
                 )
             except LoadError as e:
                 raise LoadError("{}: {}".format(include.get_provenance(), e), e.reason, detail=e.detail) from e
@@ -0,0 +1,242 @@
+#
+#  Copyright (C) 2020 Codethink Limited
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU Lesser General Public
+#  License as published by the Free Software Foundation; either
+#  version 2 of the License, or (at your option) any later version.
+#
+#  This library is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.	 See the GNU
+#  Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public
+#  License along with this library. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import os
+import sqlite3
+import time
+
+
+# How long records are kept in the history, in seconds
+_HISTORY_RETENTION = 90 * 24 * 60 * 60
+
+
+# JobRecord()
+#
+# A record of a job which completed successfully in a past session
+#
+# Args:
+#    element (str): The full name of the element
+#    cache_key (str): The cache key of the element, if it was known
+#    action (str): The action name of the queue which processed the job
+#    timestamp (float): When the job completed, in seconds since the epoch
+#    wall_time (float): The wall clock time taken by the job, in seconds
+#    cpu_time (float): The CPU time used by the job, in seconds
+#    max_rss (int): The peak resident set size of the job, in bytes
+#    artifact_size (int): The size of the artifact created by the job, if any
+#
+class JobRecord:
+    def __init__(self, element, cache_key, action, timestamp, wall_time, cpu_time, max_rss, artifact_size):
+        self.element = element
+        self.cache_key = cache_key
+        self.action = action
+        self.timestamp = timestamp
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        self.max_rss = max_rss
+        self.artifact_size = artifact_size
+
+
+# JobHistory()
+#
+# A persistent database of the resources used by the jobs
+# of past sessions, stored in an SQLite database.
+#
+# The history is only ever accessed from the main process, records
+# are collected throughout the session and written out when the
+# history is closed.
+#
+# The history is only advisory, failing to read or write it never
+# causes a session to fail.
+#
+# Args:
+#    path (str): The path to the database file
+#
+class JobHistory:
+    def __init__(self, path):
+        self._path = path
+        self._connection = None  # The database connection, opened on demand
+        self._disabled = False  # Whether the history is disabled, after failing to create its directory
+        self._pending = []  # Records which have not yet been written
+
+    # record()
+    #
+    # Record a successfully completed job
+    #
+    # Args:
+    #    element_name (str): The full name of the element
+    #    cache_key (str): The cache key of the element, if known
+    #    action (str): The action name of the queue which processed the job
+    #    usage (JobUsage): The resources used by the job
+    #    artifact_size (int): The size of the artifact created by the job, if any
+    #
+    def record(self, element_name, cache_key, action, usage, *, artifact_size=None):
+        self._pending.append(
+            JobRecord(
+                element_name,
+                cache_key,
+                action,
+                time.time(),
+                usage.wall_time,
+                usage.cpu_time,
+                usage.max_rss,
+                artifact_size,
+            )
+        )
+
+    # get_durations()
+    #
+    # Get the wall clock time which the last recorded job of each
+    # element took to complete for the given action.
+    #
+    # Args:
+    #    action (str): The action name of the queue
+    #
+    # Returns:
+    #    (dict): The durations in seconds, keyed by full element name
+    #
+    def get_durations(self, action):
+        rows = self._query("SELECT element, wall_time FROM jobs WHERE action = ? ORDER BY timestamp", (action,))
+
+        # Later records override earlier ones
+        return {element: wall_time for element, wall_time in rows}
+
+    # get_records()
+    #
+    # Get the recorded jobs of an element, oldest first.
+    #
+    # Args:
+    #    element_name (str): The full name of the element
+    #    action (str): The action name of the queue, or None for all actions
+    #
+    # Returns:
+    #    (list): A list of JobRecord objects
+    #
+    def get_records(self, element_name, action=None):
+        if action is None:
+            return self._select_records("element = ?", (element_name,))
+
+        return self._select_records("element = ? AND action = ?", (element_name, action))
+
+    # get_regressions()
+    #
+    # Find the elements for which the most recent job took noticeably
+    # longer than the previous job for a different cache key.
+    #
+    # Args:
+    #    action (str): The action name of the queue
+    #    factor (float): How many times slower the latest job must be
+    #
+    # Returns:
+    #    (list): A list of (previous, latest) JobRecord tuples
+    #
+    def get_regressions(self, action, factor=1.5):
+        latest = {}
+        previous = {}
+        for record in self._select_records("action = ?", (action,)):
+            last = latest.get(record.element)
+            if last is not None and last.cache_key != record.cache_key:
+                previous[record.element] = last
+            latest[record.element] = record
+
+        return [
+            (previous[element], record)
+            for element, record in latest.items()
+            if element in previous and record.wall_time > previous[element].wall_time * factor
+        ]
+
+    # close()
+    #
+    # Write out the records collected in this session, expire old
+    # records and close the database.
+    #
+    def close(self):
+        if self._pending:
+            try:
+                connection = self._get_connection()
+                with connection:
+                    connection.executemany(
+                        "INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        [
+                            (
+                                record.element,
+                                record.cache_key,
+                                record.action,
+                                record.timestamp,
+                                record.wall_time,
+                                record.cpu_time,
+                                record.max_rss,
+                                record.artifact_size,
+                            )
+                            for record in self._pending
+                        ],
+                    )
+                    connection.execute("DELETE FROM jobs WHERE timestamp < ?", (time.time() - _HISTORY_RETENTION,))
+            except sqlite3.Error:
+                pass
+            self._pending = []
+
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    #############################################################
+    #                     Private Methods                       #
+    #############################################################
+
+    def _select_records(self, condition, args):
+        rows = self._query(
+            "SELECT element, cache_key, action, timestamp, wall_time, cpu_time, max_rss, artifact_size "
+            "FROM jobs WHERE {} ORDER BY timestamp".format(condition),
+            args,
+        )
+        return [JobRecord(*row) for row in rows]
+
+    def _query(self, query, args):
+        try:
+            return self._get_connection().execute(query, args).fetchall()
+        except sqlite3.Error:
+            return []
+
+    def _get_connection(self):
+        if self._disabled:
+            raise sqlite3.OperationalError("The job history is disabled")
+
+        if self._connection is None:
+            try:
+                os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            except OSError as e:
+                # Not worth retrying for every query, e.g. with a read-only cache directory
+                self._disabled = True
+                raise sqlite3.OperationalError("Failed to create the job history directory: {}".format(e)) from e
+
+            # Other sessions may be writing to the same history concurrently
+            self._connection = sqlite3.connect(self._path, timeout=10)
+            with self._connection:
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS jobs ("
+                    "element TEXT NOT NULL, "
+                    "cache_key TEXT, "
+                    "action TEXT NOT NULL, "
+                    "timestamp REAL NOT NULL, "
+                    "wall_time REAL NOT NULL, "
+                    "cpu_time REAL, "
+                    "max_rss INTEGER, "
+                    "artifact_size INTEGER)"
+                )
+                self._connection.execute("CREATE INDEX IF NOT EXISTS jobs_element_action ON jobs (element, action)")
+
+        return self._connection
@@ -198,6 +198,30 @@ cdef class Dependency:
                             LoadErrorReason.INVALID_DATA,
                             detail="Only dependencies required at build time may be declared `strict`.")
 
+    # restore()
+    #
+    # Restore the dependency attributes which were previously loaded
+    # with load(), from a snapshot of a previous load
+    #
+    # Args:
+    #    element (LoadElement): The resolved LoadElement
+    #    dep_type (DependencyType): The dependency type
+    #    junction (str): The junction name, or None
+    #    name (str): The element name
+    #    strict (bool): Whether this is a strict dependency
+    #    config_nodes (list): The custom config nodes, or None
+    #    node (Node): The original node of the dependency
+    #
+    def restore(self, LoadElement element, int dep_type, str junction, str name, bint strict,
+                list config_nodes, Node node):
+        self.element = element
+        self.dep_type = dep_type
+        self.junction = junction
+        self.name = name
+        self.strict = strict
+        self.config_nodes = config_nodes
+        self.node = node
+
     # merge()
     #
     # Merge the attributes of an existing dependency into this dependency
@@ -32,6 +32,7 @@ from ._loader import valid_chars_name
 from .types import Symbol
 from . import loadelement
 from .loadelement import LoadElement, Dependency, DependencyType, extract_depends_from_node
+from .loadsnapshot import LoadSnapshots
 from ..types import CoreWarnings, _KeyStrength
 from .._message import Message, MessageType
 
@@ -76,6 +77,7 @@ class Loader:
         self._elements = {}  # Dict of elements
         self._loaders = {}  # Dict of junction loaders
         self._loader_search_provenances = {}  # Dictionary of provenance nodes of ongoing child loader searches
+        self._warned = False  # Whether any warning was issued while loading
 
         self._includes = Includes(self, copy_tree=True)
 
@@ -127,15 +129,37 @@ class Loader:
 
         self._warn_invalid_elements(targets)
 
+        # Snapshots can only be taken of a toplevel project with no
+        # subprojects, and cannot be used if the loaded files need
+        # to be rewritten
+        snapshots = None
+        if self._parent is None and not self.load_context.rewritable:
+            context = self.load_context.context
+            snapshots = LoadSnapshots(os.path.join(context.cachedir, "load-snapshots"), context.yamlcache)
+
+            target_elements = snapshots.load(self, targets)
+            if target_elements is not None:
+                self.project.ensure_fully_loaded()
+                self._finish_load()
+                return target_elements
+
+        self._warned = False
+
         # First pass, recursively load files and populate our table of LoadElements
         #
         target_elements = []
+        yamlcache = self.load_context.context.yamlcache
 
-        for target in targets:
-            with PROFILER.profile(Topics.LOAD_PROJECT, target):
-                _junction, name, loader = self._parse_name(target, None)
-                element = loader._load_file(name, None)
-                target_elements.append(element)
+        try:
+            yamlcache.prefetch([os.path.join(self._basedir, target) for target in targets if ":" not in target])
+
+            for target in targets:
+                with PROFILER.profile(Topics.LOAD_PROJECT, target):
+                    _junction, name, loader = self._parse_name(target, None)
+                    element = loader._load_file(name, None)
+                    target_elements.append(element)
+        finally:
+            yamlcache.finish_prefetch()
 
         #
         # Now that we've resolved the dependencies, scan them for circular dependencies
@@ -165,11 +189,11 @@ class Loader:
             with PROFILER.profile(Topics.SORT_DEPENDENCIES, element.name):
                 loadelement.sort_dependencies(element, visited_elements)
 
-        self._clean_caches()
+        # Warnings are not issued again when loading from a snapshot
+        if snapshots is not None and not self._loaders and not self._warned:
+            snapshots.save(self, targets, target_elements)
 
-        # Cache how many Elements have just been loaded
-        if self.load_context.task:
-            self.loaded = self.load_context.task.current_progress
+        self._finish_load()
 
         return target_elements
 
@@ -269,7 +293,11 @@ class Loader:
         fullpath = os.path.join(self._basedir, filename)
         try:
             node = _yaml.load(
-                fullpath, shortname=filename, copy_tree=self.load_context.rewritable, project=self.project
+                fullpath,
+                shortname=filename,
+                copy_tree=self.load_context.rewritable,
+                project=self.project,
+                cache=self.load_context.context.yamlcache,
             )
         except LoadError as e:
             if e.reason == LoadErrorReason.MISSING_FILE:
@@ -358,6 +386,8 @@ class Loader:
             top_element = loader._load_file(filename, top_element.link_target, load_subprojects=load_subprojects)
 
         dependencies = extract_depends_from_node(top_element.node)
+        self._prefetch_dependencies(dependencies)
+
         # The loader queue is a stack of tuples
         # [0] is the LoadElement instance
         # [1] is a stack of Dependency objects to load
@@ -386,6 +416,7 @@ class Loader:
                         # need to push this onto the loader queue in this loader
                         dep_element = self._load_file_no_deps(dep.name, dep.node)
                         dep_deps = extract_depends_from_node(dep_element.node)
+                        self._prefetch_dependencies(dep_deps)
                         loader_queue.append((dep_element, list(reversed(dep_deps)), []))
 
                         # Pylint is not very happy about Cython and can't understand 'node' is a 'MappingNode'
@@ -416,6 +447,28 @@ class Loader:
         # Nothing more in the queue, return the top level element we loaded.
         return top_element
 
+    # _prefetch_dependencies():
+    #
+    # Start reading the files of dependencies which are yet to be
+    # loaded by this loader in the background, ahead of loading them
+    # one by one. As this is done for every element as soon as it is
+    # loaded, all files pending in the loader queue are read concurrently.
+    #
+    # Only reading the files is done concurrently, they are still parsed
+    # in the same order such that the loaded nodes are deterministic.
+    #
+    # Args:
+    #    dependencies (list): The Dependency objects of an element
+    #
+    def _prefetch_dependencies(self, dependencies):
+        self.load_context.context.yamlcache.prefetch(
+            [
+                os.path.join(self._basedir, dep.name)
+                for dep in dependencies
+                if not dep.junction and dep.name not in self._elements
+            ]
+        )
+
     # _check_circular_deps():
     #
     # Detect circular dependencies on LoadElements with
@@ -626,6 +679,8 @@ class Loader:
         # Handle the case where a subproject needs to be fetched
         #
         if element._should_fetch():
+            # Fetching forks jobs, which must not happen while other threads are running
+            self.load_context.context.yamlcache.suspend_prefetch()
             self.load_context.fetch_subprojects([element])
 
         sources = list(element.sources())
@@ -723,6 +778,8 @@ class Loader:
             if self.project._warning_is_fatal(warning_token):
                 raise LoadError(brief, warning_token)
 
+        self._warned = True
+
         message = Message(MessageType.WARN, brief)
         self.load_context.context.messenger.message(message)
 
@@ -768,6 +825,17 @@ class Loader:
                 warning_token=CoreWarnings.BAD_CHARACTERS_IN_NAME,
             )
 
+    # _finish_load()
+    #
+    # Clean up after loading elements
+    #
+    def _finish_load(self):
+        self._clean_caches()
+
+        # Cache how many Elements have just been loaded
+        if self.load_context.task:
+            self.loaded = self.load_context.task.current_progress
+
     # _clean_caches()
     #
     # Clean internal loader caches, recursively
@@ -0,0 +1,208 @@
+#
+#  Copyright (C) 2020 Codethink Limited
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU Lesser General Public
+#  License as published by the Free Software Foundation; either
+#  version 2 of the License, or (at your option) any later version.
+#
+#  This library is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.	 See the GNU
+#  Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public
+#  License along with this library. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import hashlib
+import os
+import pickle
+
+from .. import _yaml, utils
+from .loadelement import LoadElement, Dependency
+
+
+# The version of the snapshot format, bump this whenever the
+# format of the snapshots changes.
+_SNAPSHOT_VERSION = 2
+
+# The maximum number of snapshots to keep, the least recently
+# used snapshots are removed first.
+_MAX_SNAPSHOTS = 32
+
+
+# LoadSnapshots()
+#
+# A persistent store of snapshots of the loaded element graph, which
+# allows loading the same targets of a project again without loading
+# any element or include file, processing options and includes, or
+# checking and sorting the dependencies.
+#
+# A snapshot is keyed by the project, the targets and the values of
+# the project options, and it is only used if none of the files which
+# were loaded through the YamlCache in the session which recorded it
+# changed since.
+#
+# Snapshots are only advisory, failing to read or write them never
+# causes a session to fail.
+#
+# Args:
+#    directory (str): The directory to store the snapshots in
+#    yamlcache (YamlCache): The YamlCache of the context
+#
+class LoadSnapshots:
+    def __init__(self, directory, yamlcache):
+        self._directory = directory
+        self._yamlcache = yamlcache
+
+    # load()
+    #
+    # Load the target elements from a snapshot.
+    #
+    # Args:
+    #    loader (Loader): The toplevel Loader
+    #    targets (list): The element-path relative target filenames
+    #
+    # Returns:
+    #    (list): The target LoadElements, or None if there is no valid snapshot
+    #
+    def load(self, loader, targets):
+        path = self._get_path(loader, targets)
+
+        try:
+            with open(path, "rb") as f:
+                version, digests, files, elements, target_indices = pickle.load(f)
+        except Exception:  # pylint: disable=broad-except
+            return None
+
+        if version != _SNAPSHOT_VERSION or not self._yamlcache.verify(digests):
+            return None
+
+        # Mark the snapshot as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        file_indices = _yaml.restore_files(files, loader.project)
+
+        # Elements are recorded after all of their dependencies
+        load_elements = []
+        for name, tree, dependencies in elements:
+            element = LoadElement(_yaml.restore_node(tree, file_indices), name, loader)
+
+            for index, dep_type, junction, dep_name, strict, config_trees, dep_tree in dependencies:
+                config_nodes = None
+                if config_trees is not None:
+                    config_nodes = [_yaml.restore_node(config_tree, file_indices) for config_tree in config_trees]
+
+                dep = Dependency()
+                dep.restore(
+                    load_elements[index],
+                    dep_type,
+                    junction,
+                    dep_name,
+                    strict,
+                    config_nodes,
+                    _yaml.restore_node(dep_tree, file_indices),
+                )
+                # Pylint is not very happy with Cython and can't understand 'dependencies' is a list
+                element.dependencies.append(dep)  # pylint: disable=no-member
+
+            load_elements.append(element)
+
+        return [load_elements[index] for index in target_indices]
+
+    # save()
+    #
+    # Save a snapshot of loaded target elements.
+    #
+    # Args:
+    #    loader (Loader): The toplevel Loader
+    #    targets (list): The element-path relative target filenames
+    #    target_elements (list): The loaded target LoadElements, with sorted dependencies
+    #
+    def save(self, loader, targets, target_elements):
+        files = {}
+        elements = []
+        indices = {}
+
+        # Record the elements in depth first order, such that
+        # every element is recorded after its dependencies
+        for target in target_elements:
+            stack = [(target, iter(target.dependencies))]
+            while stack:
+                element, dependencies = stack[-1]
+                if element in indices:
+                    stack.pop()
+                    continue
+
+                dep = next(dependencies, None)
+                if dep is not None:
+                    if dep.element not in indices:
+                        stack.append((dep.element, iter(dep.element.dependencies)))
+                    continue
+
+                stack.pop()
+                indices[element] = len(elements)
+                elements.append(
+                    (
+                        element.name,
+                        _yaml.snapshot_node(element.node, files),
+                        [self._snapshot_dependency(dep, indices, files) for dep in element.dependencies],
+                    )
+                )
+
+        files = [info[1:] for info in sorted(files.values())]
+        snapshot = (
+            _SNAPSHOT_VERSION,
+            self._yamlcache.get_digests(),
+            files,
+            elements,
+            [indices[element] for element in target_elements],
+        )
+
+        try:
+            os.makedirs(self._directory, exist_ok=True)
+            with utils.save_file_atomic(self._get_path(loader, targets), "wb") as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            self._expire()
+        except OSError:
+            pass
+
+    #############################################################
+    #                     Private Methods                       #
+    #############################################################
+
+    def _get_path(self, loader, targets):
+        from .. import __version__  # pylint: disable=cyclic-import
+
+        options = {}
+        loader.project.options.printable_variables(options)
+
+        key = repr((__version__, loader.project.directory, targets, sorted(options.items())))
+        return os.path.join(self._directory, hashlib.sha256(key.encode("utf-8")).hexdigest())
+
+    def _snapshot_dependency(self, dep, indices, files):
+        config_trees = None
+        if dep.config_nodes is not None:
+            config_trees = [_yaml.snapshot_node(config_node, files) for config_node in dep.config_nodes]
+
+        return (
+            indices[dep.element],
+            dep.dep_type,
+            dep.junction,
+            dep.name,
+            dep.strict,
+            config_trees,
+            _yaml.snapshot_node(dep.node, files),
+        )
+
+    # Remove the least recently used snapshots
+    def _expire(self):
+        snapshots = [os.path.join(self._directory, name) for name in os.listdir(self._directory)]
+        if len(snapshots) > _MAX_SNAPSHOTS:
+            snapshots.sort(key=os.path.getmtime)
+            for path in snapshots[: len(snapshots) - _MAX_SNAPSHOTS]:
+                os.unlink(path)
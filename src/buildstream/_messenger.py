@@ -19,6 +19,7 @@
 
 import os
 import datetime
+import threading
 from contextlib import contextmanager
 
 from . import _signals
@@ -56,6 +57,7 @@ class Messenger:
         self._next_render = None  # A Time object
         self._active_simple_tasks = 0
         self._render_status_cb = None
+        self._message_lock = threading.RLock()  # Serializes messages sent from concurrent threads
 
     # set_message_handler()
     #
@@ -113,15 +115,20 @@ class Messenger:
     #
     def message(self, message):
 
-        # If we are recording messages, dump a copy into the open log file.
-        self._record_message(message)
+        # Sources of an element may be fetched from concurrent threads,
+        # ensure their messages are neither interleaved in the log
+        # file nor on the pipe to the frontend.
+        with self._message_lock:
 
-        # Send it off to the log handler (can be the frontend,
-        # or it can be the child task which will propagate
-        # to the frontend)
-        assert self._message_handler
+            # If we are recording messages, dump a copy into the open log file.
+            self._record_message(message)
 
-        self._message_handler(message, is_silenced=self._silent_messages())
+            # Send it off to the log handler (can be the frontend,
+            # or it can be the child task which will propagate
+            # to the frontend)
+            assert self._message_handler
+
+            self._message_handler(message, is_silenced=self._silent_messages())
 
     # silence()
     #
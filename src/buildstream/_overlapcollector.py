@@ -125,8 +125,8 @@ class OverlapCollectorSession:
         # Dictionary of files which were ignored (See FileListResult()), keyed by element unique ID
         self._ignored = {}  # type: Dict[int, List[str]]
 
-        # Dictionary of files which were staged, keyed by element unique ID
-        self._files_written = {}  # type: Dict[int, List[str]]
+        # Dictionary of the results of staging, keyed by element unique ID
+        self._results = {}  # type: Dict[int, FileListResult]
 
         # Dictionary of element IDs which overlapped, keyed by the file they overlap on
         self._overlaps = {}  # type: Dict[str, List[int]]
@@ -155,8 +155,8 @@ class OverlapCollectorSession:
                 # Search files which were staged in this session, start the
                 # list off with the bottom most element
                 #
-                for element_id, staged_files in self._files_written.items():
-                    if overwritten_file in staged_files:
+                for element_id, staged_result in self._results.items():
+                    if staged_result._is_written(overwritten_file):
                         overlap_list.append(element_id)
                         break
 
@@ -166,9 +166,10 @@ class OverlapCollectorSession:
             #
             overlap_list.append(element._unique_id)
 
-        # Record written files and ignored files.
+        # Record written files and ignored files, the written files are
+        # only looked up in the result to avoid listing all of them.
         #
-        self._files_written[element._unique_id] = result.files_written
+        self._results[element._unique_id] = result
         if result.ignored:
             self._ignored[element._unique_id] = result.ignored
 
@@ -271,12 +272,9 @@ class OverlapCollectorSession:
     #
     def _search_stage_element(self, filename: str, sessions: List["OverlapCollectorSession"]) -> Tuple[int, str]:
         for session in reversed(sessions):
-            for element_id, staged_files in session._files_written.items():
-                if any(
-                    staged_file
-                    for staged_file in staged_files
-                    if os.path.join(session._location, staged_file) == filename
-                ):
+            staged_file = os.path.relpath(filename, session._location)
+            for element_id, staged_result in session._results.items():
+                if staged_result._is_written(staged_file):
                     return element_id, session._location
 
         assert False, "Could not find element responsible for staging: {}".format(filename)
@@ -30,7 +30,8 @@ from ._exceptions import PipelineError
 from ._message import Message, MessageType
 from ._profile import Topics, PROFILER
 from ._project import ProjectRefStorage
-from .types import _PipelineSelection, _Scope
+from ._scheduler import BuildQueue
+from .types import _PipelineSelection, _SchedulingMode, _Scope
 
 
 # Pipeline()
@@ -100,8 +101,9 @@ class Pipeline:
     #
     # Args:
     #    targets (list of Element): The list of toplevel element targets
+    #    query_remotes (bool): Whether to query the artifact remotes for uncached artifacts
     #
-    def resolve_elements(self, targets):
+    def resolve_elements(self, targets, *, query_remotes=False):
         with self._context.messenger.simple_task("Resolving cached state", silent_nested=True) as task:
             # We need to go through the project to access the loader
             if task:
@@ -112,7 +114,27 @@ class Pipeline:
             # to happen, even for large projects (tested with the Debian stack). Although,
             # if it does become a problem we may have to set the recursion limit to a
             # greater value.
-            for element in self.dependencies(targets, _Scope.ALL):
+            elements = list(self.dependencies(targets, _Scope.ALL))
+
+            # Calculate the cache keys first, such that the cached state
+            # of all artifacts can be queried in bulk rather than separately
+            # for each element.
+            prepared = [(element, artifact) for element in elements for artifact in element._prepare_cache_query()]
+            self._artifacts.query_cached([artifact for _, artifact in prepared])
+
+            if query_remotes and self._artifacts.has_fetch_remotes():
+                # Also query the remotes for all artifacts which are not
+                # cached locally, so that elements which cannot be pulled
+                # are known before scheduling anything.
+                self._artifacts.query_remotes(
+                    [
+                        (element, artifact.get_extract_key())
+                        for element, artifact in prepared
+                        if not artifact.cached() and not element._get_workspace()
+                    ]
+                )
+
+            for element in elements:
                 # Determine initial element state.
                 element._initialize_state()
 
@@ -135,6 +157,8 @@ class Pipeline:
         with self._context.messenger.simple_task("Querying remotes for cached status", silent_nested=True) as task:
             task.set_maximum_progress(len(targets))
 
+            self._artifacts.query_remotes([(element, element._get_cache_key()) for element in targets])
+
             for element in targets:
                 element._cached_remotely()
 
@@ -176,8 +200,15 @@ class Pipeline:
         # Keep locally cached elements in the plan if remote artifact cache is used
         # to allow pulling artifact with strict cache key, if available.
         plan_cached = not self._context.get_strict() and self._artifacts.has_fetch_remotes()
+        critical_path = self._context.sched_mode == _SchedulingMode.CRITICAL_PATH
+
+        if critical_path:
+            # Weigh the critical path with the build durations of past sessions
+            planner = _Planner(self._context.jobhistory.get_durations(BuildQueue.action_name))
+        else:
+            planner = _Planner()
 
-        return _Planner().plan(elements, plan_cached)
+        return planner.plan(elements, plan_cached, critical_path=critical_path)
 
     # get_selection()
     #
@@ -454,10 +485,25 @@ class Pipeline:
 # parts need to be built depending on build only dependencies
 # being cached, and depth sorting for more efficient processing.
 #
+# When planning for the critical path, the planned elements are
+# additionally weighed by the longest chain of builds which cannot
+# start before they are processed, and the scheduling priority
+# of each element is derived from that weight instead of its depth.
+#
+# Args:
+#    durations (dict): Known build durations in seconds, keyed by full element name
+#
 class _Planner:
-    def __init__(self):
+    def __init__(self, durations=None):
         self.depth_map = OrderedDict()
         self.visiting_elements = set()
+        self.durations = durations or {}
+
+        # Elements which were never built before are assumed to take an average time
+        if self.durations:
+            self.default_duration = sum(self.durations.values()) / len(self.durations)
+        else:
+            self.default_duration = 1
 
     # Here we want to traverse the same element more than once when
     # it is reachable from multiple places, with the interest of finding
@@ -484,14 +530,99 @@ class _Planner:
         self.depth_map[element] = depth
         self.visiting_elements.remove(element)
 
-    def plan(self, roots, plan_cached):
+    def plan(self, roots, plan_cached, *, critical_path=False):
         for root in roots:
             self.plan_element(root, 0)
 
         depth_sorted = sorted(self.depth_map.items(), key=itemgetter(1), reverse=True)
 
-        # Set the depth of each element
-        for index, item in enumerate(depth_sorted):
-            item[0]._set_depth(index)
+        if critical_path:
+            scheduling_order = self.critical_path_sort([item[0] for item in depth_sorted])
+        else:
+            scheduling_order = [item[0] for item in depth_sorted]
+
+        # Set the depth of each element, which determines the order in
+        # which ready elements are picked up by the scheduler queues
+        for index, element in enumerate(scheduling_order):
+            element._set_depth(index)
 
         return [item[0] for item in depth_sorted if plan_cached or not item[0]._cached_success()]
+
+    # critical_path_sort()
+    #
+    # Sorts the planned elements by the length of the critical path
+    # which they block, the longest first.
+    #
+    # An element blocks the builds of its reverse build dependencies, and
+    # anything which is blocked by its reverse runtime dependencies. The
+    # weight of an element is its own cost plus the heaviest chain of builds
+    # it blocks, ties are broken by the number of planned elements which
+    # are blocked by the element, and finally by depth.
+    #
+    # Args:
+    #    elements (list of Element): The planned elements, in depth sorted order
+    #
+    # Returns:
+    #    (list of Element): The planned elements, heaviest first
+    #
+    def critical_path_sort(self, elements):
+        dependencies = {}
+        pending_dependents = {element: 0 for element in elements}
+
+        for element in elements:
+            deps = [(dep, False) for dep in element._dependencies(_Scope.RUN, recurse=False)]
+            if not element._cached_success():
+                deps.extend((dep, True) for dep in element._dependencies(_Scope.BUILD, recurse=False))
+
+            dependencies[element] = [(dep, build) for dep, build in deps if dep in pending_dependents]
+            for dep, _ in dependencies[element]:
+                pending_dependents[dep] += 1
+
+        # The heaviest chain of builds blocked by each element, excluding itself
+        blocked_weight = {element: 0 for element in elements}
+        # The unique ids of all the elements blocked by each element
+        blocked = {element: BitMap() for element in elements}
+        weight = {}
+
+        # Visit the elements from the top of the graph, such that all the
+        # elements blocked by an element are weighed before the element itself
+        queue = [element for element in elements if pending_dependents[element] == 0]
+        while queue:
+            element = queue.pop()
+            weight[element] = self.cost(element) + blocked_weight[element]
+
+            for dep, build in dependencies[element]:
+                if build:
+                    blocked_weight[dep] = max(blocked_weight[dep], weight[element])
+                    blocked[dep].add(element._unique_id)
+                else:
+                    blocked_weight[dep] = max(blocked_weight[dep], blocked_weight[element])
+                blocked[dep] |= blocked[element]
+
+                pending_dependents[dep] -= 1
+                if pending_dependents[dep] == 0:
+                    queue.append(dep)
+
+        depth_order = {element: index for index, element in enumerate(elements)}
+
+        return sorted(
+            elements,
+            key=lambda element: (
+                -weight.get(element, blocked_weight[element]),
+                -len(blocked[element]),
+                depth_order[element],
+            ),
+        )
+
+    # cost()
+    #
+    # The cost of processing an element on the critical path
+    #
+    # Args:
+    #    element (Element): The element to weigh
+    #
+    # Returns:
+    #    (float): The expected build duration of the element
+    #
+    def cost(self, element):
+        return self.durations.get(element._get_full_name(), self.default_duration)
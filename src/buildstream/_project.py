@@ -76,6 +76,7 @@ class ProjectConfig:
     def __init__(self):
         self.options = None  # OptionPool
         self.base_variables = {}  # The base set of variables
+        self.variables_layers = {}  # Resolved Variables shared by the elements of each kind
         self.element_overrides = {}  # Element specific configurations
         self.source_overrides = {}  # Source specific configurations
         self.mirrors = OrderedDict()  # contains dicts of alias-mappings to URIs.
@@ -773,7 +774,9 @@ class Project:
 
         # Load project local config and override the builtin
         try:
-            self._project_conf = _yaml.load(projectfile, shortname=_PROJECT_CONF_FILE, project=self)
+            self._project_conf = _yaml.load(
+                projectfile, shortname=_PROJECT_CONF_FILE, project=self, cache=self._context.yamlcache
+            )
         except LoadError as e:
             # Raise a more specific error here
             if e.reason == LoadErrorReason.MISSING_FILE:
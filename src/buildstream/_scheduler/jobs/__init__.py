@@ -17,5 +17,5 @@
 #  Authors:
 #        Tristan Maat <tristan.maat@codethink.co.uk>
 
-from .elementjob import ElementJob
+from .elementjob import ElementJob, ElementBatchJob
 from .job import JobStatus
@@ -17,7 +17,8 @@
 #        Tristan Daniël Maat <tristan.maat@codethink.co.uk>
 #
 
-from .job import Job, ChildJob
+from .job import Job, ChildJob, JobStatus, _ReturnCode
+from ... import _signals
 
 
 # ElementJob()
@@ -80,6 +81,14 @@ class ElementJob(Job):
     def create_child_job(self, *args, **kwargs):
         return ChildElementJob(*args, element=self._element, action_cb=self._action_cb, **kwargs)
 
+    # get_elements()
+    #
+    # Returns:
+    #    (list): The elements which this job works on
+    #
+    def get_elements(self):
+        return [self._element]
+
 
 class ChildElementJob(ChildJob):
     def __init__(self, *args, element, action_cb, **kwargs):
@@ -100,3 +109,173 @@ class ChildElementJob(ChildJob):
             data["workspace"] = workspace.to_dict()
 
         return data
+
+
+# ElementBatchJob()
+#
+# A job which runs the same action for several elements, one after
+# the other, in a single child process. This avoids the cost of starting
+# a process for each element when the action is expected to be short.
+#
+# Every element is logged to its own log file and is reported to the
+# `element_cb` as soon as it completes. Temporary failures are retried
+# for each element in the child process.
+#
+# If an element fails, the child process exits and the failure is
+# reported for that element, the elements which were not processed yet
+# are handed back with the `complete_cb`.
+#
+# Args:
+#    scheduler (Scheduler): The scheduler
+#    action_name (str): The queue action name
+#    logfiles (list): The log file template of each element
+#    max_retries (int): The maximum number of retries for each element
+#    elements (list): The Elements to work on, in processing order
+#    action_cb (callable): The function to execute on the child for each element
+#    element_cb (callable): The function to execute when an element completes
+#    complete_cb (callable): The function to execute when the job completes
+#
+# Here is the calling signature of the element_cb, which is the same
+# as the `complete_cb` of the ElementJob:
+#
+#     element_cb():
+#
+#     Args:
+#        job (Job): The job object which processed the element
+#        element (Element): The element which completed
+#        status (JobStatus): The status of the element
+#        result (object): The deserialized object returned by the `action_cb`
+#
+# Here is the calling signature of the complete_cb:
+#
+#     complete_cb():
+#
+#     Args:
+#        job (Job): The job object which completed
+#        remaining (list): The elements which were not processed
+#
+class ElementBatchJob(Job):
+    def __init__(
+        self, scheduler, action_name, logfiles, *, elements, queue, action_cb, element_cb, complete_cb, **kwargs
+    ):
+        super().__init__(scheduler, action_name, logfiles[0], **kwargs)
+        self.set_name(elements[0]._get_full_name())
+        self.queue = queue
+        self._elements = elements  # The Elements to work on
+        self._logfiles = logfiles  # The log file template for each element
+        self._action_cb = action_cb  # The action callable function
+        self._element_cb = element_cb  # The element completion callable function
+        self._complete_cb = complete_cb  # The complete callable function
+        self._completed = 0  # The number of elements which completed
+
+        self._set_current_element()
+
+    def parent_element_complete(self, status):
+        self._element_cb(self, self._element, status, self._result)
+
+        # Reset the data of the child for the next element
+        self._result = None
+        self.child_data = None
+        self.usage = None
+
+        self._completed += 1
+        if self._completed < len(self._elements):
+            self._set_current_element()
+
+    def parent_complete(self, status, result):
+        remaining = self._elements[self._completed :]
+
+        # The element which was being processed did not complete
+        if status != JobStatus.OK and remaining:
+            self._element_cb(self, remaining.pop(0), JobStatus.FAIL, result)
+
+        self._complete_cb(self, remaining)
+
+    def create_child_job(self, *args, **kwargs):
+        return ChildElementBatchJob(
+            *args,
+            elements=self._elements,
+            logfiles=self._logfiles,
+            message_keys=[element._get_display_key() for element in self._elements],
+            action_cb=self._action_cb,
+            **kwargs
+        )
+
+    # get_elements()
+    #
+    # Returns:
+    #    (list): The elements which this job works on
+    #
+    def get_elements(self):
+        return self._elements
+
+    # _set_current_element()
+    #
+    # Sets the element which is being processed, which failures
+    # and messages are attributed to.
+    #
+    def _set_current_element(self):
+        self._element = self._elements[self._completed]
+        self.set_message_element_name(self._element._get_full_name())
+        self.set_message_element_key(self._element._get_display_key())
+
+
+class ChildElementBatchJob(ChildJob):
+    def __init__(self, *args, elements, logfiles, message_keys, action_cb, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._elements = elements
+        self._logfiles = logfiles
+        self._message_keys = message_keys
+        self._action_cb = action_cb
+        self._element = None
+
+    def child_process(self):
+
+        # Run the action
+        return self._action_cb(self._element)
+
+    def child_process_data(self):
+        data = {}
+
+        workspace = self._element._get_workspace()
+        if workspace is not None:
+            data["workspace"] = workspace.to_dict()
+
+        return data
+
+    def child_action(self, pipe_w):
+        self._child_setup(pipe_w)
+
+        # Graciously handle sigterms.
+        def handle_sigterm():
+            self._child_shutdown(_ReturnCode.TERMINATED)
+
+        returncode = _ReturnCode.OK
+        with _signals.terminator(handle_sigterm):
+            for element, logfile, message_key in zip(self._elements, self._logfiles, self._message_keys):
+                self._element = element
+                self._logfile = logfile
+                self._message_element_name = element._get_full_name()
+                self._message_element_key = message_key
+
+                # Retry temporary failures right here, as restarting
+                # the process would process the whole batch again
+                self._tries = 0
+                returncode = _ReturnCode.FAIL
+                while returncode == _ReturnCode.FAIL and self._tries <= self._max_retries:
+                    self._tries += 1
+                    returncode = self._child_run_action()
+
+                if returncode == _ReturnCode.OK:
+                    self._child_send_element_done(JobStatus.OK)
+                elif returncode == _ReturnCode.SKIPPED:
+                    self._child_send_element_done(JobStatus.SKIPPED)
+                else:
+                    # Retries were already exhausted, the failure is permanent
+                    returncode = _ReturnCode.PERM_FAIL
+                    break
+
+        # Shutdown needs to stay outside of the above context manager,
+        # make sure we dont try to handle SIGTERM while the process
+        # is already busy in sys.exit()
+        self._child_shutdown(returncode)
@@ -26,6 +26,7 @@ import datetime
 import itertools
 import multiprocessing
 import os
+import resource
 import signal
 import sys
 import traceback
@@ -35,6 +36,7 @@ from ..._exceptions import ImplError, BstError, set_last_task_error, SkipJob
 from ..._message import Message, MessageType, unconditional_messages
 from ...types import FastEnum
 from ... import _signals, utils
+from ...sandbox._sandboxremote import close_connection_pool
 from .. import _multiprocessing
 
 
@@ -77,6 +79,29 @@ class _MessageType(FastEnum):
     ERROR = 2
     RESULT = 3
     CHILD_DATA = 4
+    USAGE = 5
+    ELEMENT_DONE = 6
+
+
+# JobUsage()
+#
+# The resources used by the child process of a successful job
+#
+# Args:
+#    wall_time (float): The wall clock time taken, excluding suspended time, in seconds
+#    cpu_time (float): The CPU time used by the job and its subprocesses, in seconds
+#    max_rss (int): The peak resident set size of the job or its largest subprocess, in bytes,
+#                   or None if unknown
+#
+# When a child process runs the actions of several elements, the peak
+# resident set size is only known for the first action, and for actions
+# during which the peak of the process increased.
+#
+class JobUsage:
+    def __init__(self, wall_time, cpu_time, max_rss):
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        self.max_rss = max_rss
 
 
 # Job()
@@ -124,6 +149,7 @@ class Job:
         self.name = None  # The name of the job, set by the job's subclass
         self.action_name = action_name  # The action name for the Queue
         self.child_data = None  # Data to be sent to the main process
+        self.usage = None  # The JobUsage reported by a successful child process
 
         #
         # Private members
@@ -345,6 +371,17 @@ class Job:
     def parent_complete(self, status, result):
         raise ImplError("Job '{kind}' does not implement parent_complete()".format(kind=type(self).__name__))
 
+    # parent_element_complete()
+    #
+    # This will be executed in the main process when a job which processes
+    # several elements reports that one of them completed successfully.
+    #
+    # Args:
+    #    status (JobStatus): The status of the completed element
+    #
+    def parent_element_complete(self, status):
+        raise ImplError("Job '{kind}' does not implement parent_element_complete()".format(kind=type(self).__name__))
+
     # create_child_job()
     #
     # Called by a Job instance to create a child job.
@@ -468,6 +505,10 @@ class Job:
         elif envelope.message_type is _MessageType.CHILD_DATA:
             # If we retry a job, we assign a new value to this
             self.child_data = envelope.message
+        elif envelope.message_type is _MessageType.USAGE:
+            self.usage = envelope.message
+        elif envelope.message_type is _MessageType.ELEMENT_DONE:
+            self.parent_element_complete(envelope.message)
         else:
             assert False, "Unhandled message type '{}': {}".format(envelope.message_type, envelope.message)
 
@@ -551,6 +592,7 @@ class ChildJob:
         self._message_element_key = message_element_key
 
         self._pipe_w = None  # The write end of a pipe for message passing
+        self._actions_run = 0  # The number of actions run in this process
 
     # message():
     #
@@ -619,6 +661,32 @@ class ChildJob:
     #    pipe_w (multiprocessing.connection.Connection): The message pipe for IPC
     #
     def child_action(self, pipe_w):
+        self._child_setup(pipe_w)
+
+        # Graciously handle sigterms.
+        def handle_sigterm():
+            self._child_shutdown(_ReturnCode.TERMINATED)
+
+        with _signals.terminator(handle_sigterm):
+            returncode = self._child_run_action()
+
+        # Shutdown needs to stay outside of the above context manager,
+        # make sure we dont try to handle SIGTERM while the process
+        # is already busy in sys.exit()
+        self._child_shutdown(returncode)
+
+    #######################################################
+    #                  Local Private Methods              #
+    #######################################################
+
+    # _child_setup()
+    #
+    # Prepares the freshly started child process for running actions
+    #
+    # Args:
+    #    pipe_w (multiprocessing.connection.Connection): The message pipe for IPC
+    #
+    def _child_setup(self, pipe_w):
 
         # This avoids some SIGTSTP signals from grandchildren
         # getting propagated up to the master process
@@ -639,15 +707,23 @@ class ChildJob:
         self._pipe_w = pipe_w
         self._messenger.set_message_handler(self._child_message_handler)
 
-        # Graciously handle sigterms.
-        def handle_sigterm():
-            self._child_shutdown(_ReturnCode.TERMINATED)
+    # _child_run_action()
+    #
+    # Time, log and run the action function once, reporting
+    # the outcome to the parent process.
+    #
+    # Returns:
+    #    (_ReturnCode): The return code describing the outcome
+    #
+    def _child_run_action(self):
+        # The resource usage of the process is cumulative, take
+        # a baseline as several actions may run in this process
+        usage_baseline = None
+        if self._actions_run > 0:
+            usage_baseline = self._child_get_usage()
+        self._actions_run += 1
 
-        # Time, log and and run the action function
-        #
-        with _signals.terminator(
-            handle_sigterm
-        ), self._messenger.timed_suspendable() as timeinfo, self._messenger.recorded_messages(
+        with self._messenger.timed_suspendable() as timeinfo, self._messenger.recorded_messages(
             self._logfile, self._logdir
         ) as filename:
             self.message(MessageType.START, self.action_name, logfile=filename)
@@ -660,7 +736,7 @@ class ChildJob:
                 self.message(MessageType.SKIPPED, str(e), elapsed=elapsed, logfile=filename)
 
                 # Alert parent of skip by return code
-                self._child_shutdown(_ReturnCode.SKIPPED)
+                return _ReturnCode.SKIPPED
             except BstError as e:
                 elapsed = datetime.datetime.now() - timeinfo.start_time
                 retry_flag = e.temporary
@@ -684,7 +760,7 @@ class ChildJob:
 
                 # Set return code based on whether or not the error was temporary.
                 #
-                self._child_shutdown(_ReturnCode.FAIL if retry_flag else _ReturnCode.PERM_FAIL)
+                return _ReturnCode.FAIL if retry_flag else _ReturnCode.PERM_FAIL
 
             except Exception:  # pylint: disable=broad-except
 
@@ -697,7 +773,7 @@ class ChildJob:
 
                 self.message(MessageType.BUG, self.action_name, elapsed=elapsed, detail=detail, logfile=filename)
                 # Unhandled exceptions should permenantly fail
-                self._child_shutdown(_ReturnCode.PERM_FAIL)
+                return _ReturnCode.PERM_FAIL
 
             else:
                 # No exception occurred in the action
@@ -705,16 +781,10 @@ class ChildJob:
                 self._child_send_result(result)
 
                 elapsed = datetime.datetime.now() - timeinfo.start_time
+                self._child_send_usage(elapsed, usage_baseline)
                 self.message(MessageType.SUCCESS, self.action_name, elapsed=elapsed, logfile=filename)
 
-                # Shutdown needs to stay outside of the above context manager,
-                # make sure we dont try to handle SIGTERM while the process
-                # is already busy in sys.exit()
-                self._child_shutdown(_ReturnCode.OK)
-
-    #######################################################
-    #                  Local Private Methods              #
-    #######################################################
+                return _ReturnCode.OK
 
     # _send_message()
     #
@@ -762,6 +832,60 @@ class ChildJob:
         if result is not None:
             self._send_message(_MessageType.RESULT, result)
 
+    # _child_send_element_done()
+    #
+    # Reports the successful completion of one of the elements
+    # processed by this child process to the main process
+    #
+    # Args:
+    #    status (JobStatus): The status of the completed element
+    #
+    def _child_send_element_done(self, status):
+        self._send_message(_MessageType.ELEMENT_DONE, status)
+
+    # _child_get_usage()
+    #
+    # Gets the resources used by this child process and its subprocesses
+    #
+    # Returns:
+    #    (float): The CPU time used so far, in seconds
+    #    (int): The peak resident set size so far, in bytes
+    #
+    def _child_get_usage(self):
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+        cpu_time = usage.ru_utime + usage.ru_stime + children_usage.ru_utime + children_usage.ru_stime
+
+        # ru_maxrss is reported in kilobytes
+        max_rss = max(usage.ru_maxrss, children_usage.ru_maxrss) * 1024
+
+        return cpu_time, max_rss
+
+    # _child_send_usage()
+    #
+    # Sends the resources used by the action to the main
+    # process through the message pipe
+    #
+    # Args:
+    #    elapsed (datetime.timedelta): The time taken by the action
+    #    baseline (tuple): The usage before the action, as returned by
+    #                      _child_get_usage(), or None for the first action
+    #
+    def _child_send_usage(self, elapsed, baseline):
+        cpu_time, max_rss = self._child_get_usage()
+
+        if baseline is not None:
+            baseline_cpu_time, baseline_max_rss = baseline
+            cpu_time -= baseline_cpu_time
+
+            # The peak of this action is unknown unless it
+            # exceeds the peak of the previous actions
+            if max_rss <= baseline_max_rss:
+                max_rss = None
+
+        self._send_message(_MessageType.USAGE, JobUsage(elapsed.total_seconds(), cpu_time, max_rss))
+
     # _child_shutdown()
     #
     # Shuts down the child process by cleaning up and exiting the process
@@ -770,6 +894,7 @@ class ChildJob:
     #    exit_code (_ReturnCode): The exit code to exit with
     #
     def _child_shutdown(self, exit_code):
+        close_connection_pool()
         self._pipe_w.close()
         assert isinstance(exit_code, _ReturnCode)
         sys.exit(exit_code.value)
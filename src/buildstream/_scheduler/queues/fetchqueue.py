@@ -38,11 +38,27 @@ class FetchQueue(Queue):
         self._skip_cached = skip_cached
         self._should_fetch_original = fetch_original
 
+        self._fetchers_per_element = max(scheduler.context.sched_fetchers_per_element, 1)
+        self._job_fetchers = {}  # Extra fetcher slots reserved by each job
+        self._element_fetchers = {}  # Number of sources of each element which may be fetched concurrently
+
     def get_process_func(self):
         if self._should_fetch_original:
-            return FetchQueue._fetch_original
+            return self._fetch_original
         else:
-            return FetchQueue._fetch_not_original
+            return self._fetch_not_original
+
+    def harvest_jobs(self):
+        jobs = super().harvest_jobs()
+
+        # Let elements with several sources fetch them concurrently,
+        # using the fetcher slots which are left over once every
+        # ready element got its own job.
+        if self._fetchers_per_element > 1:
+            for job in jobs:
+                self._reserve_fetchers(job)
+
+        return jobs
 
     def status(self, element):
         # Optionally skip elements that are already in the artifact cache
@@ -73,10 +89,51 @@ class FetchQueue(Queue):
         # to be processed in the fetch queue.
         element._set_can_query_cache_callback(self._enqueue_element)
 
-    @staticmethod
-    def _fetch_not_original(element):
-        element._fetch(fetch_original=False)
-
-    @staticmethod
-    def _fetch_original(element):
-        element._fetch(fetch_original=True)
+    def _fetch_not_original(self, element):
+        element._fetch(fetch_original=False, fetchers=self._element_fetchers.get(element, 1))
+
+    def _fetch_original(self, element):
+        element._fetch(fetch_original=True, fetchers=self._element_fetchers.get(element, 1))
+
+    # _reserve_fetchers()
+    #
+    # Reserve extra fetcher slots for a job, as long as they are
+    # available and useful to its elements.
+    #
+    # Args:
+    #    job (Job): The job to reserve fetcher slots for
+    #
+    def _reserve_fetchers(self, job):
+        elements = job.get_elements()
+        wanted = min(max(len(list(element.sources())) for element in elements), self._fetchers_per_element)
+
+        fetchers = 1
+        while fetchers < wanted and self._resources.reserve(self.resources):
+            fetchers += 1
+
+        if fetchers > 1:
+            self._job_fetchers[job] = fetchers - 1
+            for element in elements:
+                self._element_fetchers[element] = fetchers
+
+    # _release_fetchers()
+    #
+    # Release the extra fetcher slots reserved for a job
+    #
+    # Args:
+    #    job (Job): The job which completed
+    #
+    def _release_fetchers(self, job):
+        for _ in range(self._job_fetchers.pop(job, 0)):
+            self._resources.release(self.resources)
+
+        for element in job.get_elements():
+            self._element_fetchers.pop(element, None)
+
+    def _job_done(self, job, element, status, result):
+        self._release_fetchers(job)
+        super()._job_done(job, element, status, result)
+
+    def _batch_done(self, job, remaining):
+        self._release_fetchers(job)
+        super()._batch_done(job, remaining)
@@ -26,7 +26,7 @@ import traceback
 from typing import TYPE_CHECKING
 
 # Local imports
-from ..jobs import ElementJob, JobStatus
+from ..jobs import ElementJob, ElementBatchJob, JobStatus
 from ..resources import ResourceType
 
 # BuildStream toplevel imports
@@ -75,6 +75,7 @@ class Queue:
         self._ready_queue = []  # Ready elements
         self._done_queue = deque()  # Processed / Skipped elements
         self._max_retries = 0
+        self._batch_size = 1  # Maximum number of elements to process in a single job
 
         self._required_element_check = False  # Whether we should check that elements are required before enqueuing
 
@@ -85,6 +86,10 @@ class Queue:
         if ResourceType.UPLOAD in self.resources or ResourceType.DOWNLOAD in self.resources:
             self._max_retries = scheduler.context.sched_network_retries
 
+        # Jobs which do not run builds are short enough to be batched
+        if ResourceType.PROCESS not in self.resources:
+            self._batch_size = max(scheduler.context.sched_batch_size, 1)
+
         self._task_group = self._scheduler._state.add_task_group(self.action_name, self.complete_name)
 
     # destroy()
@@ -164,6 +169,20 @@ class Queue:
     def register_pending_element(self, element):
         raise ImplError("Queue type: {} does not implement register_pending_element()".format(self.action_name))
 
+    # get_artifact_size()
+    #
+    # Virtual method for reporting the size of the artifact created
+    # by a successful job, which is recorded in the job history.
+    #
+    # Args:
+    #    result (any): The return value of the process() implementation
+    #
+    # Returns:
+    #    (int|None): The size of the created artifact, or None
+    #
+    def get_artifact_size(self, result):
+        return None
+
     #####################################################
     #          Scheduler / Pipeline facing APIs         #
     #####################################################
@@ -217,6 +236,9 @@ class Queue:
     #     ([Job]): A list of jobs which can be run now
     #
     def harvest_jobs(self):
+        if self._batch_size > 1:
+            return self._harvest_batch_jobs()
+
         ready = []
         while self._ready_queue:
             # Now reserve them
@@ -227,19 +249,7 @@ class Queue:
             _, element = heapq.heappop(self._ready_queue)
             ready.append(element)
 
-        return [
-            ElementJob(
-                self._scheduler,
-                self.action_name,
-                self._element_log_path(element),
-                element=element,
-                queue=self,
-                action_cb=self.get_process_func(),
-                complete_cb=self._job_done,
-                max_retries=self._max_retries,
-            )
-            for element in ready
-        ]
+        return [self._create_job(element) for element in ready]
 
     # set_required_element_check()
     #
@@ -258,6 +268,73 @@ class Queue:
     #                 Private Methods                   #
     #####################################################
 
+    # _harvest_batch_jobs()
+    #
+    # Spawn as many jobs from the ready queue for which resources
+    # can be reserved, letting each job process a batch of elements
+    # when there are more ready elements than resources.
+    #
+    # Returns:
+    #     ([Job]): A list of jobs which can be run now
+    #
+    def _harvest_batch_jobs(self):
+        reserved = 0
+        while reserved < len(self._ready_queue) and self._resources.reserve(self.resources):
+            reserved += 1
+
+        if not reserved:
+            return []
+
+        count = min(len(self._ready_queue), reserved * self._batch_size)
+        ready = [heapq.heappop(self._ready_queue)[1] for _ in range(count)]
+
+        # Deal the elements out to the batches in order, such that
+        # the first elements of every batch are the most important ones
+        batches = [ready[index::reserved] for index in range(reserved)]
+
+        jobs = []
+        for batch in batches:
+            if len(batch) == 1:
+                jobs.append(self._create_job(batch[0]))
+            else:
+                jobs.append(
+                    ElementBatchJob(
+                        self._scheduler,
+                        self.action_name,
+                        [self._element_log_path(element) for element in batch],
+                        elements=batch,
+                        queue=self,
+                        action_cb=self.get_process_func(),
+                        element_cb=self._element_done,
+                        complete_cb=self._batch_done,
+                        max_retries=self._max_retries,
+                    )
+                )
+
+        return jobs
+
+    # _create_job()
+    #
+    # Create a job to process a single element
+    #
+    # Args:
+    #    element (Element): The element to process
+    #
+    # Returns:
+    #    (ElementJob): The job to run
+    #
+    def _create_job(self, element):
+        return ElementJob(
+            self._scheduler,
+            self.action_name,
+            self._element_log_path(element),
+            element=element,
+            queue=self,
+            action_cb=self.get_process_func(),
+            complete_cb=self._job_done,
+            max_retries=self._max_retries,
+        )
+
     # _update_workspaces()
     #
     # Updates and possibly saves the workspaces in the
@@ -305,6 +382,42 @@ class Queue:
         #
         self._resources.release(self.resources)
 
+        self._element_done(job, element, status, result)
+
+    # _batch_done()
+    #
+    # A callback reported by the ElementBatchJob() when a job completes,
+    # after each of its processed elements were reported to _element_done().
+    #
+    # Args:
+    #    job (ElementBatchJob): The job which completed
+    #    remaining (list): The elements which the job did not process
+    #
+    def _batch_done(self, job, remaining):
+
+        # Now release the resources we reserved
+        #
+        self._resources.release(self.resources)
+
+        # Elements which were not processed are ready to be picked up again
+        for element in remaining:
+            heapq.heappush(self._ready_queue, (element._depth, element))
+
+    # _element_done()
+    #
+    # Processes the completion of an element by a job
+    #
+    # This will call the Queue implementation specific Queue.done()
+    # implementation and place the element on the done queue.
+    #
+    # Args:
+    #    job (Job): The job which processed the element
+    #    element (Element): The element which completed
+    #    status (JobStatus): The status of the element
+    #    result (any): The return value of the process() implementation
+    #
+    def _element_done(self, job, element, status, result):
+
         # Update values that need to be synchronized in the main task
         # before calling any queue implementation
         self._update_workspaces(element, job)
@@ -345,9 +458,31 @@ class Queue:
                 self._task_group.add_skipped_task()
             elif status == JobStatus.OK:
                 self._task_group.add_processed_task()
+                self._record_job(job, element, result)
             else:
                 self._task_group.add_failed_task(element._get_full_name())
 
+    # _record_job()
+    #
+    # Records the resources used by a successful job in the job history
+    #
+    # Args:
+    #    job (Job): The job which completed
+    #    element (Element): The element which completed
+    #    result (any): The return value of the process() implementation
+    #
+    def _record_job(self, job, element, result):
+        if job.usage is None:
+            return
+
+        self._scheduler.context.jobhistory.record(
+            element._get_full_name(),
+            element._get_cache_key(),
+            self.action_name,
+            job.usage,
+            artifact_size=self.get_artifact_size(result),
+        )
+
     # Convenience wrapper for Queue implementations to send
     # a message for the element they are processing
     def _message(self, element, message_type, brief, **kwargs):
@@ -273,6 +273,7 @@ class Stream:
             artifact_remote_url=remote,
             use_source_config=True,
             dynamic_plan=True,
+            query_remotes=True,
         )
 
         # Assert that the elements are consistent
@@ -436,6 +437,7 @@ class Stream:
             use_artifact_config=use_config,
             artifact_remote_url=remote,
             load_refs=True,
+            query_remotes=True,
         )
 
         if not self._artifacts.has_fetch_remotes():
@@ -1210,6 +1212,7 @@ class Stream:
     #    use_source_config (bool): Whether to initialize remote source caches with the config
     #    artifact_remote_url (str): A remote url for initializing the artifacts
     #    source_remote_url (str): A remote url for initializing source caches
+    #    query_remotes (bool): Whether to query the artifact remotes while resolving elements
     #
     # Returns:
     #    (list of Element): The primary element selection
@@ -1226,7 +1229,8 @@ class Stream:
         artifact_remote_url=None,
         source_remote_url=None,
         dynamic_plan=False,
-        load_refs=False
+        load_refs=False,
+        query_remotes=False
     ):
         elements, except_elements, artifacts = self._load_elements_from_targets(
             targets, except_targets, rewritable=False
@@ -1250,7 +1254,7 @@ class Stream:
 
         # Now move on to loading primary selection.
         #
-        self._pipeline.resolve_elements(self.targets)
+        self._pipeline.resolve_elements(self.targets, query_remotes=query_remotes)
         selected = self._pipeline.get_selection(self.targets, selection, silent=False)
         selected = self._pipeline.except_elements(self.targets, selected, except_elements)
 
@@ -110,8 +110,16 @@ cdef dict VALUE_EXPRESSION_CACHE = {
 # variables in yaml Node hierarchies and substituting variables in strings
 # in the context of a given Element's variable configuration.
 #
+# When a `parent` is given, the Variables are layered on top of the
+# parent Variables, and `node` only contains the variables which are
+# overridden in this layer. The parent is resolved once, as far as
+# possible without the overrides, and its resolved values are shared
+# with every layer on top of it; only the overridden variables and the
+# variables which refer to them are resolved again in this layer.
+#
 # Args:
 #     node (Node): A node loaded and composited with yaml tools
+#     parent (Variables): The Variables to layer these Variables on top of, or None
 #
 # Raises:
 #     LoadError, if unresolved variables, or cycles in resolution, occur.
@@ -119,17 +127,31 @@ cdef dict VALUE_EXPRESSION_CACHE = {
 cdef class Variables:
 
     cdef MappingNode _original
+    cdef Variables _parent
     cdef dict _values
+    cdef dict _expressions
+    cdef dict _referrers
+    cdef dict _dependents
 
     #################################################################
     #                       Dunder Methods                          #
     #################################################################
-    def __init__(self, MappingNode node):
+    def __init__(self, MappingNode node, Variables parent = None):
 
         # The original MappingNode, we need to keep this
         # around for proper error reporting.
         #
         self._original = node
+        self._parent = parent
+
+        # The unresolved value expressions, the variables referring
+        # to each variable and the variables which transitively depend
+        # on each variable, these are only initialized when layering
+        # other Variables on top of these Variables.
+        #
+        self._expressions = None
+        self._referrers = None
+        self._dependents = None
 
         # The value map, this dictionary contains either unresolved
         # value expressions, or resolved values.
@@ -137,7 +159,10 @@ cdef class Variables:
         # Each mapping value is a list, in the case that the value
         # is resolved, then the list is only 1 element long.
         #
-        self._values = self._init_values(node)
+        if parent is None:
+            self._values = self._init_values(node)
+        else:
+            self._values = self._init_layered_values(node, parent)
 
     # __getitem__()
     #
@@ -285,25 +310,162 @@ cdef class Variables:
     #    (dict): A dictionary of value expressions (lists)
     #
     cdef dict _init_values(self, MappingNode node):
+        cdef dict ret = {}
+        cdef object key_object
+        cdef str key
+        cdef str value
+
+        for key_object in node.keys():
+            key = <str> key_object
+            value = node.get_str(key)
+            ret[sys.intern(key)] = _parse_value_expression(value)
+
         # Special case, if notparallel is specified in the variables for this
         # element, then override max-jobs to be 1.
-        # Initialize it as a string as all variables are processed as strings.
         #
         if node.get_bool('notparallel', False):
-            node['max-jobs'] = str(1)
+            ret['max-jobs'] = _parse_value_expression("1")
 
-        cdef dict ret = {}
+        return ret
+
+    # _init_layered_values()
+    #
+    # Initialize the table of values on top of the parent Variables.
+    #
+    # The value table starts out as a copy of the parent's value table,
+    # sharing the already resolved values of the parent. The overridden
+    # variables, and the variables of the parent which depend on them,
+    # are then replaced with their unresolved value expressions.
+    #
+    # Args:
+    #    node (MappingNode): The overridden variables mapping node
+    #    parent (Variables): The parent Variables
+    #
+    # Returns:
+    #    (dict): A dictionary of value expressions (lists)
+    #
+    cdef dict _init_layered_values(self, MappingNode node, Variables parent):
+        cdef dict ret
+        cdef set overridden
         cdef object key_object
+        cdef object dependent
         cdef str key
         cdef str value
+        cdef str max_jobs
+
+        parent._init_layer()
+
+        ret = parent._values.copy()
+        overridden = set()
 
         for key_object in node.keys():
-            key = <str> key_object
+            key = sys.intern(<str> key_object)
             value = node.get_str(key)
-            ret[sys.intern(key)] = _parse_value_expression(value)
+            ret[key] = _parse_value_expression(value)
+            overridden.add(key)
+
+        # Special case, notparallel overrides max-jobs, or restores the
+        # original max-jobs if notparallel was set in the parent.
+        #
+        if 'notparallel' in node:
+            if node.get_bool('notparallel'):
+                ret['max-jobs'] = _parse_value_expression("1")
+            else:
+                max_jobs = parent._original.get_str('max-jobs', None)
+                if max_jobs is not None:
+                    ret['max-jobs'] = _parse_value_expression(max_jobs)
+            overridden.add('max-jobs')
+
+        # Any value of the parent which depends on an overridden
+        # variable needs to be resolved again in this layer.
+        #
+        for key_object in overridden:
+            for dependent in parent._get_dependents(<str> key_object):
+                if dependent not in overridden:
+                    ret[dependent] = parent._expressions[dependent]
 
         return ret
 
+    # _init_layer()
+    #
+    # Prepare these Variables for other Variables to be layered on top.
+    #
+    # This records the unresolved value expressions and which variables
+    # refer to which, and then resolves every variable which can be
+    # resolved without any overrides, ignoring errors; the errors are
+    # reported by the layers in which the variables are resolved.
+    #
+    cdef _init_layer(self):
+        cdef object key_object
+        cdef list value_expression
+        cdef Py_ssize_t idx
+
+        if self._expressions is not None:
+            return
+
+        self._expressions = self._values.copy()
+        self._referrers = {}
+        self._dependents = {}
+
+        for key_object, value_expression in self._expressions.items():
+            for idx in range(1, len(value_expression), 2):
+                self._referrers.setdefault(value_expression[idx], []).append(key_object)
+
+        for key_object in self._expressions:
+            try:
+                self._expand_var(<str> key_object)
+            except LoadError:
+                pass
+
+    # _get_dependents()
+    #
+    # Get the variables which directly or indirectly refer to a variable.
+    #
+    # Args:
+    #    name (str): The variable name
+    #
+    # Returns:
+    #    (set): The names of the variables depending on `name`
+    #
+    cdef set _get_dependents(self, str name):
+        cdef set dependents
+        cdef list queue
+        cdef object referrer
+
+        try:
+            return <set> self._dependents[name]
+        except KeyError:
+            pass
+
+        dependents = set()
+        queue = [name]
+        while queue:
+            for referrer in self._referrers.get(queue.pop(), ()):
+                if referrer not in dependents:
+                    dependents.add(referrer)
+                    queue.append(referrer)
+
+        self._dependents[name] = dependents
+        return dependents
+
+    # _get_original_node()
+    #
+    # Get the node which originally declared a variable, falling
+    # back to the parent Variables if it is not overridden here.
+    #
+    # Args:
+    #    name (str): The variable name, or None
+    #
+    # Returns:
+    #    (Node): The node declaring the variable, or None
+    #
+    cdef Node _get_original_node(self, str name):
+        cdef Node node = self._original.get_node(name, allowed_types=None, allow_none=True)
+
+        if node is None and self._parent is not None:
+            return self._parent._get_original_node(name)
+        return node
+
     # _expand_var()
     #
     # Expand and cache a variable definition.
@@ -489,7 +651,7 @@ cdef class Variables:
             step = step.prev
 
             # Check for circular dependencies
-            this_step.check_circular(self._original)
+            this_step.check_circular(self)
 
             for idx, value in enumerate(this_step.value_expression):
 
@@ -563,7 +725,7 @@ cdef class Variables:
 
             # Either the provenance is the toplevel calling provenance,
             # or it is the provenance of the direct referee
-            referee_node = self._original.get_node(referee, allowed_types=None, allow_none=True)
+            referee_node = self._get_original_node(referee)
             if referee_node is not None:
                 provenance = referee_node.get_provenance()
             elif node:
@@ -634,18 +796,18 @@ cdef class ResolutionStep:
     # Check for circular references in this step.
     #
     # Args:
-    #    original_values (MappingNode): The original MappingNode for the Variables
+    #    variables (Variables): The Variables being resolved
     #
     # Raises:
     #    (LoadError): Will raise a user facing LoadError with
     #                 LoadErrorReason.CIRCULAR_REFERENCE_VARIABLE in case
     #                 circular references were encountered.
     #
-    cdef check_circular(self, MappingNode original_values):
+    cdef check_circular(self, Variables variables):
         cdef ResolutionStep step = self.parent
         while step:
             if self.referee is step.referee:
-                self._raise_circular_reference_error(step, original_values)
+                self._raise_circular_reference_error(step, variables)
             step = step.parent
 
     # _raise_circular_reference_error()
@@ -655,15 +817,15 @@ cdef class ResolutionStep:
     #
     # Args:
     #    conflict (ResolutionStep): The resolution step which conflicts with this step
-    #    original_values (MappingNode): The original node to extract provenances from
+    #    variables (Variables): The Variables to extract provenances from
     #
     # Raises:
     #    (LoadError): Unconditionally
     #
-    cdef _raise_circular_reference_error(self, ResolutionStep conflict, MappingNode original_values):
+    cdef _raise_circular_reference_error(self, ResolutionStep conflict, Variables variables):
         cdef list error_lines = []
         cdef ResolutionStep step = self
-        cdef ScalarNode node
+        cdef Node node
         cdef str referee
 
         while step is not conflict:
@@ -672,7 +834,7 @@ cdef class ResolutionStep:
             else:
                 referee = self.referee
 
-            node = original_values.get_scalar(referee)
+            node = variables._get_original_node(referee)
 
             error_lines.append("{}: Variable '{}' refers to variable '{}'".format(node.get_provenance(), referee, step.referee))
             step = step.parent
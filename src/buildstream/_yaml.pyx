@@ -250,12 +250,13 @@ cdef class Representer:
 #    copy_tree (bool): Whether to make a copy, preserving the original toplevels
 #                      for later serialization
 #    project (Project): The (optional) project to associate the parsed YAML with
+#    cache (YamlCache): The (optional) cache of previously parsed files
 #
 # Returns (dict): A loaded copy of the YAML file with provenance information
 #
 # Raises: LoadError
 #
-cpdef MappingNode load(str filename, str shortname, bint copy_tree=False, object project=None):
+cpdef MappingNode load(str filename, str shortname, bint copy_tree=False, object project=None, object cache=None):
     cdef MappingNode data
 
     if not shortname:
@@ -270,13 +271,26 @@ cpdef MappingNode load(str filename, str shortname, bint copy_tree=False, object
     cdef Py_ssize_t file_number = node._create_new_file(filename, shortname, displayname, project)
 
     try:
-        with open(filename) as f:
-            contents = f.read()
+        if cache is None:
+            with open(filename) as f:
+                contents = f.read()
+            tree = None
+        else:
+            tree, contents = cache.get(filename)
+
+        if tree is not None:
+            data = <MappingNode> _tree_to_node(tree, file_number)
+            node._set_root_node_for_file(file_number, data)
+        else:
+            data = load_data(contents,
+                             file_index=file_number,
+                             file_name=filename)
+
+            if cache is not None:
+                cache.put(filename, _node_to_tree(data))
 
-        data = load_data(contents,
-                         file_index=file_number,
-                         file_name=filename,
-                         copy_tree=copy_tree)
+        if copy_tree:
+            data = data.clone()
 
         return data
     except FileNotFoundError as e:
@@ -329,6 +343,189 @@ cpdef MappingNode load_data(str data, int file_index=node._SYNTHETIC_FILE_INDEX,
     return contents
 
 
+# Kinds of nodes in the trees created by _node_to_tree()
+cdef enum:
+    _TREE_SCALAR = 0
+    _TREE_MAPPING = 1
+    _TREE_SEQUENCE = 2
+
+
+# _node_to_tree()
+#
+# Convert a node into a tree of plain python tuples which can be
+# efficiently serialized, retaining the provenance of every node
+# except for the file it was loaded from.
+#
+# Args:
+#    value (Node): The node to convert
+#
+# Returns:
+#    (tuple): The converted tree
+#
+cdef tuple _node_to_tree(node.Node value):
+    cdef str key
+    cdef node.Node child
+
+    if type(value) is MappingNode:
+        return (
+            _TREE_MAPPING, value.line, value.column,
+            tuple([(key, _node_to_tree(child)) for key, child in (<MappingNode> value).value.items()]),
+        )
+    elif type(value) is SequenceNode:
+        return (
+            _TREE_SEQUENCE, value.line, value.column,
+            tuple([_node_to_tree(child) for child in (<SequenceNode> value).value]),
+        )
+    else:
+        return (_TREE_SCALAR, value.line, value.column, (<ScalarNode> value).value)
+
+
+# _tree_to_node()
+#
+# Convert a tree created with _node_to_tree() back into a node.
+#
+# Args:
+#    tree (tuple): The tree to convert
+#    file_index (int): The index of the file to associate the nodes with
+#
+# Returns:
+#    (Node): The converted node
+#
+cdef node.Node _tree_to_node(tuple tree, int file_index):
+    cdef int kind = tree[0]
+    cdef str key
+    cdef tuple child
+
+    if kind == _TREE_MAPPING:
+        return MappingNode.__new__(
+            MappingNode, file_index, tree[1], tree[2],
+            {key: _tree_to_node(child, file_index) for key, child in tree[3]},
+        )
+    elif kind == _TREE_SEQUENCE:
+        return SequenceNode.__new__(
+            SequenceNode, file_index, tree[1], tree[2],
+            [_tree_to_node(child, file_index) for child in tree[3]],
+        )
+    else:
+        return ScalarNode.__new__(ScalarNode, file_index, tree[1], tree[2], tree[3])
+
+
+# snapshot_node()
+#
+# Convert a node into a tree of plain python tuples, like _node_to_tree(),
+# but recording the file of every node as well, such that nodes composed
+# from several files can be restored with their full provenance.
+#
+# Args:
+#    value (Node): The node to convert
+#    files (dict): The files referred to by the converted trees, this maps
+#                  the index of every file to its (number, filename, shortname,
+#                  displayname, toplevel), where toplevel is the tree of the root
+#                  node of the file, and is extended as new files are encountered
+#
+# Returns:
+#    (tuple): The converted tree
+#
+cpdef tuple snapshot_node(node.Node value, dict files):
+    cdef int file_number = -1
+    cdef node.ProvenanceInformation provenance
+    cdef tuple toplevel = None
+    cdef str key
+    cdef node.Node child
+
+    if value.file_index != node._SYNTHETIC_FILE_INDEX:
+        try:
+            file_number = files[value.file_index][0]
+        except KeyError:
+            provenance = value.get_provenance()
+            file_number = len(files)
+
+            # The root node of the file is needed to report the path of
+            # nodes with invalid values in errors
+            if provenance._toplevel is not None:
+                toplevel = _node_to_tree(provenance._toplevel)
+
+            files[value.file_index] = (
+                file_number, provenance._filename, provenance._shortname, provenance._displayname, toplevel
+            )
+
+    if type(value) is MappingNode:
+        return (
+            _TREE_MAPPING, value.line, value.column,
+            tuple([(key, snapshot_node(child, files)) for key, child in (<MappingNode> value).value.items()]),
+            file_number,
+        )
+    elif type(value) is SequenceNode:
+        return (
+            _TREE_SEQUENCE, value.line, value.column,
+            tuple([snapshot_node(child, files) for child in (<SequenceNode> value).value]),
+            file_number,
+        )
+    else:
+        return (_TREE_SCALAR, value.line, value.column, (<ScalarNode> value).value, file_number)
+
+
+# restore_files()
+#
+# Register the files recorded by snapshot_node() in this session.
+#
+# Args:
+#    files (list): The (filename, shortname, displayname, toplevel) of the files, ordered by number
+#    project (Project): The project to associate the files with
+#
+# Returns:
+#    (list): The index of every file in this session, ordered by number
+#
+cpdef list restore_files(list files, object project):
+    cdef str filename, shortname, displayname
+    cdef tuple toplevel
+    cdef Py_ssize_t file_index
+    cdef list file_indices = []
+
+    for filename, shortname, displayname, toplevel in files:
+        file_index = node._create_new_file(filename, shortname, displayname, project)
+        if toplevel is not None:
+            node._set_root_node_for_file(file_index, <MappingNode> _tree_to_node(toplevel, file_index))
+        file_indices.append(file_index)
+
+    return file_indices
+
+
+# restore_node()
+#
+# Convert a tree created with snapshot_node() back into a node.
+#
+# Args:
+#    tree (tuple): The tree to convert
+#    file_indices (list): The indices of the files, as returned by restore_files()
+#
+# Returns:
+#    (Node): The converted node
+#
+cpdef node.Node restore_node(tuple tree, list file_indices):
+    cdef int kind = tree[0]
+    cdef int file_number = tree[4]
+    cdef int file_index = node._SYNTHETIC_FILE_INDEX
+    cdef str key
+    cdef tuple child
+
+    if file_number >= 0:
+        file_index = file_indices[file_number]
+
+    if kind == _TREE_MAPPING:
+        return MappingNode.__new__(
+            MappingNode, file_index, tree[1], tree[2],
+            {key: restore_node(child, file_indices) for key, child in tree[3]},
+        )
+    elif kind == _TREE_SEQUENCE:
+        return SequenceNode.__new__(
+            SequenceNode, file_index, tree[1], tree[2],
+            [restore_node(child, file_indices) for child in tree[3]],
+        )
+    else:
+        return ScalarNode.__new__(ScalarNode, file_index, tree[1], tree[2], tree[3])
+
+
 ###############################################################################
 
 # Roundtrip code
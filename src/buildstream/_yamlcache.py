@@ -0,0 +1,344 @@
+#
+#  Copyright (C) 2020 Codethink Limited
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU Lesser General Public
+#  License as published by the Free Software Foundation; either
+#  version 2 of the License, or (at your option) any later version.
+#
+#  This library is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.	 See the GNU
+#  Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public
+#  License along with this library. If not, see <http://www.gnu.org/licenses/>.
+#
+
+import hashlib
+import os
+import pickle
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import utils
+
+
+# The version of the cache format, bump this whenever the
+# format of the cached trees changes.
+_CACHE_VERSION = 2
+
+# How long entries which are not used are kept in the cache, in seconds
+_ENTRY_RETENTION = 30 * 24 * 60 * 60
+
+# How often the last use of an entry is updated, in seconds
+_ENTRY_ACCESS_GRANULARITY = 24 * 60 * 60
+
+# Files modified less than this many nanoseconds before they were
+# recorded may be modified again without changing their mtime, the
+# contents of such files are verified rather than trusting their stat.
+_RACY_NS = 2 * 1000000000
+
+# The maximum number of threads used to prefetch files
+_MAX_PREFETCH_THREADS = 16
+
+
+# _CacheEntry()
+#
+# A parsed YAML file in the cache
+#
+# Args:
+#    mtime (int): The modification time of the file, in nanoseconds
+#    size (int): The size of the file, in bytes
+#    recorded (int): When the stat of the file was taken, in nanoseconds since the epoch
+#    digest (str): The sha256 digest of the file contents
+#    tree (tuple): The parsed file, as created by _yaml._node_to_tree()
+#    last_used (float): When the entry was last used, in seconds since the epoch
+#
+class _CacheEntry:
+    __slots__ = ["mtime", "size", "recorded", "digest", "tree", "last_used"]
+
+    def __init__(self, mtime, size, recorded, digest, tree, last_used):
+        self.mtime = mtime
+        self.size = size
+        self.recorded = recorded
+        self.digest = digest
+        self.tree = tree
+        self.last_used = last_used
+
+    # matches()
+    #
+    # Whether the stat of the file shows that it did not change since
+    # the entry was recorded. Files which were modified shortly before
+    # they were recorded are never trusted, as they may have been
+    # modified again within the granularity of their mtime.
+    #
+    # Args:
+    #    st (os.stat_result): The current stat of the file
+    #
+    # Returns:
+    #    (bool): Whether the file can be assumed to be unchanged
+    #
+    def matches(self, st):
+        return self.mtime == st.st_mtime_ns and self.size == st.st_size and self.mtime < self.recorded - _RACY_NS
+
+
+# YamlCache()
+#
+# A persistent cache of parsed YAML files, which allows loading
+# files which did not change since a previous session without
+# parsing them again.
+#
+# Entries are keyed by the absolute path of the file. An entry is
+# used without reading the file if the modification time and size
+# of the file still match, and the file was not modified shortly
+# before the entry was recorded. Otherwise the file contents are
+# hashed and the entry is only used if the contents did not change.
+#
+# The cache is loaded when it is first accessed and written out
+# when it is closed. The cache is only ever accessed from the main
+# process and is only advisory, failing to read or write it never
+# causes a session to fail.
+#
+# Args:
+#    path (str): The path to the cache file
+#
+class YamlCache:
+    def __init__(self, path):
+        self._path = path
+        self._entries = None  # The cache entries by path, loaded on demand
+        self._pending = {}  # The stat and digest of files which are being parsed, by path
+        self._prefetched = {}  # The futures of prefetched files, by path
+        self._executor = None  # The thread pool reading prefetched files, started on demand
+        self._digests = {}  # The digests of the files loaded in this session, by path
+        self._dirty = False  # Whether the cache needs to be written out
+
+    # get()
+    #
+    # Get a parsed YAML file from the cache.
+    #
+    # Args:
+    #    filename (str): The absolute path of the file
+    #
+    # Returns:
+    #    (tuple): The cached tree, or None if the file needs to be parsed
+    #    (str): The contents of the file if it needs to be parsed, otherwise None
+    #
+    # Raises:
+    #    (OSError): If the file cannot be read
+    #
+    def get(self, filename):
+        entries = self._get_entries()
+        entry = entries.get(filename)
+
+        future = self._prefetched.pop(filename, None)
+        prefetched = future.result() if future is not None else None
+        if prefetched is not None:
+            st, raw, recorded = prefetched
+        else:
+            recorded = utils._time_ns()
+            st, raw = os.stat(filename), None
+
+        if entry is not None and entry.matches(st):
+            self._mark_used(entry)
+            self._digests[filename] = entry.digest
+            return entry.tree, None
+
+        if raw is None:
+            with open(filename, "rb") as f:
+                raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        self._digests[filename] = digest
+
+        if entry is not None and entry.digest == digest:
+            # Only the modification time changed, e.g. after a checkout
+            self._update_stat(entry, st, recorded)
+            return entry.tree, None
+
+        self._pending[filename] = (st.st_mtime_ns, st.st_size, recorded, digest)
+        return None, raw.decode("utf-8")
+
+    # put()
+    #
+    # Store a parsed YAML file in the cache, after get() reported
+    # that the file needs to be parsed.
+    #
+    # Args:
+    #    filename (str): The absolute path of the file
+    #    tree (tuple): The parsed file, as created by _yaml._node_to_tree()
+    #
+    def put(self, filename, tree):
+        mtime, size, recorded, digest = self._pending.pop(filename)
+        self._entries[filename] = _CacheEntry(mtime, size, recorded, digest, tree, time.time())
+        self._dirty = True
+
+    # prefetch()
+    #
+    # Start reading the given files in the background, ahead of loading
+    # them with get(), such that the latency of reading many files from
+    # slow storage overlaps. Files which are found unchanged in the cache
+    # are only stat()ed.
+    #
+    # Errors are ignored here, they are reported when the file is
+    # loaded with get().
+    #
+    # Args:
+    #    filenames (list): The absolute paths of the files
+    #
+    def prefetch(self, filenames):
+        entries = self._get_entries()
+
+        for filename in filenames:
+            if filename not in self._prefetched:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=_MAX_PREFETCH_THREADS)
+                self._prefetched[filename] = self._executor.submit(self._read, filename, entries.get(filename))
+
+    # suspend_prefetch()
+    #
+    # Wait for the files which are being prefetched and stop the
+    # prefetch threads, such that the process can safely fork.
+    #
+    # The files which were prefetched are kept, and the threads
+    # are started again by the next call to prefetch().
+    #
+    def suspend_prefetch(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    # finish_prefetch()
+    #
+    # Stop the prefetch threads and discard the files which were
+    # prefetched but not loaded.
+    #
+    def finish_prefetch(self):
+        for future in self._prefetched.values():
+            future.cancel()
+        self.suspend_prefetch()
+        self._prefetched = {}
+
+    # get_digests()
+    #
+    # Get the digests of all files which were loaded through the
+    # cache in this session, or which were verified with verify().
+    #
+    # Returns:
+    #    (dict): The sha256 digests of the files, by absolute path
+    #
+    def get_digests(self):
+        return dict(self._digests)
+
+    # verify()
+    #
+    # Verify that files still have the given contents, without
+    # reading the files which are found unchanged in the cache.
+    # Files which were modified shortly before they were recorded
+    # in the cache are always read.
+    #
+    # Args:
+    #    digests (dict): The expected sha256 digests of the files, by absolute path
+    #
+    # Returns:
+    #    (bool): Whether all of the files still have the expected contents
+    #
+    def verify(self, digests):
+        entries = self._get_entries()
+
+        for filename, digest in digests.items():
+            entry = entries.get(filename)
+            try:
+                recorded = utils._time_ns()
+                st = os.stat(filename)
+                if entry is None or not entry.matches(st):
+                    with open(filename, "rb") as f:
+                        if hashlib.sha256(f.read()).hexdigest() != digest:
+                            return False
+                    if entry is not None and entry.digest == digest:
+                        self._update_stat(entry, st, recorded)
+                elif entry.digest != digest:
+                    return False
+            except OSError:
+                return False
+
+            if entry is not None:
+                self._mark_used(entry)
+
+        self._digests.update(digests)
+        return True
+
+    # close()
+    #
+    # Write out the cache if it was modified, expiring entries which
+    # have not been used for a while.
+    #
+    def close(self):
+        if self._dirty:
+            expiry = time.time() - _ENTRY_RETENTION
+            entries = {
+                filename: (entry.mtime, entry.size, entry.recorded, entry.digest, entry.tree, entry.last_used)
+                for filename, entry in self._entries.items()
+                if entry.last_used >= expiry
+            }
+
+            try:
+                os.makedirs(os.path.dirname(self._path), exist_ok=True)
+                with utils.save_file_atomic(self._path, "wb") as f:
+                    pickle.dump((_CACHE_VERSION, entries), f, protocol=pickle.HIGHEST_PROTOCOL)
+            except OSError:
+                pass
+
+            self._dirty = False
+
+        self.finish_prefetch()
+        self._pending = {}
+        self._digests = {}
+
+    #############################################################
+    #                     Private Methods                       #
+    #############################################################
+
+    def _get_entries(self):
+        if self._entries is None:
+            self._entries = {}
+            try:
+                with open(self._path, "rb") as f:
+                    version, entries = pickle.load(f)
+            except FileNotFoundError:
+                pass
+            except Exception:  # pylint: disable=broad-except
+                # A corrupted cache is simply discarded
+                self._dirty = True
+            else:
+                if version == _CACHE_VERSION:
+                    self._entries = {filename: _CacheEntry(*entry) for filename, entry in entries.items()}
+                else:
+                    self._dirty = True
+
+        return self._entries
+
+    # Called from the prefetch threads, must not modify the cache
+    def _read(self, filename, entry):
+        try:
+            recorded = utils._time_ns()
+            st = os.stat(filename)
+            if entry is not None and entry.matches(st):
+                return st, None, recorded
+
+            with open(filename, "rb") as f:
+                return st, f.read(), recorded
+        except OSError:
+            return None
+
+    def _update_stat(self, entry, st, recorded):
+        entry.mtime = st.st_mtime_ns
+        entry.size = st.st_size
+        entry.recorded = recorded
+        self._mark_used(entry)
+        self._dirty = True
+
+    def _mark_used(self, entry):
+        now = time.time()
+        if now - entry.last_used > _ENTRY_ACCESS_GRANULARITY:
+            entry.last_used = now
+            self._dirty = True
@@ -35,14 +35,26 @@ implementation.
 import os
 import urllib.request
 import urllib.error
+import concurrent.futures
 import contextlib
-import shutil
+import hashlib
+import http.client
 import netrc
 
 from .source import Source, SourceError
 from . import utils
 
 
+# Size of the blocks read from the network
+_DOWNLOAD_BUFFER_SIZE = 65536
+
+# Number of times an interrupted download is resumed before giving up
+_MAX_DOWNLOAD_RESUMES = 3
+
+# Minimum size of files to download in parallel chunks
+_MIN_CHUNKED_DOWNLOAD_SIZE = 16 * 1024 * 1024
+
+
 class _NetrcFTPOpener(urllib.request.FTPHandler):
     def __init__(self, netrc_config):
         self.netrc = netrc_config
@@ -213,15 +225,13 @@ class DownloadableFileSource(Source):
                     filename = info.get_filename(default_name)
                     filename = os.path.basename(filename)
                     local_file = os.path.join(td, filename)
-                    with open(local_file, "wb") as dest:
-                        shutil.copyfileobj(response, dest)
+                    sha256 = self.__download(opener, request, response, local_file, etag)
 
                 # Make sure url-specific mirror dir exists.
                 if not os.path.isdir(self._mirror_dir):
                     os.makedirs(self._mirror_dir)
 
                 # Store by sha256sum
-                sha256 = utils.sha256sum(local_file)
                 # Even if the file already exists, move the new file over.
                 # In case the old file was corrupted somehow.
                 os.rename(local_file, self._get_mirror_file(sha256))
@@ -238,7 +248,13 @@ class DownloadableFileSource(Source):
                 return self.ref
             raise SourceError("{}: Error mirroring {}: {}".format(self, self.url, e), temporary=True) from e
 
-        except (urllib.error.URLError, urllib.error.ContentTooShortError, OSError, ValueError) as e:
+        except (
+            urllib.error.URLError,
+            urllib.error.ContentTooShortError,
+            http.client.HTTPException,
+            OSError,
+            ValueError,
+        ) as e:
             # Note that urllib.request.Request in the try block may throw a
             # ValueError for unknown url types, so we handle it here.
             raise SourceError("{}: Error mirroring {}: {}".format(self, self.url, e), temporary=True) from e
@@ -252,6 +268,165 @@ class DownloadableFileSource(Source):
 
         return self.__default_mirror_file
 
+    # __download():
+    #
+    # Download the file of an opened request, hashing it while it is
+    # written. Interrupted downloads are resumed with ranged requests,
+    # large files may be downloaded in parallel chunks instead.
+    #
+    # Args:
+    #    opener (OpenerDirector): The opener to use for further requests
+    #    request (Request): The original request
+    #    response: The response to the original request
+    #    local_file (str): The path to download the file to
+    #    etag (str): The ETag of the file, if any
+    #
+    # Returns:
+    #    (str): The sha256sum of the downloaded file
+    #
+    def __download(self, opener, request, response, local_file, etag):
+        size = self.__get_content_length(response)
+        connections = self._get_context().sched_download_connections
+
+        if (
+            connections > 1
+            and size is not None
+            and size >= _MIN_CHUNKED_DOWNLOAD_SIZE
+            and response.info().get("Accept-Ranges") == "bytes"
+        ):
+            response.close()
+            self.__download_chunks(opener, request, local_file, size, connections, etag)
+            return utils.sha256sum(local_file)
+
+        sha256 = hashlib.sha256()
+        resumes = 0
+        with open(local_file, "wb") as dest:
+            while True:
+                try:
+                    if response is None:
+                        response = opener.open(self.__range_request(request, dest.tell(), None, etag))
+                        if not self.__is_range_response(response, dest.tell()):
+                            # The server sends the whole file, start over
+                            dest.seek(0)
+                            dest.truncate()
+                            sha256 = hashlib.sha256()
+
+                    with contextlib.closing(response):
+                        self.__copy(response, dest, sha256)
+
+                    return sha256.hexdigest()
+
+                except (OSError, http.client.HTTPException) as e:
+                    response = None
+                    if resumes >= _MAX_DOWNLOAD_RESUMES:
+                        raise
+                    resumes += 1
+                    self.status("Resuming download of {} at byte {}".format(self.url, dest.tell()), detail=str(e))
+
+    # __download_chunks():
+    #
+    # Download a file in parallel ranged requests, each of which is
+    # resumed on its own after temporary failures.
+    #
+    # Args:
+    #    opener (OpenerDirector): The opener to use for the requests
+    #    request (Request): The original request
+    #    local_file (str): The path to download the file to
+    #    size (int): The size of the file
+    #    connections (int): The number of parallel requests
+    #    etag (str): The ETag of the file, if any
+    #
+    def __download_chunks(self, opener, request, local_file, size, connections, etag):
+        chunk_size = -(-size // connections)
+
+        with open(local_file, "wb") as dest:
+            dest.truncate(size)
+
+        def download_chunk(start):
+            end = min(start + chunk_size, size)
+            resumes = 0
+            with open(local_file, "r+b") as dest:
+                dest.seek(start)
+                while dest.tell() < end:
+                    try:
+                        response = opener.open(self.__range_request(request, dest.tell(), end, etag))
+                        with contextlib.closing(response):
+                            if not self.__is_range_response(response, dest.tell()):
+                                raise SourceError(
+                                    "{}: Server ignored ranged request for {}".format(self, self.url), temporary=True
+                                )
+                            self.__copy(response, dest)
+
+                        if dest.tell() < end:
+                            raise http.client.IncompleteRead(b"", end - dest.tell())
+
+                    except (OSError, http.client.HTTPException):
+                        if resumes >= _MAX_DOWNLOAD_RESUMES:
+                            raise
+                        resumes += 1
+
+        with concurrent.futures.ThreadPoolExecutor(connections) as executor:
+            futures = [executor.submit(download_chunk, start) for start in range(0, size, chunk_size)]
+            for future in futures:
+                future.result()
+
+    # __copy():
+    #
+    # Write the body of a response to a file, failing if the
+    # connection is closed before the whole body was received.
+    #
+    def __copy(self, response, dest, sha256=None):
+        remaining = self.__get_content_length(response)
+
+        while remaining is None or remaining > 0:
+            if remaining is None:
+                data = response.read(_DOWNLOAD_BUFFER_SIZE)
+            else:
+                data = response.read(min(remaining, _DOWNLOAD_BUFFER_SIZE))
+            if not data:
+                break
+
+            dest.write(data)
+            if sha256 is not None:
+                sha256.update(data)
+            if remaining is not None:
+                remaining -= len(data)
+
+        if remaining:
+            raise http.client.IncompleteRead(b"", remaining)
+
+    # Create a request for the bytes of the file from start to end (exclusive),
+    # or up to the end of the file if end is None
+    def __range_request(self, request, start, end, etag):
+        range_request = urllib.request.Request(request.full_url)
+        for header, value in request.header_items():
+            if header.lower() != "if-none-match":
+                range_request.add_header(header, value)
+
+        if end is None:
+            range_request.add_header("Range", "bytes={}-".format(start))
+        else:
+            range_request.add_header("Range", "bytes={}-{}".format(start, end - 1))
+
+        # Only send the requested range if the file did not change
+        if etag and not etag.startswith("W/"):
+            range_request.add_header("If-Range", etag)
+
+        return range_request
+
+    def __is_range_response(self, response, start):
+        if response.getcode() != 206:
+            return False
+
+        content_range = response.info().get("Content-Range", "")
+        return content_range.startswith("bytes {}-".format(start))
+
+    def __get_content_length(self, response):
+        try:
+            return int(response.info()["Content-Length"])
+        except (TypeError, ValueError):
+            return None
+
     def __get_urlopener(self):
         if not DownloadableFileSource.__urlopener:
             try:
@@ -223,7 +223,7 @@ class Element(Plugin):
         self, context: "Context", project: "Project", load_element: "LoadElement", plugin_conf: Dict[str, Any]
     ):
 
-        self.__cache_key_dict = None  # Dict for cache key calculation
+        self.__cache_key_base = None  # Precomputed PartialKey for cache key calculation
         self.__cache_key = None  # Our cached cache key
 
         super().__init__(load_element.name, context, project, load_element.node, "element")
@@ -294,6 +294,7 @@ class Element(Plugin):
         self.__build_result = None  # The result of assembling this Element (success, description, detail)
         # Artifact class for direct artifact composite interaction
         self.__artifact = None  # type: Optional[Artifact]
+        self.__prepared_artifacts = None  # Candidate (strict, weak) Artifacts from _prepare_cache_query()
 
         self.__batch_prepare_assemble = False  # Whether batching across prepare()/assemble() is configured
         self.__batch_prepare_assemble_flags = 0  # Sandbox flags for batching across prepare()/assemble()
@@ -311,9 +312,9 @@ class Element(Plugin):
         self.__init_defaults(project, plugin_conf, load_element.kind, load_element.first_pass)
 
         # Collect the composited variables and resolve them
-        variables = self.__extract_variables(project, load_element)
+        variables = self.__extract_variables(load_element)
         variables["element-name"] = self.name
-        self.__variables = Variables(variables)
+        self.__variables = Variables(variables, self.__get_variables_layer(project, load_element))
         if not load_element.first_pass:
             self.__variables.check()
 
@@ -912,35 +913,6 @@ class Element(Plugin):
                         result.add(dep)
                         yield dep
         else:
-
-            def visit(element, scope, visited):
-                if scope == _Scope.ALL:
-                    visited[0].add(element._unique_id)
-                    visited[1].add(element._unique_id)
-
-                    for dep in chain(element.__build_dependencies, element.__runtime_dependencies):
-                        if dep._unique_id not in visited[0] and dep._unique_id not in visited[1]:
-                            yield from visit(dep, _Scope.ALL, visited)
-
-                    yield element
-                elif scope == _Scope.BUILD:
-                    visited[0].add(element._unique_id)
-
-                    for dep in element.__build_dependencies:
-                        if dep._unique_id not in visited[1]:
-                            yield from visit(dep, _Scope.RUN, visited)
-
-                elif scope == _Scope.RUN:
-                    visited[1].add(element._unique_id)
-
-                    for dep in element.__runtime_dependencies:
-                        if dep._unique_id not in visited[1]:
-                            yield from visit(dep, _Scope.RUN, visited)
-
-                    yield element
-                else:
-                    yield element
-
             if visited is None:
                 # Visited is of the form (Visited for _Scope.BUILD, Visited for _Scope.RUN)
                 visited = (BitMap(), BitMap())
@@ -951,7 +923,57 @@ class Element(Plugin):
                 if scope in (_Scope.RUN, _Scope.ALL) and self._unique_id in visited[1]:
                     return
 
-            yield from visit(self, scope, visited)
+            if scope not in (_Scope.ALL, _Scope.BUILD, _Scope.RUN):
+                yield self
+                return
+
+            def visit(element, scope):
+                if scope is _Scope.ALL:
+                    visited[0].add(element._unique_id)
+                    visited[1].add(element._unique_id)
+                    return chain(element.__build_dependencies, element.__runtime_dependencies)
+                elif scope is _Scope.BUILD:
+                    visited[0].add(element._unique_id)
+                    return iter(element.__build_dependencies)
+                else:
+                    visited[1].add(element._unique_id)
+                    return iter(element.__runtime_dependencies)
+
+            # Walk the graph with an explicit stack rather than recursive
+            # generators, so that yielding an element does not cost a resume
+            # of every generator between it and the root of the walk.
+            #
+            # Each entry holds the element, the scope it is visited in and
+            # the iterator over its remaining dependencies.
+            stack = [(self, scope, visit(self, scope))]
+            build_visited, run_visited = visited
+            while stack:
+                element, element_scope, deps = stack[-1]
+                if element_scope is _Scope.ALL:
+                    for dep in deps:
+                        dep_id = dep._unique_id
+                        if dep_id not in build_visited and dep_id not in run_visited:
+                            stack.append((dep, _Scope.ALL, visit(dep, _Scope.ALL)))
+                            break
+                    else:
+                        stack.pop()
+                        yield element
+                else:
+                    for dep in deps:
+                        dep_id = dep._unique_id
+                        if dep_id in run_visited:
+                            continue
+                        if not dep.__runtime_dependencies:
+                            # Shortcut for elements without runtime dependencies
+                            run_visited.add(dep_id)
+                            yield dep
+                        else:
+                            stack.append((dep, _Scope.RUN, visit(dep, _Scope.RUN)))
+                            break
+                    else:
+                        stack.pop()
+                        if element_scope is not _Scope.BUILD:
+                            yield element
 
     # _search()
     #
@@ -1393,6 +1415,37 @@ class Element(Plugin):
         # updated).
         self.__update_cache_keys()
 
+    # _prepare_cache_query():
+    #
+    # Calculates the weak and strict cache keys ahead of `_initialize_state()`
+    # and creates the candidate artifacts for them, such that the cached state
+    # of many elements can be resolved at once with ArtifactCache.query_cached().
+    #
+    # The element dependencies must have been prepared first.
+    #
+    # Returns:
+    #    (list): The Artifact objects whose cached state needs to be queried
+    #
+    def _prepare_cache_query(self):
+        if self.__resolved_initial_state or self.__prepared_artifacts is not None:
+            return []
+
+        self.__sources.update_resolved_state()
+
+        if not self.__calculate_cache_keys():
+            return []
+
+        context = self._get_context()
+
+        strict_artifact = Artifact(self, context, strong_key=self.__strict_cache_key, weak_key=self.__weak_cache_key)
+        if context.get_strict():
+            self.__prepared_artifacts = (strict_artifact, None)
+            return [strict_artifact]
+
+        weak_artifact = Artifact(self, context, weak_key=self.__weak_cache_key)
+        self.__prepared_artifacts = (strict_artifact, weak_artifact)
+        return [strict_artifact, weak_artifact]
+
     # _get_display_key():
     #
     # Returns cache keys for display purposes
@@ -1853,7 +1906,11 @@ class Element(Plugin):
         self.__update_cache_key_non_strict()
 
         with self.timed_activity("Caching artifact"):
-            artifact_size = self.__artifact.cache(sandbox_build_dir, collectvdir, sourcesvdir, buildresult, publicdata)
+            # The split domains are only indexed if the element has split rules
+            splits = self.__compile_splits(publicdata.get_mapping("bst", default={}))
+            artifact_size = self.__artifact.cache(
+                sandbox_build_dir, collectvdir, sourcesvdir, buildresult, publicdata, splits=splits
+            )
 
         if collect is not None and collectvdir is None:
             raise ElementError(
@@ -1902,7 +1959,16 @@ class Element(Plugin):
 
         # Pull is pending if artifact remote server available
         # and pull has not been attempted yet
-        return self.__artifacts.has_fetch_remotes(plugin=self) and not self.__pull_done
+        if not self.__artifacts.has_fetch_remotes(plugin=self) or self.__pull_done:
+            return False
+
+        # Don't bother pulling if the remotes are already known
+        # to not have any of the artifacts we could pull
+        keys = [self.__strict_cache_key]
+        if not self._get_context().get_strict() and not self._cached():
+            keys.append(self.__weak_cache_key)
+
+        return any(self.__artifacts.remote_contains(self, key) is not False for key in keys)
 
     # _pull_done()
     #
@@ -2207,14 +2273,18 @@ class Element(Plugin):
     #
     # Fetch the element's sources.
     #
+    # Args:
+    #    fetch_original (bool): Always fetch original sources
+    #    fetchers (int): The maximum number of sources to fetch concurrently
+    #
     # Raises:
     #    SourceError: If one of the element sources has an error
     #
-    def _fetch(self, fetch_original=False):
+    def _fetch(self, fetch_original=False, fetchers=1):
         if fetch_original:
-            self.__sources.fetch_sources(fetch_original=True)
+            self.__sources.fetch_sources(fetch_original=True, fetchers=fetchers)
 
-        self.__sources.fetch()
+        self.__sources.fetch(fetchers=fetchers)
 
         if not self.__sources.cached():
             try:
@@ -2243,14 +2313,14 @@ class Element(Plugin):
         if any(not all(dep) for dep in dependencies):
             return None
 
-        # Generate dict that is used as base for all cache keys
-        if self.__cache_key_dict is None:
+        # Generate the partial key that is used as base for all cache keys
+        if self.__cache_key_base is None:
             # Filter out nocache variables from the element's environment
             cache_env = {key: value for key, value in self.__environment.items() if key not in self.__env_nocache}
 
             project = self._get_project()
 
-            self.__cache_key_dict = {
+            cache_key_dict = {
                 "core-artifact-version": BST_CORE_ARTIFACT_VERSION,
                 "element-base-key": self.__get_base_key(),
                 "element-plugin-key": self.get_unique_key(),
@@ -2261,14 +2331,15 @@ class Element(Plugin):
                 "public": self.__public.strip_node_info(),
             }
 
-            self.__cache_key_dict["sources"] = self.__sources.get_unique_key()
+            cache_key_dict["sources"] = self.__sources.get_unique_key()
 
-            self.__cache_key_dict["fatal-warnings"] = sorted(project._fatal_warnings)
+            cache_key_dict["fatal-warnings"] = sorted(project._fatal_warnings)
 
-        cache_key_dict = self.__cache_key_dict.copy()
-        cache_key_dict["dependencies"] = dependencies
+            # Only the dependencies differ between the keys, serialize
+            # everything else only once
+            self.__cache_key_base = _cachekey.PartialKey(cache_key_dict, "dependencies")
 
-        return _cachekey.generate_key(cache_key_dict)
+        return self.__cache_key_base.generate_key(dependencies)
 
     # _cached_sources()
     #
@@ -2898,23 +2969,50 @@ class Element(Plugin):
         # Convert back to list now we know they're unique
         return list(env_nocache)
 
-    # This will resolve the final variables to be used when
-    # substituting command strings to be run in the sandbox
+    # This will collect the variables overridden by the element itself,
+    # to be resolved on top of the variables layer of the element's kind
     #
     @classmethod
-    def __extract_variables(cls, project, load_element):
-        default_vars = cls.__defaults.get_mapping(Symbol.VARIABLES, default={})
+    def __extract_variables(cls, load_element):
         element_vars = load_element.node.get_mapping(Symbol.VARIABLES, default={}) or Node.from_dict({})
 
+        variables = element_vars.clone()
+        variables._assert_fully_composited()
+        cls.__check_protected_variables(variables)
+
+        return variables
+
+    # This will get the resolved variables shared by all elements of
+    # the same kind in the project, composited from the project's
+    # variables and the element kind's defaults
+    #
+    @classmethod
+    def __get_variables_layer(cls, project, load_element):
         if load_element.first_pass:
-            variables = project.first_pass_config.base_variables.clone()
+            config = project.first_pass_config
         else:
-            variables = project.base_variables.clone()
+            config = project.config
+
+        try:
+            return config.variables_layers[load_element.kind]
+        except KeyError:
+            pass
 
+        default_vars = cls.__defaults.get_mapping(Symbol.VARIABLES, default={})
+        variables = config.base_variables.clone()
         default_vars._composite(variables)
-        element_vars._composite(variables)
         variables._assert_fully_composited()
+        cls.__check_protected_variables(variables)
+
+        layer = Variables(variables)
+        config.variables_layers[load_element.kind] = layer
+        return layer
 
+    # Asserts that none of the protected variables are redefined
+    # in the given variables
+    #
+    @classmethod
+    def __check_protected_variables(cls, variables):
         for var in ("project-name", "element-name", "max-jobs"):
             node = variables.get_node(var, allow_none=True)
 
@@ -2928,8 +3026,6 @@ class Element(Plugin):
                     LoadErrorReason.PROTECTED_VARIABLE_REDEFINED,
                 )
 
-        return variables
-
     # This will resolve the final configuration to be handed
     # off to element.configure()
     #
@@ -2997,8 +3093,22 @@ class Element(Plugin):
 
     def __init_splits(self):
         bstdata = self.get_public_data("bst")
-        splits = bstdata.get_mapping("split-rules")
-        self.__splits = {
+        self.__splits = self.__compile_splits(bstdata)
+
+    # __compile_splits():
+    #
+    # Compiles the split rules of the given bst public data.
+    #
+    # Args:
+    #    bstdata (MappingNode): The "bst" domain of the public data
+    #
+    # Returns:
+    #    (dict): The compiled regular expression of each split domain
+    #
+    @staticmethod
+    def __compile_splits(bstdata):
+        splits = bstdata.get_mapping("split-rules", default={})
+        return {
             domain: re.compile("^(?:" + "|".join([utils._glob2re(r) for r in rules.as_str_list()]) + ")$")
             for domain, rules in splits.items()
         }
@@ -3040,6 +3150,107 @@ class Element(Plugin):
 
         return include_file and not exclude_file
 
+    # __split_index_filter():
+    #
+    # Returns True if the file with the specified `path` is selected in
+    # the bitmap computed from the artifact's split domain index. This is
+    # used by `__split_filter_func()` to create a filter callback.
+    #
+    # Args:
+    #    positions (dict): The position of each path in the bitmap
+    #    selected (bytes): The bitmap of selected paths
+    #    fallback (callable): The filter callback for paths missing from the index
+    #    path (str): The relative path of the file
+    #
+    # Returns:
+    #    (bool): Whether to include the specified file
+    #
+    def __split_index_filter(self, positions, selected, fallback, path):
+        try:
+            position = positions[path]
+        except KeyError:
+            return fallback(path)
+
+        return bool(selected[position >> 3] & (1 << (position & 7)))
+
+    # __split_index_subtree_filter():
+    #
+    # Checks whether the subtree of a directory is selected completely in
+    # the bitmap computed from the artifact's split domain index. This is
+    # used by `__split_filter_func()` to create a subtree filter callback.
+    #
+    # Args:
+    #    subtrees (dict): The range of positions of each directory's subtree
+    #    selected (int): The bitmap of selected paths
+    #    path (str): The relative path of the directory
+    #
+    # Returns:
+    #    (bool): True if the complete subtree is included, False if it is
+    #            excluded, or None if it is only partially included
+    #
+    def __split_index_subtree_filter(self, subtrees, selected, path):
+        try:
+            start, end = subtrees[path]
+        except KeyError:
+            return None
+
+        mask = (1 << (end - start)) - 1
+        bits = (selected >> start) & mask
+        if bits == mask:
+            return True
+        elif bits == 0:
+            return False
+        return None
+
+    # __split_index_filter_func():
+    #
+    # Returns a filter callback which uses the split domain index of
+    # the artifact instead of matching the split rules, or None if the
+    # artifact has no suitable index.
+    #
+    # Args:
+    #    element_domains (list): All domains for this element
+    #    include (list): A list of domains to include files from
+    #    exclude (list): A list of domains to exclude files from
+    #    orphans (bool): Whether to include files not spoken for by split domains
+    #    fallback (callable): The filter callback for paths missing from the index
+    #
+    # Returns:
+    #    (callable): Filter callback that returns True if the file is included
+    #                in the specified split domains, with a `subtree_filter`
+    #                for checking complete directories at once.
+    #
+    def __split_index_filter_func(self, element_domains, include, exclude, orphans, fallback):
+        split_index = self.__artifact.get_split_index()
+        if split_index is None:
+            return None
+
+        positions, subtrees, bitmaps = split_index
+        if set(bitmaps) != set(element_domains):
+            return None
+
+        selected = 0
+        for domain in include:
+            selected |= bitmaps[domain]
+
+        if orphans:
+            claimed = 0
+            for bitmap in bitmaps.values():
+                claimed |= bitmap
+            selected |= ~claimed
+
+        for domain in exclude:
+            selected &= ~bitmaps[domain]
+
+        # Truncate to the number of paths, this also gets rid of the
+        # infinite leading ones of negative numbers
+        length = (len(positions) + 7) // 8
+        selected &= (1 << (length * 8)) - 1
+
+        split_filter = partial(self.__split_index_filter, positions, selected.to_bytes(length, "little"), fallback)
+        split_filter.subtree_filter = partial(self.__split_index_subtree_filter, subtrees, selected)
+        return split_filter
+
     # __split_filter_func():
     #
     # Returns callable split filter function for use with `copy_files()`,
@@ -3076,7 +3287,11 @@ class Element(Plugin):
         # The arguments element_domains, include, exclude, and orphans are
         # the same for all files. Use `partial` to create a function with
         # the required callback signature: a single `path` parameter.
-        return partial(self.__split_filter, element_domains, include, exclude, orphans)
+        split_filter = partial(self.__split_filter, element_domains, include, exclude, orphans)
+
+        # Prefer the split domain index computed when the artifact was
+        # created over matching every path against the split rules
+        return self.__split_index_filter_func(element_domains, include, exclude, orphans, split_filter) or split_filter
 
     def __compute_splits(self, include=None, exclude=None, orphans=True):
         filter_func = self.__split_filter_func(include=include, exclude=exclude, orphans=orphans)
@@ -3134,25 +3349,48 @@ class Element(Plugin):
     # in Scope.BUILD has changed in any way.
     #
     def __update_cache_keys(self):
+        if self.__artifact is not None:
+            # Cache keys already calculated
+            return
+
+        if not self.__calculate_cache_keys():
+            return
+
+        # If we've newly calculated a cache key, our artifact's
+        # current state will also change - after all, we can now find
+        # a potential existing artifact.
+        self.__update_artifact_state()
+
+    # __calculate_cache_keys()
+    #
+    # Calculates the weak and strict cache keys, see __update_cache_keys().
+    #
+    # Returns:
+    #    (bool): Whether the weak and strict cache keys are available
+    #
+    def __calculate_cache_keys(self):
         if self.__strict_cache_key is not None:
             # Cache keys already calculated
             assert self.__weak_cache_key is not None
-            return
+            return True
 
         if not self._has_all_sources_resolved():
             # Tracking may still be pending
-            return
+            return False
 
         context = self._get_context()
 
+        # Both cache keys are calculated from the same build dependencies
+        build_dependencies = list(self._dependencies(_Scope.BUILD))
+
         # Calculate the strict cache key
-        dependencies = [[e.project_name, e.name, e.__strict_cache_key] for e in self._dependencies(_Scope.BUILD)]
+        dependencies = [[e.project_name, e.name, e.__strict_cache_key] for e in build_dependencies]
         self.__strict_cache_key = self._calculate_cache_key(dependencies)
 
         if self.__strict_cache_key is None:
             # Cache keys cannot be calculated yet as a build dependency doesn't
             # have a cache key yet.
-            return
+            return False
 
         # Calculate weak cache key
         #
@@ -3169,7 +3407,7 @@ class Element(Plugin):
             [e.project_name, e.name, e._get_cache_key(strength=_KeyStrength.WEAK)]
             if self.BST_STRICT_REBUILD or e in self.__strict_dependencies
             else [e.project_name, e.name]
-            for e in self._dependencies(_Scope.BUILD)
+            for e in build_dependencies
         ]
 
         self.__weak_cache_key = self._calculate_cache_key(dependencies)
@@ -3182,10 +3420,7 @@ class Element(Plugin):
             # In strict mode, the strong cache key always matches the strict cache key
             self.__cache_key = self.__strict_cache_key
 
-        # If we've newly calculated a cache key, our artifact's
-        # current state will also change - after all, we can now find
-        # a potential existing artifact.
-        self.__update_artifact_state()
+        return True
 
     # __update_artifact_state()
     #
@@ -3205,9 +3440,20 @@ class Element(Plugin):
 
         context = self._get_context()
 
-        strict_artifact = Artifact(self, context, strong_key=self.__strict_cache_key, weak_key=self.__weak_cache_key)
+        if self.__prepared_artifacts is not None:
+            # The cached state was already queried in bulk
+            strict_artifact, weak_artifact = self.__prepared_artifacts
+            self.__prepared_artifacts = None
+        else:
+            strict_artifact = Artifact(
+                self, context, strong_key=self.__strict_cache_key, weak_key=self.__weak_cache_key
+            )
+            weak_artifact = None
+
         if context.get_strict() or strict_artifact.cached():
             self.__artifact = strict_artifact
+        elif weak_artifact is not None:
+            self.__artifact = weak_artifact
         else:
             self.__artifact = Artifact(self, context, weak_key=self.__weak_cache_key)
 
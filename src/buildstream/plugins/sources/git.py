@@ -80,6 +80,17 @@ git - stage files from a git repository
        url: upstream:baz.git
        checkout: False
 
+   # Optionally share the git objects of this source with the git sources
+   # of all other elements which specify the same object pool name.
+   #
+   # This avoids storing the same objects many times over when several
+   # elements build forks or branches of the same upstream repository.
+   # Objects are fetched into the shared pool, which is used as an
+   # alternate object store by the mirror of each repository.
+   #
+   # Specifying an object pool does not affect the cache key.
+   object-pool: linux
+
    # Enable tag tracking.
    #
    # This causes the `tags` metadata to be populated automatically
@@ -159,6 +170,8 @@ class GitSource(_GitSourceBase):
 
     BST_MIN_VERSION = "2.0"
 
+    BST_STAGE_VIRTUAL_DIRECTORY = True
+
 
 # Plugin entry point
 def setup():
@@ -38,6 +38,7 @@ details on common configuration options for sources.
 
 import os
 from buildstream import Source, SourceError, Directory
+from buildstream.storage._casbaseddirectory import CasBasedDirectory
 
 
 class LocalSource(Source):
@@ -67,12 +68,13 @@ class LocalSource(Source):
         # As a core plugin, we use some private API to optimize file hashing.
         #
         # * Use Source._cache_directory() to prepare a Directory
-        # * Do the regular staging activity into the Directory
+        # * Do the regular staging activity into the Directory, using
+        #   the CAS import index to avoid hashing unmodified files again
         # * Use the hash of the cached digest as the unique key
         #
         if not self.__digest:
             with self._cache_directory() as directory:
-                self.__do_stage(directory)
+                self.__do_stage(directory, use_index=True)
                 self.__digest = directory._get_digest()
 
         return self.__digest.hash
@@ -123,10 +125,17 @@ class LocalSource(Source):
     # as a side effect of resolving the cache key, at stage time we just
     # do an internal CAS stage.
     #
-    def __do_stage(self, directory):
+    # With `use_index`, the directory must be a CasBasedDirectory.
+    #
+    def __do_stage(self, directory, *, use_index=False):
         with self.timed_activity("Staging local files into CAS"):
             if os.path.isdir(self.fullpath) and not os.path.islink(self.fullpath):
-                result = directory.import_files(self.fullpath)
+                if use_index:
+                    cas = self._get_context().get_cascache()
+                    digest = cas.import_directory(self.fullpath, use_index=True)
+                    result = directory.import_files(CasBasedDirectory(cas, digest=digest))
+                else:
+                    result = directory.import_files(self.fullpath)
             else:
                 result = directory.import_single_file(self.fullpath)
 
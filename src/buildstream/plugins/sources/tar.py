@@ -51,17 +51,23 @@ tar - stage files from tar archives
    # to an empty string.
    base-dir: '*'
 
+Archive members are streamed directly into the local CAS when staging,
+without extracting the tarball to a temporary directory first.
+
 See :ref:`built-in functionality doumentation <core_source_builtins>` for
 details on common configuration options for sources.
 """
 
 import os
+import stat
 import tarfile
 from contextlib import contextmanager
 from tempfile import TemporaryFile
 
 from buildstream import DownloadableFileSource, SourceError
 from buildstream import utils
+from buildstream.storage._casbaseddirectory import CasBasedDirectory
+from buildstream.storage.directory import VirtualDirectoryError, _FileType
 
 
 class ReadableTarInfo(tarfile.TarInfo):
@@ -91,6 +97,7 @@ class TarSource(DownloadableFileSource):
     # pylint: disable=attribute-defined-outside-init
 
     BST_MIN_VERSION = "2.0"
+    BST_STAGE_VIRTUAL_DIRECTORY = True
 
     def configure(self, node):
         super().configure(node)
@@ -133,39 +140,75 @@ class TarSource(DownloadableFileSource):
                 if self.base_dir:
                     base_dir = self._find_base_dir(tar, self.base_dir)
 
-                def filter_non_dev(tarfiles):
-                    for file in tarfiles:
-                        if not file.isdev():
-                            yield file
-
-                if base_dir:
-                    tar.extractall(
-                        path=directory, members=filter_non_dev(self._extract_members(tar, base_dir, directory))
-                    )
+                if isinstance(directory, CasBasedDirectory):
+                    # As a core plugin, we use private API to stream the
+                    # members straight into CAS
+                    members = self._get_members(tar, base_dir)
+                    directory._import_file_objects(self._stream_members(tar, members))
                 else:
-                    tar.extractall(path=directory, members=filter_non_dev(tar.getmembers()))
+                    with self.tempdir() as tempdir:
+                        tar.extractall(path=tempdir, members=self._get_members(tar, base_dir))
+                        directory.import_files(tempdir)
 
-        except (tarfile.TarError, OSError) as e:
+        except (tarfile.TarError, OSError, VirtualDirectoryError) as e:
             raise SourceError("{}: Error staging source: {}".format(self, e)) from e
 
+    # Get the members to stage, relative to the base directory, if any
+    def _get_members(self, tar, base_dir):
+        if base_dir:
+            members = self._extract_members(tar, base_dir)
+        else:
+            members = tar.getmembers()
+
+        for member in members:
+            if not member.isdev():
+                yield member
+
+    # Translate members to entries for CasBasedDirectory._import_file_objects()
+    def _stream_members(self, tar, members):
+        for member in members:
+            if member.isdir():
+                yield member.path, _FileType.DIRECTORY, None, False
+            elif member.issym():
+                yield member.path, _FileType.SYMLINK, member.linkname, False
+            else:
+                # Regular files and hardlinks, which are resolved by
+                # extractfile() and staged as copies of their target
+                try:
+                    fileobj = tar.extractfile(member)
+                except KeyError as e:
+                    raise SourceError(
+                        "{}: Hardlink target not found: {} -> {}".format(self, member.path, member.linkname)
+                    ) from e
+                if fileobj is None:
+                    continue
+
+                with fileobj:
+                    yield member.path, _FileType.REGULAR_FILE, fileobj, bool(member.mode & stat.S_IXUSR)
+
     # Override and translate which filenames to extract
-    def _extract_members(self, tar, base_dir, target_dir):
+    def _extract_members(self, tar, base_dir):
+
+        # Check whether a relative path points outside of the
+        # staging area
+        def is_outside(path):
+            path = os.path.normpath(path)
+            return os.path.isabs(path) or path == ".." or path.startswith("../")
 
         # Assert that a tarfile is safe to extract; specifically, make
         # sure that we don't do anything outside of the target
         # directory (this is possible, if, say, someone engineered a
         # tarfile to contain paths that start with ..).
         def assert_safe(member):
-            final_path = os.path.abspath(os.path.join(target_dir, member.path))
-            if not final_path.startswith(target_dir):
+            final_path = os.path.normpath(member.path)
+            if is_outside(final_path):
                 raise SourceError(
                     "{}: Tarfile attempts to extract outside the staging area: "
                     "{} -> {}".format(self, member.path, final_path)
                 )
 
             if member.islnk():
-                linked_path = os.path.abspath(os.path.join(target_dir, member.linkname))
-                if not linked_path.startswith(target_dir):
+                if is_outside(member.linkname):
                     raise SourceError(
                         "{}: Tarfile attempts to hardlink outside the staging area: "
                         "{} -> {}".format(self, member.path, final_path)
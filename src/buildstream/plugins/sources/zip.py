@@ -54,6 +54,9 @@ details on common configuration options for sources.
 
    File permissions are not preserved. All extracted directories have
    permissions 0755 and all extracted files have permissions 0644.
+
+Archive members are streamed directly into the local CAS when staging,
+without extracting the archive to a temporary directory first.
 """
 
 import os
@@ -62,12 +65,15 @@ import stat
 
 from buildstream import DownloadableFileSource, SourceError
 from buildstream import utils
+from buildstream.storage._casbaseddirectory import CasBasedDirectory
+from buildstream.storage.directory import VirtualDirectoryError, _FileType
 
 
 class ZipSource(DownloadableFileSource):
     # pylint: disable=attribute-defined-outside-init
 
     BST_MIN_VERSION = "2.0"
+    BST_STAGE_VIRTUAL_DIRECTORY = True
 
     def configure(self, node):
         super().configure(node)
@@ -79,9 +85,6 @@ class ZipSource(DownloadableFileSource):
         return super().get_unique_key() + [self.base_dir]
 
     def stage(self, directory):
-        exec_rights = (stat.S_IRWXU | stat.S_IRWXG | stat.S_IRWXO) & ~(stat.S_IWGRP | stat.S_IWOTH)
-        noexec_rights = exec_rights & ~(stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
-
         try:
             with zipfile.ZipFile(self._get_mirror_file()) as archive:
                 base_dir = None
@@ -91,29 +94,55 @@ class ZipSource(DownloadableFileSource):
                 if base_dir:
                     members = self._extract_members(archive, base_dir)
                 else:
-                    members = archive.namelist()
-
-                for member in members:
-                    written = archive.extract(member, path=directory)
-
-                    # zipfile.extract might create missing directories
-                    rel = os.path.relpath(written, start=directory)
-                    assert not os.path.isabs(rel)
-                    rel = os.path.dirname(rel)
-                    while rel:
-                        os.chmod(os.path.join(directory, rel), exec_rights)
-                        rel = os.path.dirname(rel)
-
-                    if os.path.islink(written):
-                        pass
-                    elif os.path.isdir(written):
-                        os.chmod(written, exec_rights)
-                    else:
-                        os.chmod(written, noexec_rights)
-
-        except (zipfile.BadZipFile, zipfile.LargeZipFile, OSError) as e:
+                    members = archive.infolist()
+
+                if isinstance(directory, CasBasedDirectory):
+                    # As a core plugin, we use private API to stream the
+                    # members straight into CAS
+                    directory._import_file_objects(self._stream_members(archive, members))
+                else:
+                    with self.tempdir() as tempdir:
+                        self._extract(archive, members, tempdir)
+                        directory.import_files(tempdir)
+
+        except (zipfile.BadZipFile, zipfile.LargeZipFile, OSError, VirtualDirectoryError) as e:
             raise SourceError("{}: Error staging source: {}".format(self, e)) from e
 
+    def _extract(self, archive, members, directory):
+        exec_rights = (stat.S_IRWXU | stat.S_IRWXG | stat.S_IRWXO) & ~(stat.S_IWGRP | stat.S_IWOTH)
+        noexec_rights = exec_rights & ~(stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+        for member in members:
+            written = archive.extract(member, path=directory)
+
+            # zipfile.extract might create missing directories
+            rel = os.path.relpath(written, start=directory)
+            assert not os.path.isabs(rel)
+            rel = os.path.dirname(rel)
+            while rel:
+                os.chmod(os.path.join(directory, rel), exec_rights)
+                rel = os.path.dirname(rel)
+
+            if os.path.islink(written):
+                pass
+            elif os.path.isdir(written):
+                os.chmod(written, exec_rights)
+            else:
+                os.chmod(written, noexec_rights)
+
+    # Translate members to entries for CasBasedDirectory._import_file_objects()
+    def _stream_members(self, archive, members):
+        for member in members:
+            # Sanitize the path like zipfile.extract() does, dropping
+            # empty, '.' and '..' components
+            path = "/".join(x for x in member.filename.split("/") if x not in ("", ".", ".."))
+
+            if member.filename.endswith("/"):
+                yield path, _FileType.DIRECTORY, None, False
+            else:
+                with archive.open(member) as fileobj:
+                    yield path, _FileType.REGULAR_FILE, fileobj, False
+
     # Override and translate which filenames to extract
     def _extract_members(self, archive, base_dir):
         if not base_dir.endswith(os.sep):
@@ -21,6 +21,7 @@
 import os
 import shutil
 from collections import namedtuple
+from contextlib import contextmanager
 from urllib.parse import urlparse
 from functools import partial
 
@@ -44,6 +45,207 @@ class RemoteExecutionSpec(namedtuple("RemoteExecutionSpec", "exec_service storag
     pass
 
 
+# The TLS keys of the remote execution service configurations
+_TLS_KEYS = ["server-cert", "client-key", "client-cert"]
+
+
+# _RemoteConnectionPool()
+#
+# A pool of long lived connections to the remote execution services,
+# shared by all remote sandboxes of a process.
+#
+# This allows every command run in remote sandboxes of a job to reuse the
+# channels to the execution and action cache services, and the initialized
+# remote of the storage service, instead of setting them up again.
+#
+# gRPC channels cannot be used across a fork, use get_connection_pool()
+# to get the pool of the current process.
+#
+class _RemoteConnectionPool:
+    def __init__(self):
+        self.pid = os.getpid()
+
+        self.opened = 0  # The number of connections which were set up
+        self.reused = 0  # The number of times a connection was reused
+
+        self._channels = {}  # Channels by service url and TLS files
+        self._cas_remotes = {}  # Initialized CASRemotes by RemoteSpec and CASCache
+
+    # get_channel()
+    #
+    # Get a channel to a remote execution or action cache service.
+    #
+    # Args:
+    #    service_name (str): The name of the service, for error messages
+    #    service (dict): The service configuration
+    #
+    # Returns:
+    #    (grpc.Channel): The channel to the service
+    #
+    # Raises:
+    #    (SandboxError): If the configuration is invalid
+    #
+    def get_channel(self, service_name, service):
+        key = (service["url"], *(service.get(tls_key) for tls_key in _TLS_KEYS))
+        channel = self._channels.get(key)
+        if channel is not None:
+            self.reused += 1
+            return channel
+
+        url = urlparse(service["url"])
+        if not url.port:
+            raise SandboxError(
+                "You must supply a protocol and port number in the {} url, "
+                "for example: http://buildservice:50051.".format(service_name)
+            )
+        if url.scheme == "http":
+            channel = grpc.insecure_channel("{}:{}".format(url.hostname, url.port))
+        elif url.scheme == "https":
+            certs = {}
+            try:
+                for tls_key in _TLS_KEYS:
+                    if tls_key in service:
+                        with open(service[tls_key], "rb") as f:
+                            certs[tls_key] = f.read()
+            except OSError as e:
+                raise SandboxError("Could not read certificates for the {}: {}".format(service_name, e)) from e
+
+            credentials = grpc.ssl_channel_credentials(
+                root_certificates=certs.get("server-cert"),
+                private_key=certs.get("client-key"),
+                certificate_chain=certs.get("client-cert"),
+            )
+            channel = grpc.secure_channel("{}:{}".format(url.hostname, url.port), credentials)
+        else:
+            raise SandboxError(
+                "Remote execution currently only supports the 'http' protocol "
+                "and '{}' was supplied.".format(url.scheme)
+            )
+
+        self._channels[key] = channel
+        self.opened += 1
+        return channel
+
+    # get_cas_remote()
+    #
+    # Get an initialized remote for the storage service.
+    #
+    # Args:
+    #    spec (RemoteSpec): The spec of the storage service
+    #    cascache (CASCache): The local CAS cache
+    #
+    # Returns:
+    #    (CASRemote): The initialized remote
+    #
+    # Raises:
+    #    (SandboxError): If the remote could not be initialized
+    #
+    def get_cas_remote(self, spec, cascache):
+        casremote = self._cas_remotes.get((spec, cascache))
+        if casremote is not None:
+            self.reused += 1
+            return casremote
+
+        casremote = CASRemote(spec, cascache)
+        try:
+            casremote.init()
+        except grpc.RpcError as e:
+            casremote.close()
+            raise SandboxError("Failed to contact remote execution CAS endpoint at {}: {}".format(spec.url, e)) from e
+
+        self._cas_remotes[(spec, cascache)] = casremote
+        self.opened += 1
+        return casremote
+
+    # cas_remote()
+    #
+    # Context manager to use a pooled remote of the storage service,
+    # which discards the remote if an error occurs while using it,
+    # such that a new remote is set up when the action is retried.
+    #
+    # Args:
+    #    spec (RemoteSpec): The spec of the storage service
+    #    cascache (CASCache): The local CAS cache
+    #
+    # Yields:
+    #    (CASRemote): The initialized remote
+    #
+    # Raises:
+    #    (SandboxError): If the remote could not be initialized
+    #
+    @contextmanager
+    def cas_remote(self, spec, cascache):
+        casremote = self.get_cas_remote(spec, cascache)
+        try:
+            yield casremote
+        except (grpc.RpcError, BstError):
+            if self._cas_remotes.get((spec, cascache)) is casremote:
+                del self._cas_remotes[(spec, cascache)]
+                casremote.close()
+            raise
+
+    # discard_channel()
+    #
+    # Close and remove a channel from the pool, such that a new channel
+    # is set up when the service is used again, after a failure.
+    #
+    # Args:
+    #    channel (grpc.Channel): The channel to discard
+    #
+    def discard_channel(self, channel):
+        for key, pooled_channel in list(self._channels.items()):
+            if pooled_channel is channel:
+                del self._channels[key]
+                channel.close()
+
+    # close()
+    #
+    # Close all connections of the pool.
+    #
+    def close(self):
+        for channel in self._channels.values():
+            channel.close()
+        for casremote in self._cas_remotes.values():
+            casremote.close()
+
+        self._channels = {}
+        self._cas_remotes = {}
+
+
+_connection_pool = None
+
+
+# get_connection_pool()
+#
+# Get the remote execution connection pool of the current process.
+#
+# Returns:
+#    (_RemoteConnectionPool): The connection pool
+#
+def get_connection_pool():
+    global _connection_pool  # pylint: disable=global-statement
+
+    # Connections of the parent process are abandoned
+    # without closing them, which is not safe after a fork
+    if _connection_pool is None or _connection_pool.pid != os.getpid():
+        _connection_pool = _RemoteConnectionPool()
+
+    return _connection_pool
+
+
+# close_connection_pool()
+#
+# Close the remote execution connections of the current process, this
+# is called when a job process finishes.
+#
+def close_connection_pool():
+    global _connection_pool  # pylint: disable=global-statement
+
+    if _connection_pool is not None and _connection_pool.pid == os.getpid():
+        _connection_pool.close()
+    _connection_pool = None
+
+
 # SandboxRemote()
 #
 # This isn't really a sandbox, it's a stub which sends all the sources and build
@@ -64,37 +266,16 @@ class SandboxRemote(SandboxREAPI):
 
         self.storage_url = config.storage_service["url"]
         self.exec_url = config.exec_service["url"]
-
-        exec_certs = {}
-        for key in ["client-cert", "client-key", "server-cert"]:
-            if key in config.exec_service:
-                with open(config.exec_service[key], "rb") as f:
-                    exec_certs[key] = f.read()
-
-        self.exec_credentials = grpc.ssl_channel_credentials(
-            root_certificates=exec_certs.get("server-cert"),
-            private_key=exec_certs.get("client-key"),
-            certificate_chain=exec_certs.get("client-cert"),
-        )
-
-        action_certs = {}
-        for key in ["client-cert", "client-key", "server-cert"]:
-            if key in config.action_service:
-                with open(config.action_service[key], "rb") as f:
-                    action_certs[key] = f.read()
+        self.exec_service = config.exec_service
 
         if config.action_service:
             self.action_url = config.action_service["url"]
             self.action_instance = config.action_service.get("instance-name", None)
-            self.action_credentials = grpc.ssl_channel_credentials(
-                root_certificates=action_certs.get("server-cert"),
-                private_key=action_certs.get("client-key"),
-                certificate_chain=action_certs.get("client-cert"),
-            )
+            self.action_service = config.action_service
         else:
             self.action_url = None
             self.action_instance = None
-            self.action_credentials = None
+            self.action_service = None
 
         self.exec_instance = config.exec_service.get("instance-name", None)
         self.storage_instance = config.storage_service.get("instance-name", None)
@@ -215,9 +396,16 @@ class SandboxRemote(SandboxREAPI):
             except grpc.RpcError as e:
                 status_code = e.code()
 
+                if status_code == grpc.StatusCode.FAILED_PRECONDITION:
+                    # Blobs of the input root are missing on the remote
+                    raise SandboxError(
+                        "Failed contacting remote execution server at {}."
+                        "{}: {}".format(self.exec_url, status_code.name, e.details()),
+                        reason="missing-inputs",
+                    )
+
                 if status_code in (
                     grpc.StatusCode.INVALID_ARGUMENT,
-                    grpc.StatusCode.FAILED_PRECONDITION,
                     grpc.StatusCode.RESOURCE_EXHAUSTED,
                     grpc.StatusCode.INTERNAL,
                     grpc.StatusCode.DEADLINE_EXCEEDED,
@@ -292,16 +480,16 @@ class SandboxRemote(SandboxREAPI):
                     # artifact servers.
                     blobs_to_fetch = artifactcache.find_missing_blobs(project, local_missing_blobs)
 
-                with CASRemote(self.storage_remote_spec, cascache) as casremote:
+                with get_connection_pool().cas_remote(self.storage_remote_spec, cascache) as casremote:
                     cascache.fetch_blobs(casremote, blobs_to_fetch)
 
     def _execute_action(self, action, flags):
         stdout, stderr = self._get_output()
 
         context = self._get_context()
-        project = self._get_project()
         cascache = context.get_cascache()
-        artifactcache = context.artifactcache
+
+        pool = get_connection_pool()
 
         action_digest = cascache.add_object(buffer=action.SerializeToString())
 
@@ -309,67 +497,11 @@ class SandboxRemote(SandboxREAPI):
         action_result = self._check_action_cache(action_digest)
 
         if not action_result:
-            with CASRemote(self.storage_remote_spec, cascache) as casremote:
-                try:
-                    casremote.init()
-                except grpc.RpcError as e:
-                    raise SandboxError(
-                        "Failed to contact remote execution CAS endpoint at {}: {}".format(self.storage_url, e)
-                    ) from e
-
-                with self._get_context().messenger.timed_activity(
-                    "Uploading input root", element_name=self._get_element_name()
-                ):
-                    # Determine blobs missing on remote
-                    try:
-                        input_root_digest = action.input_root_digest
-                        missing_blobs = list(cascache.remote_missing_blobs_for_directory(casremote, input_root_digest))
-                    except grpc.RpcError as e:
-                        raise SandboxError("Failed to determine missing blobs: {}".format(e)) from e
-
-                    # Check if any blobs are also missing locally (partial artifact)
-                    # and pull them from the artifact cache.
-                    try:
-                        local_missing_blobs = cascache.local_missing_blobs(missing_blobs)
-                        if local_missing_blobs:
-                            artifactcache.fetch_missing_blobs(project, local_missing_blobs)
-                    except (grpc.RpcError, BstError) as e:
-                        raise SandboxError("Failed to pull missing blobs from artifact cache: {}".format(e)) from e
-
-                    # Add command and action messages to blob list to push
-                    missing_blobs.append(action.command_digest)
-                    missing_blobs.append(action_digest)
-
-                    # Now, push the missing blobs to the remote.
-                    try:
-                        cascache.send_blobs(casremote, missing_blobs)
-                    except grpc.RpcError as e:
-                        raise SandboxError("Failed to push source directory to remote: {}".format(e)) from e
-
-            # Next, try to create a communication channel to the BuildGrid server.
-            url = urlparse(self.exec_url)
-            if not url.port:
-                raise SandboxError(
-                    "You must supply a protocol and port number in the execution-service url, "
-                    "for example: http://buildservice:50051."
-                )
-            if url.scheme == "http":
-                channel = grpc.insecure_channel("{}:{}".format(url.hostname, url.port))
-            elif url.scheme == "https":
-                channel = grpc.secure_channel("{}:{}".format(url.hostname, url.port), self.exec_credentials)
-            else:
-                raise SandboxError(
-                    "Remote execution currently only supports the 'http' protocol "
-                    "and '{}' was supplied.".format(url.scheme)
-                )
-
-            # Now request to execute the action
-            with channel:
-                operation = self.run_remote_command(channel, action_digest)
-                action_result = self._extract_action_result(operation)
+            operation = self._upload_and_run_action(pool, action, action_digest)
+            action_result = self._extract_action_result(operation)
 
         # Fetch outputs
-        with CASRemote(self.storage_remote_spec, cascache) as casremote:
+        with pool.cas_remote(self.storage_remote_spec, cascache) as casremote:
             for output_directory in action_result.output_directories:
                 tree_digest = output_directory.tree_digest
                 if tree_digest is None or not tree_digest.hash:
@@ -381,6 +513,14 @@ class SandboxRemote(SandboxREAPI):
             # Fetch stdout and stderr blobs
             cascache.fetch_blobs(casremote, [action_result.stdout_digest, action_result.stderr_digest])
 
+        context.messenger.message(
+            Message(
+                MessageType.DEBUG,
+                "Remote execution connections: {} opened, {} reused".format(pool.opened, pool.reused),
+                element_name=self._get_element_name(),
+            )
+        )
+
         # Forward remote stdout and stderr
         if stdout:
             if action_result.stdout_digest.hash:
@@ -397,6 +537,120 @@ class SandboxRemote(SandboxREAPI):
 
         return action_result
 
+    # _upload_and_run_action()
+    #
+    # Upload the input root and execute an action on the execution service.
+    #
+    # The input root is uploaded skipping the directories which are known
+    # to be present on the remote. If the remote reports that blobs of the
+    # input root are missing, either with a FAILED_PRECONDITION status in
+    # the execute response or by failing the Execute call with it, the
+    # blobs of the complete input root are uploaded and the action is
+    # executed once more.
+    #
+    # Args:
+    #    pool (_RemoteConnectionPool): The connection pool
+    #    action (Action): The action
+    #    action_digest (Digest): The digest of the action
+    #
+    # Returns:
+    #    (Operation): The completed operation, or None
+    #
+    def _upload_and_run_action(self, pool, action, action_digest):
+        cascache = self._get_context().get_cascache()
+
+        with pool.cas_remote(self.storage_remote_spec, cascache) as casremote:
+            self._upload_input_root(casremote, action, action_digest)
+
+        # Now request to execute the action
+        try:
+            operation = self._run_action(pool, action_digest)
+            inputs_missing = self._inputs_missing(operation)
+        except SandboxError as e:
+            if e.reason != "missing-inputs":
+                raise
+            inputs_missing = True
+
+        if inputs_missing:
+            # The remote lacks blobs of directories which it has,
+            # upload the blobs of the complete input root and retry
+            with pool.cas_remote(self.storage_remote_spec, cascache) as casremote:
+                cascache.forget_remote_blobs(casremote)
+                self._upload_input_root(casremote, action, action_digest, complete=True)
+            self.operation_name = None
+            operation = self._run_action(pool, action_digest)
+
+        return operation
+
+    # _upload_input_root()
+    #
+    # Upload the blobs of the input root, the command and the action
+    # which are missing on the remote.
+    #
+    # Args:
+    #    casremote (CASRemote): The remote of the storage service
+    #    action (Action): The action
+    #    action_digest (Digest): The digest of the action
+    #    complete (bool): Check every blob of the input root, rather than
+    #                     skipping the directories present on the remote
+    #
+    def _upload_input_root(self, casremote, action, action_digest, *, complete=False):
+        context = self._get_context()
+        project = self._get_project()
+        cascache = context.get_cascache()
+        artifactcache = context.artifactcache
+
+        with context.messenger.timed_activity("Uploading input root", element_name=self._get_element_name()):
+            # Determine blobs missing on remote
+            try:
+                input_root_digest = action.input_root_digest
+                if complete:
+                    required_blobs = cascache.required_blobs_for_directory(input_root_digest)
+                    missing_blobs = list(cascache.remote_missing_blobs(casremote, required_blobs))
+                else:
+                    missing_blobs = cascache.remote_missing_blobs_for_directory(casremote, input_root_digest)
+            except grpc.RpcError as e:
+                raise SandboxError("Failed to determine missing blobs: {}".format(e)) from e
+
+            # Check if any blobs are also missing locally (partial artifact)
+            # and pull them from the artifact cache.
+            try:
+                local_missing_blobs = cascache.local_missing_blobs(missing_blobs)
+                if local_missing_blobs:
+                    artifactcache.fetch_missing_blobs(project, local_missing_blobs)
+            except (grpc.RpcError, BstError) as e:
+                raise SandboxError("Failed to pull missing blobs from artifact cache: {}".format(e)) from e
+
+            # Add command and action messages to blob list to push
+            missing_blobs.append(action.command_digest)
+            missing_blobs.append(action_digest)
+
+            # Now, push the missing blobs to the remote.
+            try:
+                cascache.send_blobs(casremote, missing_blobs)
+            except grpc.RpcError as e:
+                raise SandboxError("Failed to push source directory to remote: {}".format(e)) from e
+
+    # _run_action()
+    #
+    # Execute an action on the execution service.
+    #
+    # Args:
+    #    pool (_RemoteConnectionPool): The connection pool
+    #    action_digest (Digest): The digest of the action
+    #
+    # Returns:
+    #    (Operation): The completed operation, or None
+    #
+    def _run_action(self, pool, action_digest):
+        channel = pool.get_channel("execution-service", self.exec_service)
+        try:
+            return self.run_remote_command(channel, action_digest)
+        except SandboxError:
+            # Set up a new channel if the command is retried
+            pool.discard_channel(channel)
+            raise
+
     def _check_action_cache(self, action_digest):
         # Checks the action cache to see if this artifact has already been built
         #
@@ -404,31 +658,35 @@ class SandboxRemote(SandboxREAPI):
         # Sandboxerror if other grpc error was raised
         if not self.action_url:
             return None
-        url = urlparse(self.action_url)
-        if not url.port:
-            raise SandboxError(
-                "You must supply a protocol and port number in the action-cache-service url, "
-                "for example: http://buildservice:50051."
-            )
-        if url.scheme == "http":
-            channel = grpc.insecure_channel("{}:{}".format(url.hostname, url.port))
-        elif url.scheme == "https":
-            channel = grpc.secure_channel("{}:{}".format(url.hostname, url.port), self.action_credentials)
+        channel = get_connection_pool().get_channel("action-cache-service", self.action_service)
 
-        with channel:
-            request = remote_execution_pb2.GetActionResultRequest(
-                instance_name=self.action_instance, action_digest=action_digest
-            )
-            stub = remote_execution_pb2_grpc.ActionCacheStub(channel)
-            try:
-                result = stub.GetActionResult(request)
-            except grpc.RpcError as e:
-                if e.code() != grpc.StatusCode.NOT_FOUND:
-                    raise SandboxError("Failed to query action cache: {} ({})".format(e.code(), e.details()))
-                return None
-            else:
-                self.info("Action result found in action cache")
-                return result
+        request = remote_execution_pb2.GetActionResultRequest(
+            instance_name=self.action_instance, action_digest=action_digest
+        )
+        stub = remote_execution_pb2_grpc.ActionCacheStub(channel)
+        try:
+            result = stub.GetActionResult(request)
+        except grpc.RpcError as e:
+            if e.code() != grpc.StatusCode.NOT_FOUND:
+                get_connection_pool().discard_channel(channel)
+                raise SandboxError("Failed to query action cache: {} ({})".format(e.code(), e.details()))
+            return None
+        else:
+            self.info("Action result found in action cache")
+            return result
+
+    # Whether the execution failed because blobs of the input root were
+    # missing on the remote, as reported by a FAILED_PRECONDITION status
+    @staticmethod
+    def _inputs_missing(operation):
+        if operation is None or operation.HasField("error") or not operation.HasField("response"):
+            return False
+
+        execution_response = remote_execution_pb2.ExecuteResponse()
+        if not operation.response.Unpack(execution_response):
+            return False
+
+        return execution_response.status.code == code_pb2.FAILED_PRECONDITION
 
     @staticmethod
     def _extract_action_result(operation):
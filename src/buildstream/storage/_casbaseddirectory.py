@@ -28,6 +28,7 @@ See also: :ref:`sandboxing`.
 """
 
 import os
+import shutil
 import stat
 import tarfile as tarfilelib
 from contextlib import contextmanager
@@ -41,6 +42,15 @@ from ._filebaseddirectory import FileBasedDirectory
 from ..utils import FileListResult, BST_ARBITRARY_TIMESTAMP
 
 
+# Files up to this size are read into memory when importing file objects,
+# and added to CAS in batches
+_SMALL_FILE_SIZE = 1024 * 1024
+
+# The maximum amount of small file content to keep in memory before
+# adding it to CAS
+_MAX_BUFFERED_BYTES = 64 * 1024 * 1024
+
+
 class IndexEntry:
     """ Directory entry used in CasBasedDirectory.index """
 
@@ -172,9 +182,7 @@ class CasBasedDirectory(Directory):
 
     def _populate_index(self, digest):
         try:
-            pb2_directory = remote_execution_pb2.Directory()
-            with open(self.cas_cache.objpath(digest), "rb") as f:
-                pb2_directory.ParseFromString(f.read())
+            pb2_directory = self.cas_cache.get_directory(digest)
         except FileNotFoundError as e:
             raise VirtualDirectoryError("Directory not found in local cache: {}".format(e)) from e
 
@@ -320,6 +328,85 @@ class CasBasedDirectory(Directory):
 
         self.__invalidate_digest()
 
+    def _add_new_file_direct(self, name, digest, is_executable):
+        self.index[name] = IndexEntry(
+            name, _FileType.REGULAR_FILE, digest=digest, is_executable=is_executable, modified=name in self.index
+        )
+
+        self.__invalidate_digest()
+
+    # _import_file_objects():
+    #
+    # Import files from file objects, such as the members of an archive,
+    # streaming their content into CAS instead of writing them out to a
+    # local directory first. The Directory protos are only built in memory.
+    #
+    # Small files are buffered and added to CAS in batches, larger files
+    # are copied to a temporary object one at a time.
+    #
+    # Entries are applied in order, a later entry replaces an earlier
+    # entry at the same path, as it would when extracting an archive.
+    #
+    # Args:
+    #     entries (iterable): Tuples of (path, type, content, is_executable),
+    #                         where content is a readable binary file object
+    #                         for regular files, the target for symlinks and
+    #                         None for directories
+    #
+    # Raises:
+    #     (VirtualDirectoryError): If a path points outside of this directory
+    #
+    def _import_file_objects(self, entries):
+        buffers = []
+        buffered_bytes = 0
+
+        for path, entrytype, content, is_executable in entries:
+            path = os.path.normpath(path.lstrip("/"))
+            if path == ".." or path.startswith("../"):
+                raise VirtualDirectoryError("Path '{}' points outside of {}".format(path, self))
+            if path == ".":
+                continue
+
+            *dirnames, name = path.split("/")
+            directory = self.descend(*dirnames, create=True)
+            existing = directory.index.get(name)
+
+            if entrytype == _FileType.DIRECTORY:
+                if existing and existing.type != _FileType.DIRECTORY:
+                    directory.remove(name)
+                directory.descend(name, create=True)
+                continue
+
+            if existing and existing.type == _FileType.DIRECTORY:
+                directory.remove(name, recursive=True)
+
+            if entrytype == _FileType.SYMLINK:
+                directory._add_new_link_direct(name, content)
+                continue
+
+            assert entrytype == _FileType.REGULAR_FILE
+
+            buffer = content.read(_SMALL_FILE_SIZE + 1)
+            if len(buffer) <= _SMALL_FILE_SIZE:
+                digest = utils._message_digest(buffer)
+                buffers.append(buffer)
+                buffered_bytes += len(buffer)
+                if buffered_bytes >= _MAX_BUFFERED_BYTES:
+                    self.cas_cache.add_objects(buffers)
+                    buffers = []
+                    buffered_bytes = 0
+            else:
+                with self.cas_cache._temporary_object() as f:
+                    f.write(buffer)
+                    shutil.copyfileobj(content, f)
+                    f.flush()
+                    digest = self.cas_cache.add_object(path=f.name, link_directly=True)
+
+            directory._add_new_file_direct(name, digest, is_executable)
+
+        if buffers:
+            self.cas_cache.add_objects(buffers)
+
     def remove(self, *path, recursive=False):
         if len(path) > 1:
             # Delegate remove to subdirectory
@@ -439,10 +526,18 @@ class CasBasedDirectory(Directory):
             return True
 
     def _partial_import_cas_into_cas(self, source_directory, filter_callback, *, path_prefix="", origin=None, result):
-        """ Import files from a CAS-based directory. """
+        """ Import files from a CAS-based directory.
+
+        The filter callback may have a `subtree_filter` attribute, a callable
+        which is called with the relative path of a directory and returns
+        True if the directory and everything below it is included, False if
+        all of it is excluded, or None if only some of it is included.
+        """
         if origin is None:
             origin = self
 
+        subtree_filter = getattr(filter_callback, "subtree_filter", None)
+
         for name, entry in source_directory.index.items():
             # The destination filename, relative to the root where the import started
             relative_pathname = os.path.join(path_prefix, name)
@@ -452,29 +547,29 @@ class CasBasedDirectory(Directory):
             if is_dir:
                 create_subdir = name not in self.index
 
-                if create_subdir and not filter_callback:
+                subtree_included = None
+                if subtree_filter:
+                    subtree_included = subtree_filter(relative_pathname)
+                    if subtree_included is False:
+                        # Complete subdirectory is filtered out
+                        continue
+
+                if create_subdir and (not filter_callback or subtree_included):
                     # If subdirectory does not exist yet and there is no filter,
-                    # we can import the whole source directory by digest instead
+                    # or the filter includes the complete subdirectory, we can
+                    # import the whole source directory by digest instead
                     # of importing each directory entry individually.
                     subdir_digest = entry.get_digest()
                     dest_entry = IndexEntry(name, _FileType.DIRECTORY, digest=subdir_digest)
                     self.index[name] = dest_entry
                     self.__invalidate_digest()
 
-                    # However, we still need to iterate over the directory entries
-                    # to fill in `result.files_written`.
-
-                    # Use source subdirectory object if it already exists,
-                    # otherwise create object for destination subdirectory.
-                    # This is based on the assumption that the destination
-                    # subdirectory is more likely to be modified later on
-                    # (e.g., by further import_files() calls).
-                    if entry.buildstream_object:
-                        subdir = entry.buildstream_object
-                    else:
-                        subdir = dest_entry.get_directory(self)
-
-                    subdir.__add_files_to_result(path_prefix=relative_pathname, result=result)
+                    # The files of the subdirectory are only listed in
+                    # `result.files_written` on demand, from a separate
+                    # object as the destination may be modified later on.
+                    result._add_written_subtree(
+                        relative_pathname, CasBasedDirectory(self.cas_cache, digest=subdir_digest)
+                    )
                 else:
                     src_subdir = source_directory.descend(name)
                     if src_subdir == origin:
@@ -488,8 +583,11 @@ class CasBasedDirectory(Directory):
                             "Destination is a {}, not a directory: /{}".format(filetype, relative_pathname)
                         )
 
+                    # No need to filter the entries of a subdirectory which is included completely
+                    subdir_filter_callback = None if subtree_included else filter_callback
+
                     dest_subdir._partial_import_cas_into_cas(
-                        src_subdir, filter_callback, path_prefix=relative_pathname, origin=origin, result=result
+                        src_subdir, subdir_filter_callback, path_prefix=relative_pathname, origin=origin, result=result
                     )
 
             if filter_callback and not filter_callback(relative_pathname):
@@ -508,7 +606,9 @@ class CasBasedDirectory(Directory):
                     else:
                         assert entry.type == _FileType.SYMLINK
                         self._add_new_link_direct(name=name, target=entry.target)
-                    result.files_written.append(relative_pathname)
+
+                    # Avoid listing the files of written subtrees through `files_written`
+                    result._files_written.append(relative_pathname)
 
     def import_files(
         self,
@@ -540,8 +640,8 @@ class CasBasedDirectory(Directory):
         self._partial_import_cas_into_cas(external_pathspec, filter_callback, result=result)
 
         # TODO: No notice is taken of report_written or update_mtime.
-        # Current behaviour is to fully populate the report, which is inefficient,
-        # but still correct.
+        # Current behaviour is to fully populate the report, listing the files
+        # of subdirectories imported by digest only on demand.
 
         return result
 
@@ -680,6 +780,23 @@ class CasBasedDirectory(Directory):
             if i and i.modified:
                 yield p
 
+    def _list_file_paths(self, prefix=""):
+        """Provide the relative paths of all files and symlinks.
+
+        Arguments:
+          prefix (str): an optional prefix to the relative paths
+
+        Yields:
+          (str) - the relative paths of the files and symlinks
+        """
+        for name, entry in self.index.items():
+            relative_pathname = os.path.join(prefix, name)
+
+            if entry.type == _FileType.DIRECTORY:
+                yield from self.descend(name)._list_file_paths(relative_pathname)
+            else:
+                yield relative_pathname
+
     def list_relative_paths(self):
         """Provide a list of all relative paths.
 
@@ -836,40 +953,15 @@ class CasBasedDirectory(Directory):
     #
     def _get_digest(self):
         if not self.__digest:
-            # Create updated Directory proto
-            pb2_directory = remote_execution_pb2.Directory()
+            # Serialize this directory and all modified subdirectories,
+            # such that they can be added to CAS all at once
+            directories = []
+            buffers = []
+            self.__serialize(directories, buffers)
 
-            if self.__subtree_read_only is not None:
-                node_property = pb2_directory.node_properties.properties.add()
-                node_property.name = "SubtreeReadOnly"
-                node_property.value = "true" if self.__subtree_read_only else "false"
-
-            for name, entry in sorted(self.index.items()):
-                if entry.type == _FileType.DIRECTORY:
-                    dirnode = pb2_directory.directories.add()
-                    dirnode.name = name
-
-                    # Update digests for subdirectories in DirectoryNodes.
-                    # No need to call entry.get_directory().
-                    # If it hasn't been instantiated, digest must be up-to-date.
-                    subdir = entry.buildstream_object
-                    if subdir:
-                        dirnode.digest.CopyFrom(subdir._get_digest())
-                    else:
-                        dirnode.digest.CopyFrom(entry.digest)
-                elif entry.type == _FileType.REGULAR_FILE:
-                    filenode = pb2_directory.files.add()
-                    filenode.name = name
-                    filenode.digest.CopyFrom(entry.digest)
-                    filenode.is_executable = entry.is_executable
-                    if entry.mtime is not None:
-                        filenode.node_properties.mtime.CopyFrom(entry.mtime)
-                elif entry.type == _FileType.SYMLINK:
-                    symlinknode = pb2_directory.symlinks.add()
-                    symlinknode.name = name
-                    symlinknode.target = entry.target
-
-            self.__digest = self.cas_cache.add_object(buffer=pb2_directory.SerializeToString())
+            digests = self.cas_cache.add_objects(buffers)
+            for directory, digest in zip(directories, digests):
+                directory.__digest = digest
 
         return self.__digest
 
@@ -945,23 +1037,66 @@ class CasBasedDirectory(Directory):
 
         self.__invalidate_digest()
 
+    # __serialize():
+    #
+    # Serialize the Directory protobuf of this directory, and of the
+    # modified subdirectories first.
+    #
+    # Args:
+    #   directories (list): The list of serialized directories to append to
+    #   buffers (list): The list of serialized Directory protobufs to append to
+    #
+    # Returns:
+    #   (Digest): The Digest of the serialized Directory protobuf
+    #
+    def __serialize(self, directories, buffers):
+        pb2_directory = remote_execution_pb2.Directory()
+
+        if self.__subtree_read_only is not None:
+            node_property = pb2_directory.node_properties.properties.add()
+            node_property.name = "SubtreeReadOnly"
+            node_property.value = "true" if self.__subtree_read_only else "false"
+
+        for name, entry in sorted(self.index.items()):
+            if entry.type == _FileType.DIRECTORY:
+                dirnode = pb2_directory.directories.add()
+                dirnode.name = name
+
+                # Update digests for subdirectories in DirectoryNodes.
+                # No need to call entry.get_directory().
+                # If it hasn't been instantiated, digest must be up-to-date.
+                subdir = entry.buildstream_object
+                if subdir:
+                    if subdir.__digest:
+                        dirnode.digest.CopyFrom(subdir.__digest)
+                    else:
+                        dirnode.digest.CopyFrom(subdir.__serialize(directories, buffers))
+                else:
+                    dirnode.digest.CopyFrom(entry.digest)
+            elif entry.type == _FileType.REGULAR_FILE:
+                filenode = pb2_directory.files.add()
+                filenode.name = name
+                filenode.digest.CopyFrom(entry.digest)
+                filenode.is_executable = entry.is_executable
+                if entry.mtime is not None:
+                    filenode.node_properties.mtime.CopyFrom(entry.mtime)
+            elif entry.type == _FileType.SYMLINK:
+                symlinknode = pb2_directory.symlinks.add()
+                symlinknode.name = name
+                symlinknode.target = entry.target
+
+        buffer = pb2_directory.SerializeToString()
+        directories.append(self)
+        buffers.append(buffer)
+
+        return utils._message_digest(buffer)
+
     def __invalidate_digest(self):
         if self.__digest:
             self.__digest = None
             if self.parent:
                 self.parent.__invalidate_digest()
 
-    def __add_files_to_result(self, *, path_prefix="", result):
-        for name, entry in self.index.items():
-            # The destination filename, relative to the root where the import started
-            relative_pathname = os.path.join(path_prefix, name)
-
-            if entry.type == _FileType.DIRECTORY:
-                subdir = self.descend(name)
-                subdir.__add_files_to_result(path_prefix=relative_pathname, result=result)
-            else:
-                result.files_written.append(relative_pathname)
-
     def __validate_path_component(self, path):
         if "/" in path:
             raise VirtualDirectoryError("Invalid path component: '{}'".format(path))
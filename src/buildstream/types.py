@@ -224,6 +224,19 @@ class _SchedulerErrorAction(FastEnum):
     TERMINATE = "terminate"
 
 
+# _SchedulingMode()
+#
+# How the scheduler prioritizes elements which are ready to be processed
+#
+class _SchedulingMode(FastEnum):
+
+    # Prefer elements which are deepest in the dependency graph
+    DEPTH = "depth"
+
+    # Prefer elements which block the longest remaining chain of builds
+    CRITICAL_PATH = "critical-path"
+
+
 # _CacheBuildTrees()
 #
 # When to cache build trees
@@ -38,7 +38,7 @@ import datetime
 import itertools
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Callable, IO, Iterable, Iterator, Optional, Tuple, Union
+from typing import Any, Callable, IO, Iterable, Iterator, List, Optional, Set, Tuple, Union
 from dateutil import parser as dateutil_parser
 from google.protobuf import timestamp_pb2
 
@@ -121,8 +121,99 @@ class FileListResult:
         self.failed_attributes = []
         """List of files for which attributes could not be copied over"""
 
-        self.files_written = []
+        self._files_written = []  # type: List[str]
+
+        # Subtrees which were written as a whole, as tuples of the position
+        # in the list of files written, the relative path of the subtree
+        # and the Directory of the subtree
+        self._written_subtrees = []  # type: List[Tuple[int, str, Any]]
+
+        # Set of the files written directly, see _is_written()
+        self._written_set = set()  # type: Set[str]
+        self._written_set_length = 0
+
+    @property
+    def files_written(self) -> List[str]:
         """List of files that were written."""
+        if self._written_subtrees:
+            self._expand_written_subtrees()
+        return self._files_written
+
+    @files_written.setter
+    def files_written(self, files_written: List[str]) -> None:
+        self._files_written = files_written
+        self._written_subtrees = []
+        self._written_set = set()
+        self._written_set_length = 0
+
+    # _add_written_subtree()
+    #
+    # Record that all files of a Directory were written below the
+    # given path, without listing them until `files_written` is
+    # accessed.
+    #
+    # Args:
+    #    path (str): The relative path of the subtree
+    #    directory (Directory): The subtree which was written
+    #
+    def _add_written_subtree(self, path: str, directory: Any) -> None:
+        self._written_subtrees.append((len(self._files_written), path, directory))
+
+    # _is_written()
+    #
+    # Check whether a file was written, only descending into the
+    # subtrees which were written as a whole if they contain the path.
+    #
+    # Args:
+    #    path (str): The relative path of the file
+    #
+    # Returns:
+    #    (bool): Whether the file was written
+    #
+    def _is_written(self, path: str) -> bool:
+        for _, prefix, directory in self._written_subtrees:
+            if path.startswith(prefix + os.sep):
+                components = path[len(prefix) + 1 :].split(os.sep)
+                if directory.exists(*components) and not directory.isdir(*components):
+                    return True
+
+        # Files are only ever appended to the list
+        if self._written_set_length < len(self._files_written):
+            self._written_set.update(self._files_written[self._written_set_length :])
+            self._written_set_length = len(self._files_written)
+
+        return path in self._written_set
+
+    # _expand_written_subtrees()
+    #
+    # List the files of the subtrees which were written as a whole,
+    # in the list of files written.
+    #
+    def _expand_written_subtrees(self):
+        files_written = []
+        start = 0
+        for position, prefix, directory in self._written_subtrees:
+            files_written.extend(self._files_written[start:position])
+            files_written.extend(os.path.join(prefix, path) for path in directory._list_file_paths())
+            start = position
+        files_written.extend(self._files_written[start:])
+
+        self._files_written = files_written
+        self._written_subtrees = []
+        self._written_set = set()
+        self._written_set_length = 0
+
+
+# _time_ns()
+#
+# Get the current time like time.time_ns(), which is only available
+# as of python 3.7.
+#
+# Returns:
+#    (int): The time since the epoch in nanoseconds
+#
+def _time_ns() -> int:
+    return int(time.time() * 1000000000)
 
 
 def _make_timestamp(timepoint: float) -> str:
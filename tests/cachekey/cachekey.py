@@ -44,6 +44,7 @@ import os
 
 import pytest
 
+from buildstream._cachekey import PartialKey, generate_key
 from buildstream.testing._cachekeys import check_cache_key_stability, _parse_output_keys
 from buildstream.testing.runcli import cli  # pylint: disable=unused-import
 from buildstream.testing._utils.site import HAVE_BZR, HAVE_GIT, IS_LINUX, MACHINE_ARCH
@@ -145,3 +146,44 @@ def test_keys_stable_over_targets(cli, datafiles):
 
     assert {key: ordering2_cache_keys[key] for key in elements} == ordering1_cache_keys
     assert {key: all_cache_keys[key] for key in elements} == ordering1_cache_keys
+
+
+# The keys generated from a PartialKey must be identical to the keys
+# which generate_key() returns for the complete dictionary
+@pytest.mark.parametrize(
+    "value,field",
+    [
+        # The varying field alone, first, last and in the middle
+        ({}, "dependencies"),
+        ({"public": {"bst": {}}, "sources": ["a"]}, "artifact-version"),
+        ({"artifact-version": 1, "context": {"cpu": 1}}, "sources"),
+        ({"artifact-version": 1, "environment": {"PATH": "/usr/bin"}, "sources": []}, "dependencies"),
+        # Nested and ordered values, which are serialized in sorted order
+        (
+            OrderedDict(
+                [
+                    ("z-public", OrderedDict([("split-rules", {"devel": ["/usr/include/**"]}), ("bst", {})])),
+                    ("a-config", {"commands": ["make", "make install"], "nested": {"b": [1, 2.5], "a": None}}),
+                ]
+            ),
+            "m-dependencies",
+        ),
+        ({"unicode": "\u00e9l\u00e9ment", "escapes": 'quote " and slash /', "bool": True}, "field"),
+    ],
+)
+@pytest.mark.parametrize(
+    "field_value",
+    [
+        [],
+        ["0" * 64, "1" * 64],
+        [{"name": "base.bst", "key": "2" * 64}, {"name": "dir/dep.bst", "key": None}],
+        OrderedDict([("z", 1), ("a", [{"y": 2, "b": 3}])]),
+        None,
+        "",
+    ],
+)
+def test_partial_key(value, field, field_value):
+    complete = dict(value)
+    complete[field] = field_value
+
+    assert PartialKey(value, field).generate_key(field_value) == generate_key(complete)
@@ -10,6 +10,7 @@ from buildstream.testing import create_repo
 from buildstream.testing import cli  # pylint: disable=unused-import
 from buildstream.exceptions import ErrorDomain
 from buildstream import _yaml
+from buildstream._protos.buildstream.v2.artifact_pb2 import Artifact as ArtifactProto
 
 DATA_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "filter",)
 
@@ -67,6 +68,23 @@ def test_filter_orphans(datafiles, cli, tmpdir):
     assert os.path.exists(os.path.join(checkout, "baz"))
 
 
+@pytest.mark.datafiles(os.path.join(DATA_DIR, "basic"))
+def test_filter_split_index(datafiles, cli):
+    project = str(datafiles)
+    result = cli.run(project=project, args=["build", "output-orphans.bst"])
+    result.assert_success()
+
+    # The split domain membership of the input files is recorded in the artifact
+    cache_key = cli.get_element_key(project, "input.bst")
+    artifact = ArtifactProto()
+    with open(os.path.join(cli.directory, "artifacts", "refs", "test", "input", cache_key), "rb") as f:
+        artifact.ParseFromString(f.read())
+
+    # The files "bar", "baz" and "foo" are listed in this order
+    split_domains = {domain.name: domain.paths for domain in artifact.split_domains}
+    assert split_domains == {"foo": bytes([0b100]), "bar": bytes([0b001])}
+
+
 @pytest.mark.datafiles(os.path.join(DATA_DIR, "basic"))
 def test_filter_deps_ok(datafiles, cli):
     project = str(datafiles)
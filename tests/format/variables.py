@@ -243,3 +243,28 @@ def test_partial_context_junctions(cli, datafiles):
     result.assert_success()
     result_vars = _yaml.load_data(result.output)
     assert result_vars.get_str("eltvar") == "/bar/foo/baz"
+
+
+@pytest.mark.parametrize(
+    "element,varname,expected",
+    [
+        ("default.bst", "tools-bin", "/usr/tools/bin"),
+        ("override.bst", "tools-bin", "/opt/tools/bin"),
+        ("default.bst", "element-name", "default.bst"),
+        ("override.bst", "element-name", "override.bst"),
+    ],
+)
+@pytest.mark.datafiles(os.path.join(DATA_DIR, "layered"))
+def test_layered_variables(cli, datafiles, element, varname, expected):
+    project = str(datafiles)
+
+    # Load both elements of the same kind in the same session, such
+    # that they are resolved on top of the same shared variables
+    result = cli.run(
+        project=project, silent=True, args=["show", "--deps", "build", "--format", "===%{name}\n%{vars}", "target.bst"]
+    )
+    result.assert_success()
+
+    output = dict(chunk.split("\n", 1) for chunk in result.output.split("===")[1:])
+    result_vars = _yaml.load_data(output[element])
+    assert result_vars.get_str(varname) == expected
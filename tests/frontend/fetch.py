@@ -136,3 +136,56 @@ def test_inconsistent_junction(cli, tmpdir, datafiles, ref_storage):
     ref_node = element_node.get_sequence("depends").mapping_at(0)
     provenance = ref_node.get_provenance()
     assert str(provenance) in result.stderr
+
+
+# Test that fetching works when several elements are fetched
+# one after the other by a single fetch task.
+#
+@pytest.mark.datafiles(os.path.join(TOP_DIR, "source-fetch"))
+def test_fetch_batched(cli, datafiles):
+    project = str(datafiles)
+    generate_project(project, {"aliases": {"project-root": "file:///" + project}})
+
+    target = "bananas.bst"
+    build_dep = "apples.bst"
+    runtime_dep = "oranges.bst"
+
+    cli.configure({"scheduler": {"fetchers": 1, "batch-size": 4}})
+
+    result = cli.run(project=project, args=["source", "fetch", "--deps", "all", target])
+    result.assert_success()
+
+    states = cli.get_element_states(project, [target, build_dep, runtime_dep])
+    assert (states[target], states[build_dep], states[runtime_dep]) == ("waiting", "buildable", "buildable")
+
+
+# Test that the sources of a single element can be fetched concurrently
+#
+@pytest.mark.datafiles(os.path.join(TOP_DIR, "source-fetch"))
+def test_fetch_sources_concurrently(cli, tmpdir, datafiles):
+    project = str(datafiles)
+    generate_project(project, {"aliases": {"project-root": "file:///" + project}})
+
+    fruits = ["apples", "bananas", "oranges"]
+    element = {
+        "kind": "import",
+        "sources": [
+            {"kind": "remote", "url": "project-root:/files/{}".format(fruit), "directory": fruit} for fruit in fruits
+        ],
+    }
+    _yaml.roundtrip_dump(element, os.path.join(project, "fruits.bst"))
+
+    cli.configure({"scheduler": {"fetchers": 4, "fetchers-per-element": 4}})
+
+    result = cli.run(project=project, args=["source", "track", "fruits.bst"])
+    result.assert_success()
+
+    result = cli.run(project=project, args=["source", "fetch", "fruits.bst"])
+    result.assert_success()
+    assert cli.get_element_state(project, "fruits.bst") == "buildable"
+
+    checkout = os.path.join(str(tmpdir), "checkout")
+    result = cli.run(project=project, args=["source", "checkout", "--directory", checkout, "fruits.bst"])
+    result.assert_success()
+    for fruit in fruits:
+        assert os.path.exists(os.path.join(checkout, "fruits", fruit, fruit))
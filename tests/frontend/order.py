@@ -102,3 +102,39 @@ def test_order(cli, datafiles, operation, target, template, expected):
     print("Expected order: {}".format(expected))
     print("Observed result order: {}".format(results))
     assert results == expected
+
+
+# This tests that the critical path scheduling mode prefers the
+# elements which unblock the most work when their depth is the same.
+#
+# Here both leaves are at the same depth, but leaf2.bst blocks
+# both mid1.bst and mid2.bst while leaf1.bst only blocks mid1.bst.
+#
+@pytest.mark.datafiles(os.path.join(DATA_DIR))
+@pytest.mark.parametrize("operation", [("fetch"), ("build")])
+def test_order_critical_path(cli, datafiles, operation):
+    project = str(datafiles)
+    template = {
+        "leaf1.bst": [],
+        "leaf2.bst": [],
+        "mid1.bst": [{"filename": "leaf1.bst", "type": "build"}, {"filename": "leaf2.bst", "type": "build"}],
+        "mid2.bst": [{"filename": "leaf2.bst", "type": "build"}],
+        "target.bst": ["mid1.bst", "mid2.bst"],
+    }
+    expected = ["leaf2.bst", "leaf1.bst", "mid1.bst", "mid2.bst", "target.bst"]
+
+    cli.configure({"scheduler": {"fetchers": 1, "builders": 1, "scheduling": "critical-path"}})
+
+    for element, dependencies in template.items():
+        create_element(project, element, dependencies)
+
+    if operation == "fetch":
+        result = cli.run(args=["source", "fetch", "target.bst"], project=project, silent=True)
+    else:
+        result = cli.run(args=[operation, "target.bst"], project=project, silent=True)
+    result.assert_success()
+    results = result.get_start_order(operation)
+
+    print("Expected order: {}".format(expected))
+    print("Observed result order: {}".format(results))
+    assert results == expected
@@ -383,7 +383,9 @@ def test_pull_missing_notifies_user(caplog, cli, tmpdir, datafiles):
         assert not result.get_pulled_elements(), "No elements should have been pulled since the cache was empty"
 
         assert "INFO    Remote ({}) does not have".format(share.repo) in result.stderr
-        assert "SKIPPED Pull" in result.stderr
+
+        # The remote is queried up front, no pull jobs need to be started
+        assert "SKIPPED Pull" not in result.stderr
 
 
 @pytest.mark.datafiles(DATA_DIR)
@@ -0,0 +1,274 @@
+import os
+from unittest.mock import MagicMock
+
+import grpc
+
+from buildstream._artifactcache import ArtifactCache
+from buildstream._cas.cascache import CASCache
+from buildstream._protos.build.bazel.remote.execution.v2 import remote_execution_pb2
+from buildstream._protos.buildstream.v2 import artifact_pb2
+
+
+# A stand-in for the Context, the artifact cache only needs
+# the artifact directory, the CASCache and some settings
+class DummyContext:
+    def __init__(self, artifactdir):
+        self.artifactdir = artifactdir
+        self.log_key_length = 4
+        self.cascache = MagicMock(spec=CASCache)
+
+    def get_cascache(self):
+        return self.cascache
+
+
+class DummyElement:
+    def __init__(self, name="element", project=None):
+        self.name = name
+        self.project = project
+        self.messages = []
+
+    def get_artifact_name(self, key=None):
+        return "test/{}/{}".format(self.name, key)
+
+    def _get_project(self):
+        return self.project
+
+    def info(self, message):
+        self.messages.append(message)
+
+
+# A stand-in for an Artifact, with the required parts resolved up front
+class DummyArtifact:
+    def __init__(self, proto, files_digest=None, with_files=False, digests=()):
+        self.proto = proto
+        self.required = (files_digest, with_files, list(digests))
+        self.cached = None
+
+    def _load_proto(self):
+        return self.proto
+
+    def _get_required_digests(self, proto):
+        assert proto is self.proto
+        return self.required
+
+    def _set_cached_state(self, proto, cached):
+        self.cached = cached
+
+
+class DummyRpcError(grpc.RpcError):
+    def __init__(self, code=grpc.StatusCode.NOT_FOUND):
+        super().__init__()
+        self._code = code
+
+    def code(self):
+        return self._code
+
+    def details(self):
+        return self._code.name
+
+
+# A stand-in index remote, which has the given artifacts or fails
+class DummyIndexRemote:
+    def __init__(self, name, refs=(), *, failing=False):
+        self.name = name
+        self.refs = refs
+        self.failing = failing
+        self.queried = []
+
+    def __str__(self):
+        return self.name
+
+    def init(self):
+        pass
+
+    def fetch_blob(self, uris):
+        self.queried.extend(uris)
+        if self.failing:
+            raise DummyRpcError(grpc.StatusCode.UNAVAILABLE)
+        if not any(uri.endswith(ref) for uri in uris for ref in self.refs):
+            raise DummyRpcError()
+        return remote_execution_pb2.Digest(hash="a" * 64, size_bytes=1)
+
+
+def write_artifact(artifactdir, ref, strong_key):
+    path = os.path.join(artifactdir, ref)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(artifact_pb2.Artifact(strong_key=strong_key).SerializeToString())
+
+
+def test_load_proto_is_cached(tmpdir):
+    artifactdir = str(tmpdir)
+    artifacts = ArtifactCache(DummyContext(artifactdir))
+    write_artifact(artifactdir, "test/element/aaaa", "aaaa")
+
+    proto = artifacts.load_proto("test/element/aaaa")
+    assert proto.strong_key == "aaaa"
+    assert artifacts.load_proto("test/element/aaaa") is proto
+    assert artifacts.load_proto("test/element/bbbb") is None
+
+
+def test_linked_artifact_is_reloaded(tmpdir):
+    artifactdir = str(tmpdir)
+    artifacts = ArtifactCache(DummyContext(artifactdir))
+    write_artifact(artifactdir, "test/element/aaaa", "aaaa")
+    write_artifact(artifactdir, "test/element/bbbb", "bbbb")
+    assert artifacts.load_proto("test/element/bbbb").strong_key == "bbbb"
+
+    # Linking replaces the artifact of the new key
+    os.unlink(os.path.join(artifactdir, "test/element/bbbb"))
+    artifacts.link_key(DummyElement(), "aaaa", "bbbb")
+    assert artifacts.load_proto("test/element/bbbb").strong_key == "aaaa"
+
+
+def test_pulled_artifact_is_reloaded(tmpdir):
+    artifactdir = os.path.join(str(tmpdir), "artifacts")
+    context = DummyContext(artifactdir)
+    artifacts = ArtifactCache(context)
+    write_artifact(artifactdir, "test/element/aaaa", "stale")
+    assert artifacts.load_proto("test/element/aaaa").strong_key == "stale"
+
+    # The pulled artifact proto is read from the CAS
+    objpath = os.path.join(str(tmpdir), "object")
+    with open(objpath, "wb") as f:
+        f.write(artifact_pb2.Artifact(strong_key="aaaa").SerializeToString())
+    context.cascache.objpath.return_value = objpath
+
+    assert artifacts._pull_artifact_storage(DummyElement(), "aaaa", remote_execution_pb2.Digest(), None)
+    assert artifacts.load_proto("test/element/aaaa").strong_key == "aaaa"
+
+
+def test_removed_artifact_is_forgotten(tmpdir):
+    artifactdir = str(tmpdir)
+    artifacts = ArtifactCache(DummyContext(artifactdir))
+    write_artifact(artifactdir, "test/element/aaaa", "aaaa")
+    assert artifacts.load_proto("test/element/aaaa") is not None
+
+    artifacts.remove("test/element/aaaa")
+    assert artifacts.load_proto("test/element/aaaa") is None
+
+
+def test_mtimes_updated_on_release(tmpdir):
+    artifactdir = str(tmpdir)
+    artifacts = ArtifactCache(DummyContext(artifactdir))
+    write_artifact(artifactdir, "test/element/aaaa", "aaaa")
+    path = os.path.join(artifactdir, "test/element/aaaa")
+    os.utime(path, (1000, 1000))
+
+    # Loading the artifact does not touch it
+    artifacts.load_proto("test/element/aaaa")
+    artifacts.load_proto("test/element/aaaa")
+    assert os.path.getmtime(path) == 1000
+
+    # The artifacts which were used are touched once at the end of the session
+    artifacts.release_resources()
+    assert os.path.getmtime(path) > 1000
+
+    # Artifacts which were removed in the meantime are ignored
+    artifacts.load_proto("test/element/aaaa")
+    os.unlink(path)
+    artifacts.release_resources()
+
+
+def test_query_cached(tmpdir, monkeypatch):
+    context = DummyContext(os.path.join(str(tmpdir), "artifacts"))
+    cas = CASCache(os.path.join(str(tmpdir), "cas"), casd=False)
+    context.cascache = cas
+    artifacts = ArtifactCache(context)
+
+    def digest(name):
+        return remote_execution_pb2.Digest(hash=name * 64, size_bytes=1)
+
+    # Blobs and directories which are not in the local cache
+    missing_blobs = {digest("b").hash}
+    missing_trees = {(digest("d").hash, False), (digest("e").hash, True)}
+    requests = []
+
+    def find_missing_blobs(blobs, *, instance_name=""):
+        blobs = list(blobs)
+        requests.append(blobs)
+        return [blob for blob in blobs if blob.hash in missing_blobs]
+
+    def fetch_tree(request):
+        future = MagicMock()
+        if (request.root_digest.hash, request.fetch_file_blobs) in missing_trees:
+            future.result.side_effect = DummyRpcError()
+        return future
+
+    local_cas = MagicMock()
+    local_cas.FetchTree.future = fetch_tree
+    monkeypatch.setattr(cas, "_find_missing_blobs", find_missing_blobs)
+    monkeypatch.setattr(cas, "get_local_cas", lambda: local_cas)
+
+    proto = artifact_pb2.Artifact()
+    queried = {
+        # Only public data and logs
+        "complete": DummyArtifact(proto, digests=[digest("a")]),
+        # No artifact proto in the cache
+        "uncached": DummyArtifact(None),
+        # A log file is missing
+        "missing-log": DummyArtifact(proto, digests=[digest("a"), digest("b")]),
+        # The files subtree is missing, or only its file blobs are
+        "missing-tree": DummyArtifact(proto, digest("d"), False, [digest("a")]),
+        "missing-file-blobs": DummyArtifact(proto, digest("e"), True, [digest("a")]),
+        # The same directory is complete when file blobs are not required
+        "tree-without-files": DummyArtifact(proto, digest("e"), False, [digest("c")]),
+    }
+    artifacts.query_cached(list(queried.values()))
+
+    assert {name: artifact.cached for name, artifact in queried.items()} == {
+        "complete": True,
+        "uncached": False,
+        "missing-log": False,
+        "missing-tree": False,
+        "missing-file-blobs": False,
+        "tree-without-files": True,
+    }
+
+    # The blobs of all artifacts are queried at once
+    assert len(requests) == 1
+
+
+def test_query_remotes(tmpdir):
+    artifacts = ArtifactCache(DummyContext(str(tmpdir)))
+
+    # The first remote fails, the others are still queried
+    failing = DummyIndexRemote("failing", failing=True)
+    remote = DummyIndexRemote("remote", ["test/found/aaaa"])
+    artifacts._index_remotes["project"] = [failing, remote]
+
+    found = DummyElement("found", "project")
+    missing = DummyElement("missing", "project")
+    artifacts.query_remotes([(found, "aaaa"), (missing, "aaaa"), (DummyElement("unresolved", "project"), None)])
+
+    assert len(failing.queried) == 2
+    assert len(remote.queried) == 2
+    assert artifacts.remote_contains(found, "aaaa")
+
+    # Whether an artifact which was not found is missing is unknown, as
+    # the failing remote may have it. Its absence is not reported.
+    assert artifacts.remote_contains(missing, "aaaa") is None
+    assert missing.messages == []
+
+    # Artifacts which are not queried are unknown
+    assert artifacts.remote_contains(found, "bbbb") is None
+    assert artifacts.remote_contains(found, None) is None
+
+
+def test_query_remotes_not_found(tmpdir):
+    artifacts = ArtifactCache(DummyContext(str(tmpdir)))
+    remotes = [DummyIndexRemote("first"), DummyIndexRemote("second")]
+    artifacts._index_remotes["project"] = remotes
+
+    # Artifacts missing from all remotes are remembered and reported
+    missing = DummyElement("missing", "project")
+    artifacts.query_remotes([(missing, "aaaa")])
+    assert artifacts.remote_contains(missing, "aaaa") is False
+    assert missing.messages == [
+        "Remote (first) does not have artifact aaaa cached",
+        "Remote (second) does not have artifact aaaa cached",
+    ]
+
+    # Answers are not queried again
+    artifacts.query_remotes([(missing, "aaaa")])
+    assert [len(remote.queried) for remote in remotes] == [1, 1]
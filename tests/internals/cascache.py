@@ -1,9 +1,15 @@
+import hashlib
 import os
 import time
 from unittest.mock import MagicMock
 
+import grpc
+
+from buildstream._cas import cascache as cascache_module
 from buildstream._cas.cascache import CASCache
 from buildstream._message import MessageType
+from buildstream._protos.build.bazel.remote.execution.v2 import remote_execution_pb2
+from buildstream._protos.build.buildgrid import local_cas_pb2
 from buildstream._messenger import Messenger
 
 
@@ -101,3 +107,231 @@ def test_casd_redirects_stderr_to_file_and_rotate(tmp_path, monkeypatch):
         assert len(existing_log_files) == n_max_log_files
         assert evicted_file not in existing_log_files
         assert existing_log_files[-1].read_text() == "hello\n"
+
+
+def test_directory_cache(tmp_path):
+    cache = CASCache(str(tmp_path), casd=False)
+
+    directory = remote_execution_pb2.Directory()
+    symlink = directory.symlinks.add()
+    symlink.name = "link"
+    symlink.target = "target"
+    buffer = directory.SerializeToString()
+    digest = remote_execution_pb2.Digest(hash=hashlib.sha256(buffer).hexdigest(), size_bytes=len(buffer))
+
+    objpath = cache.objpath(digest)
+    os.makedirs(os.path.dirname(objpath))
+    with open(objpath, "wb") as f:
+        f.write(buffer)
+
+    assert cache.get_directory(digest) == directory
+    assert cache.get_directory_cache_stats() == (0, 1)
+
+    # The second lookup is answered from memory
+    os.unlink(objpath)
+    assert cache.get_directory(digest) == directory
+    assert cache.get_directory_cache_stats() == (1, 1)
+
+
+def test_import_index(tmp_path, monkeypatch):
+    cache = CASCache(str(tmp_path.joinpath("cache")), casd=False)
+
+    # Record the imports which would have been made by buildbox-casd
+    imports = []
+
+    def import_directory(path, properties=None):
+        imports.append(path)
+        return remote_execution_pb2.Digest(hash="{:064x}".format(len(imports)), size_bytes=len(imports))
+
+    monkeypatch.setattr(cache, "import_directory", import_directory)
+    monkeypatch.setattr(cache, "contains_directory", lambda digest, *, with_files: True)
+
+    directory = tmp_path.joinpath("directory")
+    directory.joinpath("subdir").mkdir(parents=True)
+    filename = directory.joinpath("subdir", "file")
+    filename.write_text("first")
+
+    # Files which were modified very recently are not trusted
+    assert cache._import_directory_indexed(str(directory), None).size_bytes == 1
+    assert cache._import_directory_indexed(str(directory), None).size_bytes == 2
+
+    old = time.time() - 60
+    os.utime(str(filename), (old, old))
+    os.utime(str(directory.joinpath("subdir")), (old, old))
+    digest = cache._import_directory_indexed(str(directory), None)
+    assert cache._import_directory_indexed(str(directory), None) == digest
+    assert len(imports) == 3
+
+    # Modified trees are imported again
+    filename.write_text("second")
+    os.utime(str(filename), (old + 1, old + 1))
+    assert cache._import_directory_indexed(str(directory), None) != digest
+    assert len(imports) == 4
+
+
+def test_remote_missing_blobs_for_directory(tmp_path, monkeypatch):
+    cache = CASCache(str(tmp_path), casd=False)
+
+    def add_blob(buffer):
+        digest = remote_execution_pb2.Digest(hash=hashlib.sha256(buffer).hexdigest(), size_bytes=len(buffer))
+        objpath = cache.objpath(digest)
+        os.makedirs(os.path.dirname(objpath), exist_ok=True)
+        with open(objpath, "wb") as f:
+            f.write(buffer)
+        return digest
+
+    def add_directory(files, directories):
+        directory = remote_execution_pb2.Directory()
+        for name, content in files.items():
+            directory.files.add(name=name, digest=add_blob(content))
+        for name, digest in directories.items():
+            directory.directories.add(name=name, digest=digest)
+        return add_blob(directory.SerializeToString())
+
+    sdk = add_directory({"file{}".format(i): "sdk{}".format(i).encode() for i in range(100)}, {})
+    src = add_directory({"main.c": b"main", "sdk0": b"sdk0"}, {})
+    root = add_directory({}, {"sdk": sdk, "src": src})
+
+    # The remote has the complete sdk directory and one of the sources
+    remote_blobs = set(digest.hash for digest in cache.required_blobs_for_directory(sdk))
+    requests = []
+
+    def find_missing_blobs(blobs, *, instance_name=""):
+        blobs = list(blobs)
+        requests.append(blobs)
+        return [blob for blob in blobs if blob.hash not in remote_blobs]
+
+    monkeypatch.setattr(cache, "_find_missing_blobs", find_missing_blobs)
+    remote = MagicMock(local_cas_instance_name="remote")
+
+    expected = sorted(blob.hash for blob in cache.required_blobs_for_directory(root) if blob.hash not in remote_blobs)
+    missing = cache.remote_missing_blobs_for_directory(remote, root)
+    assert sorted(blob.hash for blob in missing) == expected
+
+    # The files of the sdk directory are never checked
+    assert [len(blobs) for blobs in requests] == [1, 2, 2]
+
+    # Blobs confirmed on the remote are not checked again
+    requests.clear()
+    assert cache.remote_missing_blobs_for_directory(remote, sdk) == []
+    assert requests == []
+
+    cache.forget_remote_blobs(remote)
+    assert cache.remote_missing_blobs_for_directory(remote, sdk) == []
+    assert len(requests) == 1
+
+
+# A stand-in for the errors raised by gRPC stubs
+class DummyRpcError(grpc.RpcError):
+    def __init__(self, code):
+        super().__init__()
+        self._code = code
+
+    def code(self):
+        return self._code
+
+    def details(self):
+        return self._code.name
+
+
+def test_missing_blobs(tmp_path, monkeypatch):
+    cache = CASCache(str(tmp_path), casd=False)
+    blobs = [remote_execution_pb2.Digest(hash="{:064x}".format(i), size_bytes=i) for i in range(1000)]
+    requests = []
+
+    def find_missing_blobs(request):
+        requests.append(len(request.blob_digests))
+        return remote_execution_pb2.FindMissingBlobsResponse(
+            missing_blob_digests=[digest for digest in request.blob_digests if digest.size_bytes % 2]
+        )
+
+    monkeypatch.setattr(cache, "get_cas", lambda: MagicMock(FindMissingBlobs=find_missing_blobs))
+
+    missing = cache.missing_blobs(blobs)
+    assert sorted(digest.size_bytes for digest in missing) == list(range(1, 1000, 2))
+    assert requests == [512, 488]
+
+
+def test_missing_directories(tmp_path, monkeypatch):
+    cache = CASCache(str(tmp_path), casd=False)
+    directories = [remote_execution_pb2.Digest(hash="{:064x}".format(i), size_bytes=i) for i in range(4)]
+
+    # The second directory is missing entirely, the fourth lacks file blobs
+    def fetch_tree(request):
+        future = MagicMock()
+        size = request.root_digest.size_bytes
+        if size == 1 or (size == 3 and request.fetch_file_blobs):
+            future.result.side_effect = DummyRpcError(grpc.StatusCode.NOT_FOUND)
+        return future
+
+    local_cas = MagicMock()
+    local_cas.FetchTree.future = fetch_tree
+    monkeypatch.setattr(cache, "get_local_cas", lambda: local_cas)
+
+    assert [digest.size_bytes for digest in cache.missing_directories(directories, with_files=False)] == [1]
+    assert [digest.size_bytes for digest in cache.missing_directories(directories, with_files=True)] == [1, 3]
+    assert cache.missing_directories([], with_files=True) == []
+
+
+# A stand-in for buildbox-casd, which stores the blobs in memory
+class DummyCASD:
+    def __init__(self):
+        self.blobs = {}
+        self.batches = []
+        self.captured = []
+
+    def FindMissingBlobs(self, request):
+        return remote_execution_pb2.FindMissingBlobsResponse(
+            missing_blob_digests=[digest for digest in request.blob_digests if digest.hash not in self.blobs]
+        )
+
+    def BatchUpdateBlobs(self, request):
+        self.batches.append([blob_request.digest.hash for blob_request in request.requests])
+        response = remote_execution_pb2.BatchUpdateBlobsResponse()
+        for blob_request in request.requests:
+            assert hashlib.sha256(blob_request.data).hexdigest() == blob_request.digest.hash
+            self.blobs[blob_request.digest.hash] = blob_request.data
+            response.responses.add(digest=blob_request.digest)
+        return response
+
+    def CaptureFiles(self, request):
+        response = local_cas_pb2.CaptureFilesResponse()
+        for path in request.path:
+            with open(path, "rb") as f:
+                data = f.read()
+            digest = remote_execution_pb2.Digest(hash=hashlib.sha256(data).hexdigest(), size_bytes=len(data))
+            self.blobs[digest.hash] = data
+            self.captured.append(digest.hash)
+            response.responses.add(path=path, digest=digest)
+        return response
+
+
+def test_add_objects(tmp_path, monkeypatch):
+    cache = CASCache(str(tmp_path), casd=False)
+    casd = DummyCASD()
+    monkeypatch.setattr(cache, "get_cas", lambda: casd)
+    monkeypatch.setattr(cache, "get_local_cas", lambda: casd)
+    monkeypatch.setattr(cascache_module, "_MAX_PAYLOAD_BYTES", 64)
+
+    files = tmp_path.joinpath("files")
+    files.mkdir()
+    contents = [b"first", b"second", b"first", b"x" * 40, b"y" * 40, b"z" * 100, b""]
+    for index, content in enumerate(contents):
+        files.joinpath(str(index)).write_bytes(content)
+
+    # A blob which is already in CAS is not sent again
+    present = cache.add_object(buffer=b"second")
+    casd.captured.clear()
+
+    digests = cache.add_objects(contents)
+    expected = [cache.add_object(path=str(files.joinpath(str(index)))) for index in range(len(contents))]
+    assert digests == expected
+    assert all(casd.blobs[digest.hash] == content for digest, content in zip(digests, contents))
+
+    # Duplicates are sent once and the payload size of batches is limited,
+    # blobs which are too large for a batch are captured on their own
+    sent = [digest_hash for batch in casd.batches for digest_hash in batch]
+    assert present.hash not in sent
+    assert len(sent) == len(set(sent)) == 4
+    assert len(casd.batches) == 2
+    assert casd.captured[0] == digests[5].hash
@@ -0,0 +1,82 @@
+import os
+
+from buildstream._jobhistory import JobHistory
+from buildstream._scheduler.jobs.job import JobUsage
+
+
+def test_record_and_reload(tmpdir):
+    path = os.path.join(str(tmpdir), "history", "job-history.db")
+
+    history = JobHistory(path)
+    history.record("base.bst", "aaaa", "Build", JobUsage(10.0, 8.0, 1024), artifact_size=4096)
+    history.record("base.bst", "aaaa", "Push", JobUsage(2.0, 0.5, 512))
+    history.close()
+
+    history = JobHistory(path)
+    records = history.get_records("base.bst", "Build")
+    assert len(records) == 1
+    assert records[0].cache_key == "aaaa"
+    assert records[0].wall_time == 10.0
+    assert records[0].cpu_time == 8.0
+    assert records[0].max_rss == 1024
+    assert records[0].artifact_size == 4096
+
+    assert len(history.get_records("base.bst")) == 2
+    assert history.get_durations("Build") == {"base.bst": 10.0}
+    history.close()
+
+
+def test_latest_duration(tmpdir):
+    path = os.path.join(str(tmpdir), "job-history.db")
+
+    for wall_time in (10.0, 20.0):
+        history = JobHistory(path)
+        history.record("base.bst", None, "Build", JobUsage(wall_time, wall_time, 0))
+        history.close()
+
+    history = JobHistory(path)
+    assert history.get_durations("Build") == {"base.bst": 20.0}
+    history.close()
+
+
+def test_regressions(tmpdir):
+    path = os.path.join(str(tmpdir), "job-history.db")
+
+    history = JobHistory(path)
+    history.record("slower.bst", "aaaa", "Build", JobUsage(10.0, 10.0, 0))
+    history.record("stable.bst", "bbbb", "Build", JobUsage(10.0, 10.0, 0))
+    history.close()
+
+    history = JobHistory(path)
+    history.record("slower.bst", "cccc", "Build", JobUsage(30.0, 30.0, 0))
+    history.record("stable.bst", "dddd", "Build", JobUsage(11.0, 11.0, 0))
+    history.close()
+
+    history = JobHistory(path)
+    regressions = history.get_regressions("Build")
+    assert [(previous.cache_key, latest.cache_key) for previous, latest in regressions] == [("aaaa", "cccc")]
+    history.close()
+
+
+def test_unwritable_history(tmpdir):
+    path = os.path.join(str(tmpdir), "job-history.db")
+    os.makedirs(path)
+
+    # A broken history never raises
+    history = JobHistory(path)
+    history.record("base.bst", None, "Build", JobUsage(1.0, 1.0, 0))
+    assert history.get_durations("Build") == {}
+    history.close()
+
+
+def test_uncreatable_history_directory(tmpdir):
+    # The parent of the history directory is a regular file
+    blocker = os.path.join(str(tmpdir), "blocker")
+    with open(blocker, "w"):
+        pass
+
+    history = JobHistory(os.path.join(blocker, "history", "job-history.db"))
+    history.record("base.bst", None, "Build", JobUsage(1.0, 1.0, 0))
+    assert history.get_durations("Build") == {}
+    assert history.get_records("base.bst") == []
+    history.close()
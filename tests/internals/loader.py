@@ -5,7 +5,7 @@ import pytest
 from buildstream.exceptions import LoadErrorReason
 from buildstream._exceptions import LoadError
 from buildstream._project import Project
-from buildstream._loader import LoadElement
+from buildstream._loader import LoadElement, Loader
 
 from tests.testutils import dummy_context
 
@@ -94,3 +94,91 @@ def test_invalid_directory_load(datafiles):
         loader.load(["elements/"])
 
     assert exc.value.reason == LoadErrorReason.LOADING_DIRECTORY
+
+
+##############################################################
+#  Snapshots: Test loading elements from a previous session  #
+##############################################################
+@pytest.mark.datafiles(os.path.join(DATA_DIR, "onefile"))
+def test_load_snapshot(datafiles, monkeypatch):
+
+    basedir = str(datafiles)
+    target = os.path.join(basedir, "elements", "target.bst")
+    with open(target, "w") as f:
+        f.write("kind: pony\nbuild-depends:\n- elements/onefile.bst\n")
+
+    with make_loader(basedir) as loader:
+        element = loader.load(["elements/target.bst"])[0]
+        assert [dep.element.name for dep in element.dependencies] == ["elements/onefile.bst"]
+
+    # Loading the same target again must not load any file
+    def load_file_no_deps(*args, **kwargs):
+        assert False, "Loaded a file which is in the snapshot"
+
+    with monkeypatch.context() as m:
+        m.setattr(Loader, "_load_file_no_deps", load_file_no_deps)
+
+        with make_loader(basedir) as loader:
+            element = loader.load(["elements/target.bst"])[0]
+
+            assert element.kind == "pony"
+            dep = element.dependencies[0]
+            assert dep.element.name == "elements/onefile.bst"
+            assert dep.element.node.get_str("description") == "This is the pony"
+            assert str(dep.node.get_provenance()) == "elements/target.bst [line 3 column 2]"
+
+    # Modified files are loaded again
+    with open(target, "a") as f:
+        f.write("description: Modified\n")
+
+    with make_loader(basedir) as loader:
+        element = loader.load(["elements/target.bst"])[0]
+        assert element.node.get_str("description") == "Modified"
+
+
+@pytest.mark.datafiles(os.path.join(DATA_DIR, "onefile"))
+def test_load_snapshot_racy_modification(datafiles):
+
+    basedir = str(datafiles)
+    target = os.path.join(basedir, "elements", "target.bst")
+    with open(target, "w") as f:
+        f.write("kind: pony\ndescription: first\n")
+
+    with make_loader(basedir) as loader:
+        element = loader.load(["elements/target.bst"])[0]
+        assert element.node.get_str("description") == "first"
+
+    # Modify the target without changing its size and mtime, as may
+    # happen within the granularity of the mtime of the file
+    st = os.stat(target)
+    with open(target, "w") as f:
+        f.write("kind: pony\ndescription: other\n")
+    os.utime(target, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    with make_loader(basedir) as loader:
+        element = loader.load(["elements/target.bst"])[0]
+        assert element.node.get_str("description") == "other"
+
+
+@pytest.mark.datafiles(os.path.join(DATA_DIR, "onefile"))
+def test_load_snapshot_invalid_value(datafiles):
+
+    basedir = str(datafiles)
+    target = os.path.join(basedir, "elements", "target.bst")
+    with open(target, "w") as f:
+        f.write("kind: pony\nconfig:\n  enabled: pony\n")
+
+    # Invalid values are reported the same way when loaded from a snapshot
+    messages = []
+    for _ in range(2):
+        with make_loader(basedir) as loader:
+            element = loader.load(["elements/target.bst"])[0]
+
+            with pytest.raises(LoadError) as exc:
+                element.node.get_mapping("config").get_bool("enabled")
+
+            assert exc.value.reason == LoadErrorReason.INVALID_DATA
+            messages.append(str(exc.value))
+
+    assert messages[0] == messages[1]
+    assert "'enabled'" in messages[1]
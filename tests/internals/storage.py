@@ -1,4 +1,5 @@
 from contextlib import contextmanager
+import io
 import os
 import pprint
 import shutil
@@ -10,6 +11,7 @@ from typing import List, Optional
 
 import pytest
 
+from buildstream import utils
 from buildstream._cas import CASCache
 from buildstream.storage._casbaseddirectory import CasBasedDirectory
 from buildstream.storage._filebaseddirectory import FileBasedDirectory
@@ -308,6 +310,40 @@ def test_rename(tmpdir, datafiles, backend):
         assert c.isfile("bin2", "hello2")
 
 
+def test_import_file_objects(tmpdir):
+    large_content = os.urandom(2 * 1024 * 1024)
+
+    # Create the same tree on disk for comparison
+    original = os.path.join(str(tmpdir), "original")
+    os.makedirs(os.path.join(original, "dir", "empty"))
+    with open(os.path.join(original, "dir", "small"), "wb") as f:
+        f.write(b"small")
+    with open(os.path.join(original, "large"), "wb") as f:
+        f.write(large_content)
+    os.chmod(os.path.join(original, "large"), 0o755)
+    os.symlink("dir/small", os.path.join(original, "link"))
+
+    entries = [
+        ("./dir/", _FileType.DIRECTORY, None, False),
+        ("dir/empty", _FileType.DIRECTORY, None, False),
+        ("dir/small", _FileType.REGULAR_FILE, io.BytesIO(b"overwritten"), False),
+        ("dir/small", _FileType.REGULAR_FILE, io.BytesIO(b"small"), False),
+        ("large", _FileType.REGULAR_FILE, io.BytesIO(large_content), True),
+        ("link", _FileType.SYMLINK, "dir/small", False),
+    ]
+
+    with setup_backend(CasBasedDirectory, str(tmpdir)) as c:
+        expected = CasBasedDirectory(c.cas_cache)
+        expected.import_files(original)
+
+        c._import_file_objects(entries)
+        assert c._get_digest() == expected._get_digest()
+        assert c.cas_cache.contains_directory(c._get_digest(), with_files=True)
+
+        with pytest.raises(VirtualDirectoryError):
+            c._import_file_objects([("../outside", _FileType.REGULAR_FILE, io.BytesIO(b""), False)])
+
+
 # This is purely for error output; lists relative paths and
 # their digests so differences are human-grokkable
 def list_relative_paths(directory):
@@ -341,3 +377,96 @@ def utime_recursively(directory, time):
 def clear_gitkeeps(directory):
     for f in glob.glob(os.path.join(directory, "**", ".gitkeep"), recursive=True):
         os.remove(f)
+
+
+def test_import_subtree_filter(tmpdir):
+    original = os.path.join(str(tmpdir), "original")
+    for path in ["bin/foo", "include/a/x.h", "include/b.h", "lib/libfoo.so", "lib/pkgconfig/foo.pc"]:
+        os.makedirs(os.path.dirname(os.path.join(original, path)), exist_ok=True)
+        with open(os.path.join(original, path), "w") as f:
+            f.write(path)
+
+    def excluded(path):
+        return path == "include" or path.startswith("include/") or path.startswith("lib/pkgconfig")
+
+    subtrees = {"bin": True, "include": False, "lib": None, "lib/pkgconfig": False}
+    filtered_paths = []
+
+    def filter_callback(path):
+        filtered_paths.append(path)
+        return not excluded(path)
+
+    filter_callback.subtree_filter = subtrees.get
+
+    with setup_backend(CasBasedDirectory, str(tmpdir)) as c:
+        source = CasBasedDirectory(c.cas_cache)
+        source.import_files(original)
+
+        expected = CasBasedDirectory(c.cas_cache)
+        expected_result = expected.import_files(source, filter_callback=lambda path: not excluded(path))
+
+        result = c.import_files(source, filter_callback=filter_callback)
+
+        assert c._get_digest() == expected._get_digest()
+        assert sorted(result.files_written) == sorted(expected_result.files_written) == ["bin/foo", "lib/libfoo.so"]
+
+        # Completely included or excluded subtrees are not filtered per file
+        assert sorted(filtered_paths) == ["bin", "lib", "lib/libfoo.so"]
+
+
+def test_import_lazy_files_written(tmpdir):
+    original = os.path.join(str(tmpdir), "original")
+    for path in ["bin/foo", "lib/libfoo.so", "lib/pkgconfig/foo.pc"]:
+        os.makedirs(os.path.dirname(os.path.join(original, path)), exist_ok=True)
+        with open(os.path.join(original, path), "w") as f:
+            f.write(path)
+
+    with setup_backend(CasBasedDirectory, str(tmpdir)) as c:
+        source = CasBasedDirectory(c.cas_cache)
+        source.import_files(original)
+
+        result = c.import_files(source)
+
+        # Subtrees imported by digest are only listed on demand
+        assert result._written_subtrees
+        assert result._is_written("lib/pkgconfig/foo.pc")
+        assert not result._is_written("lib/pkgconfig")
+        assert not result._is_written("lib/missing")
+
+        assert sorted(result.files_written) == ["bin/foo", "lib/libfoo.so", "lib/pkgconfig/foo.pc"]
+        assert not result._written_subtrees
+
+
+# A stand-in for a written subtree, which only lists its files
+class DummySubtree:
+    def __init__(self, paths):
+        self.paths = paths
+
+    def _list_file_paths(self):
+        return iter(self.paths)
+
+    def exists(self, *components):
+        return os.path.join(*components) in self.paths
+
+    def isdir(self, *components):
+        return False
+
+
+def test_assign_files_written():
+    result = utils.FileListResult()
+    result.files_written.append("bin/foo")
+    result._add_written_subtree("lib", DummySubtree(["libfoo.so"]))
+    result.files_written.append("share/foo")
+
+    # Extending the list expands the written subtrees first
+    result.files_written += ["etc/foo.conf"]
+    assert result.files_written == ["bin/foo", "lib/libfoo.so", "share/foo", "etc/foo.conf"]
+    assert result._is_written("etc/foo.conf")
+
+    # Assigning replaces the files written, including the subtrees
+    result._add_written_subtree("include", DummySubtree(["foo.h"]))
+    result.files_written = ["bin/bar"]
+    assert result.files_written == ["bin/bar"]
+    assert result._is_written("bin/bar")
+    assert not result._is_written("include/foo.h")
+    assert not result._is_written("bin/foo")
@@ -6,6 +6,7 @@ import pytest
 from buildstream import _yaml, Node, ProvenanceInformation, SequenceNode
 from buildstream.exceptions import LoadErrorReason
 from buildstream._exceptions import LoadError
+from buildstream._yamlcache import YamlCache
 
 
 DATA_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "yaml",)
@@ -61,6 +62,86 @@ def test_element_provenance(datafiles):
     assert_provenance(filename, 5, 2, loaded.get_sequence("moods").scalar_at(1))
 
 
+@pytest.mark.datafiles(os.path.join(DATA_DIR))
+def test_cached_provenance(datafiles, tmpdir):
+
+    filename = os.path.join(datafiles.dirname, datafiles.basename, "basics.yaml")
+    cache_path = os.path.join(str(tmpdir), "yaml-cache")
+
+    cache = YamlCache(cache_path)
+    parsed = _yaml.load(filename, shortname=None, cache=cache)
+    cache.close()
+
+    # Loading from a reopened cache must not parse the file again
+    cache = YamlCache(cache_path)
+    tree, contents = cache.get(filename)
+    assert tree is not None and contents is None
+
+    loaded = _yaml.load(filename, shortname=None, cache=cache)
+    assert loaded.strip_node_info() == parsed.strip_node_info()
+    assert_provenance(filename, 1, 0, loaded)
+    assert_provenance(filename, 5, 2, loaded.get_sequence("moods").scalar_at(1))
+
+    # Modified files are parsed again
+    with open(filename, "a") as f:
+        f.write("extra: value\n")
+    loaded = _yaml.load(filename, shortname=None, cache=cache)
+    assert loaded.get_str("extra") == "value"
+    cache.close()
+
+
+def test_cached_racy_modification(tmpdir):
+
+    filename = os.path.join(str(tmpdir), "racy.yaml")
+    cache_path = os.path.join(str(tmpdir), "yaml-cache")
+    with open(filename, "w") as f:
+        f.write("kind: pony\n")
+
+    cache = YamlCache(cache_path)
+    assert _yaml.load(filename, shortname=None, cache=cache).get_str("kind") == "pony"
+    cache.close()
+
+    # Modify the file without changing its size and mtime, as may
+    # happen within the granularity of the mtime of the file
+    st = os.stat(filename)
+    with open(filename, "w") as f:
+        f.write("kind: mule\n")
+    os.utime(filename, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    cache = YamlCache(cache_path)
+    assert _yaml.load(filename, shortname=None, cache=cache).get_str("kind") == "mule"
+    cache.close()
+
+
+@pytest.mark.datafiles(os.path.join(DATA_DIR))
+def test_cached_prefetch(datafiles, tmpdir):
+
+    directory = os.path.join(datafiles.dirname, datafiles.basename)
+    filenames = [os.path.join(directory, name) for name in ("basics.yaml", "composite.yaml", "missing.yaml")]
+
+    cache = YamlCache(os.path.join(str(tmpdir), "yaml-cache"))
+    cache.prefetch(filenames)
+
+    loaded = _yaml.load(filenames[0], shortname=None, cache=cache)
+    assert loaded.get_str("kind") == "pony"
+    assert_provenance(filenames[0], 1, 0, loaded)
+
+    # Errors are reported when loading the file
+    with pytest.raises(LoadError) as exc:
+        _yaml.load(filenames[2], shortname=None, cache=cache)
+    assert exc.value.reason == LoadErrorReason.MISSING_FILE
+
+    # Prefetched files are kept while the threads are suspended
+    cache.suspend_prefetch()
+    assert filenames[1] in cache._prefetched
+
+    # Files which were prefetched but not loaded are discarded
+    cache.finish_prefetch()
+    assert not cache._prefetched
+
+    cache.close()
+
+
 @pytest.mark.datafiles(os.path.join(DATA_DIR))
 def test_mapping_validate_keys(datafiles):
 
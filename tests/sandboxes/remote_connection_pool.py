@@ -0,0 +1,119 @@
+# Pylint doesn't play well with fixtures and dependency injection from pytest
+# pylint: disable=redefined-outer-name
+
+from concurrent import futures
+
+import grpc
+import pytest
+
+from buildstream._exceptions import CASRemoteError, SandboxError
+from buildstream._protos.build.bazel.remote.execution.v2 import remote_execution_pb2, remote_execution_pb2_grpc
+from buildstream.sandbox import _sandboxremote
+from buildstream.sandbox._sandboxremote import _RemoteConnectionPool, close_connection_pool, get_connection_pool
+
+
+# A stand-in action cache service, which only knows a single action
+class ActionCacheServicer(remote_execution_pb2_grpc.ActionCacheServicer):
+    def __init__(self):
+        self.action_digest = remote_execution_pb2.Digest(hash="a" * 64, size_bytes=1)
+        self.action_result = remote_execution_pb2.ActionResult(exit_code=42)
+
+    def GetActionResult(self, request, context):
+        if request.action_digest != self.action_digest:
+            context.abort(grpc.StatusCode.NOT_FOUND, "Action not found")
+        return self.action_result
+
+
+@pytest.fixture
+def action_cache_url():
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=1))
+    remote_execution_pb2_grpc.add_ActionCacheServicer_to_server(ActionCacheServicer(), server)
+    port = server.add_insecure_port("localhost:0")
+    server.start()
+    try:
+        yield "http://localhost:{}".format(port)
+    finally:
+        server.stop(None)
+
+
+def test_connection_pool_reuses_channels(action_cache_url):
+    pool = _RemoteConnectionPool()
+    request = remote_execution_pb2.GetActionResultRequest(
+        action_digest=remote_execution_pb2.Digest(hash="a" * 64, size_bytes=1)
+    )
+
+    try:
+        results = []
+        for _ in range(3):
+            channel = pool.get_channel("action-cache-service", {"url": action_cache_url})
+            results.append(remote_execution_pb2_grpc.ActionCacheStub(channel).GetActionResult(request).exit_code)
+
+        assert results == [42, 42, 42]
+        assert (pool.opened, pool.reused) == (1, 2)
+
+        # A discarded channel is set up again on the next use, such that retries work
+        pool.discard_channel(channel)
+        channel = pool.get_channel("action-cache-service", {"url": action_cache_url})
+        assert remote_execution_pb2_grpc.ActionCacheStub(channel).GetActionResult(request).exit_code == 42
+        assert (pool.opened, pool.reused) == (2, 2)
+    finally:
+        pool.close()
+
+
+# A stand-in for CASRemote, which does not need buildbox-casd
+class DummyCASRemote:
+    def __init__(self, spec, cascache):
+        self.closed = False
+
+    def init(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def test_connection_pool_discards_failed_cas_remotes(monkeypatch):
+    monkeypatch.setattr(_sandboxremote, "CASRemote", DummyCASRemote)
+    pool = _RemoteConnectionPool()
+
+    with pool.cas_remote("spec", "cascache") as casremote:
+        pass
+    with pool.cas_remote("spec", "cascache") as reused:
+        assert reused is casremote
+
+    # A remote which failed is set up again on the next use
+    with pytest.raises(CASRemoteError):
+        with pool.cas_remote("spec", "cascache"):
+            raise CASRemoteError("Failed to download blob")
+    assert casremote.closed
+
+    with pool.cas_remote("spec", "cascache") as casremote:
+        assert not casremote.closed
+    assert (pool.opened, pool.reused) == (2, 2)
+
+    pool.close()
+    assert casremote.closed
+
+
+def test_connection_pool_per_process():
+    pool = get_connection_pool()
+    assert get_connection_pool() is pool
+
+    # The pool of a parent process is never used after a fork
+    pool.pid = -1
+    assert get_connection_pool() is not pool
+
+    pool = get_connection_pool()
+    close_connection_pool()
+    assert get_connection_pool() is not pool
+
+
+@pytest.mark.parametrize(
+    "url,error",
+    [("http://localhost", "port number in the action-cache-service url"), ("ftp://localhost:1234", "'ftp'")],
+)
+def test_connection_pool_invalid_url(url, error):
+    pool = _RemoteConnectionPool()
+    with pytest.raises(SandboxError, match=error):
+        pool.get_channel("action-cache-service", {"url": url})
+    assert pool.opened == 0
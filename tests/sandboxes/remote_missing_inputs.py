@@ -0,0 +1,143 @@
+# Pylint doesn't play well with fixtures and dependency injection from pytest
+# pylint: disable=redefined-outer-name
+
+from concurrent import futures
+from contextlib import contextmanager
+
+import grpc
+import pytest
+
+from buildstream._exceptions import SandboxError
+from buildstream._protos.build.bazel.remote.execution.v2 import remote_execution_pb2, remote_execution_pb2_grpc
+from buildstream._protos.google.longrunning import operations_pb2
+from buildstream._protos.google.rpc import code_pb2
+from buildstream.sandbox import _sandboxremote
+from buildstream.sandbox._sandboxremote import SandboxRemote, _RemoteConnectionPool
+
+
+# A stand-in execution service, which rejects the Execute calls
+# with FAILED_PRECONDITION until the complete input root was uploaded
+class ExecutionServicer(remote_execution_pb2_grpc.ExecutionServicer):
+    def __init__(self, uploads):
+        self.uploads = uploads
+        self.executed = 0
+
+    def Execute(self, request, context):
+        self.executed += 1
+        if not any(self.uploads):
+            context.abort(grpc.StatusCode.FAILED_PRECONDITION, "Blobs of the input root are missing")
+
+        operation = operations_pb2.Operation(name="operation", done=True)
+        operation.response.Pack(
+            remote_execution_pb2.ExecuteResponse(
+                status={"code": code_pb2.OK}, result=remote_execution_pb2.ActionResult(exit_code=0)
+            )
+        )
+        yield operation
+
+
+class DummyMessenger:
+    @contextmanager
+    def timed_activity(self, *args, **kwargs):
+        yield
+
+
+class DummyCASCache:
+    def __init__(self):
+        self.forgotten = 0
+
+    def forget_remote_blobs(self, remote):
+        self.forgotten += 1
+
+
+class DummyContext:
+    def __init__(self):
+        self.messenger = DummyMessenger()
+        self.cascache = DummyCASCache()
+
+    def get_cascache(self):
+        return self.cascache
+
+
+# A stand-in for CASRemote, which does not need buildbox-casd
+class DummyCASRemote:
+    def __init__(self, spec, cascache):
+        pass
+
+    def init(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def execution_service():
+    # Whether each upload of the input root was complete
+    uploads = []
+    servicer = ExecutionServicer(uploads)
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=1))
+    remote_execution_pb2_grpc.add_ExecutionServicer_to_server(servicer, server)
+    port = server.add_insecure_port("localhost:0")
+    server.start()
+    try:
+        yield servicer, "http://localhost:{}".format(port)
+    finally:
+        server.stop(None)
+
+
+def create_sandbox(monkeypatch, url, uploads):
+    context = DummyContext()
+
+    # Only set up what is needed to upload the input root and run the action
+    sandbox = SandboxRemote.__new__(SandboxRemote)
+    sandbox.exec_url = url
+    sandbox.exec_service = {"url": url}
+    sandbox.exec_instance = None
+    sandbox.storage_remote_spec = "storage"
+    sandbox.operation_name = None
+
+    def upload_input_root(casremote, action, action_digest, *, complete=False):
+        uploads.append(complete)
+
+    monkeypatch.setattr(_sandboxremote, "CASRemote", DummyCASRemote)
+    monkeypatch.setattr(sandbox, "_get_context", lambda: context)
+    monkeypatch.setattr(sandbox, "_get_element_name", lambda: "element.bst")
+    monkeypatch.setattr(sandbox, "_upload_input_root", upload_input_root)
+    return sandbox, context
+
+
+def test_execute_failed_precondition_uploads_complete_input_root(monkeypatch, execution_service):
+    servicer, url = execution_service
+    sandbox, context = create_sandbox(monkeypatch, url, servicer.uploads)
+    pool = _RemoteConnectionPool()
+
+    try:
+        operation = sandbox._upload_and_run_action(pool, remote_execution_pb2.Action(), remote_execution_pb2.Digest())
+    finally:
+        pool.close()
+
+    # The pruned upload was rejected, the complete upload was executed
+    assert servicer.uploads == [False, True]
+    assert servicer.executed == 2
+    assert context.cascache.forgotten == 1
+    assert sandbox._extract_action_result(operation).exit_code == 0
+
+
+def test_execute_failed_precondition_is_retried_once(monkeypatch, execution_service):
+    servicer, url = execution_service
+    sandbox, context = create_sandbox(monkeypatch, url, servicer.uploads)
+    pool = _RemoteConnectionPool()
+
+    # The complete upload is not recorded, such that the server keeps failing
+    monkeypatch.setattr(sandbox, "_upload_input_root", lambda *args, **kwargs: None)
+
+    try:
+        with pytest.raises(SandboxError) as exc:
+            sandbox._upload_and_run_action(pool, remote_execution_pb2.Action(), remote_execution_pb2.Digest())
+    finally:
+        pool.close()
+
+    assert exc.value.reason == "missing-inputs"
+    assert servicer.executed == 2
+    assert context.cascache.forgotten == 1
@@ -1137,3 +1137,49 @@ def test_overwrite_rogue_tag_multiple_remotes(cli, tmpdir, datafiles):
 
     result = cli.run(project=project, args=["build", "target.bst"])
     result.assert_success()
+
+
+@pytest.mark.skipif(HAVE_GIT is False, reason="git is not available")
+@pytest.mark.datafiles(os.path.join(DATA_DIR, "template"))
+def test_object_pool(cli, tmpdir, datafiles):
+    project = str(datafiles)
+    checkoutdir = os.path.join(str(tmpdir), "checkout")
+
+    # Create a repository and a fork of it with an additional commit
+    repo = create_repo("git", str(tmpdir), "upstream")
+    ref = repo.create(os.path.join(project, "repofiles"))
+    fork = create_repo("git", str(tmpdir), "fork")
+    shutil.rmtree(fork.repo)
+    shutil.copytree(repo.repo, fork.repo)
+    forkfile = os.path.join(str(tmpdir), "forkfile.txt")
+    with open(forkfile, "w") as f:
+        f.write("fork\n")
+    fork_ref = fork.add_file(forkfile)
+
+    for name, source_repo, source_ref in [("upstream.bst", repo, ref), ("fork.bst", fork, fork_ref)]:
+        config = source_repo.source_config(ref=source_ref)
+        config["object-pool"] = "shared"
+        generate_element(project, name, {"kind": "import", "sources": [config]})
+
+    result = cli.run(project=project, args=["source", "fetch", "upstream.bst", "fork.bst"])
+    result.assert_success()
+
+    # Both mirrors use the object pool as alternate object store
+    mirror_dir = os.path.join(cli.directory, "sources", "git")
+    pool_objects = os.path.join(mirror_dir, "object-pools", "shared", "objects")
+    mirrors = [entry for entry in os.listdir(mirror_dir) if entry != "object-pools"]
+    assert len(mirrors) == 2
+    for mirror in mirrors:
+        with open(os.path.join(mirror_dir, mirror, "objects", "info", "alternates")) as f:
+            assert f.read().splitlines() == [pool_objects]
+
+    # Both commits are found in the object pool
+    for commit in [ref, fork_ref]:
+        assert subprocess.call(["git", "cat-file", "-e", commit], cwd=os.path.dirname(pool_objects)) == 0
+
+    result = cli.run(project=project, args=["build", "fork.bst"])
+    result.assert_success()
+    result = cli.run(project=project, args=["artifact", "checkout", "fork.bst", "--directory", checkoutdir])
+    result.assert_success()
+    assert os.path.exists(os.path.join(checkoutdir, "file.txt"))
+    assert os.path.exists(os.path.join(checkoutdir, "forkfile.txt"))
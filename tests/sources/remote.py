@@ -7,7 +7,7 @@ import pytest
 
 from buildstream import utils
 from buildstream.testing import ErrorDomain
-from buildstream.testing import generate_project
+from buildstream.testing import generate_project, generate_element
 from buildstream.testing import cli  # pylint: disable=unused-import
 from tests.testutils.file_server import create_file_server
 
@@ -179,3 +179,39 @@ def test_use_netrc(cli, datafiles, server_type, tmpdir):
 
         checkout_file = os.path.join(checkoutdir, "file")
         assert os.path.exists(checkout_file)
+
+
+# Test that interrupted downloads are resumed, and that large files
+# are downloaded correctly in parallel chunks
+@pytest.mark.parametrize("connections", [1, 4])
+@pytest.mark.parametrize("ranges", [True, False], ids=["ranges", "no-ranges"])
+@pytest.mark.parametrize("interruptions", [0, 2])
+def test_fetch_resume(cli, tmpdir, connections, ranges, interruptions):
+    project = os.path.join(str(tmpdir), "project")
+    server_files = os.path.join(str(tmpdir), "file_server")
+    os.makedirs(project)
+    os.makedirs(server_files)
+
+    # Large enough to be downloaded in parallel chunks
+    src_file = os.path.join(server_files, "file")
+    with open(src_file, "wb") as f:
+        f.write(os.urandom(17 * 1024 * 1024))
+
+    with create_file_server("HTTP") as server:
+        server.allow_anonymous(server_files)
+        if ranges:
+            server.allow_ranges()
+        server.interrupt_downloads(interruptions, 1024 * 1024)
+        server.start()
+
+        generate_project(project, {"aliases": {"tmpdir": server.base_url()}})
+        element = {
+            "kind": "import",
+            "sources": [{"kind": "remote", "url": "tmpdir:/file", "ref": utils.sha256sum(src_file)}],
+        }
+        generate_element(project, "target.bst", element)
+
+        cli.configure({"scheduler": {"download-connections": connections}})
+        result = cli.run(project=project, args=["source", "fetch", "target.bst"])
+        result.assert_success()
+        assert cli.get_element_state(project, "target.bst") == "buildable"
@@ -51,6 +51,55 @@ class RequestHandler(SimpleHTTPRequestHandler):
         if self.command != "HEAD" and body:
             self.wfile.write(body)
 
+    # Length of the requested range, None for the whole file
+    range_length = None
+
+    def end_headers(self):
+        if self.server.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        super().end_headers()
+
+    def send_head(self):
+        self.range_length = None
+        byte_range = self.headers.get("Range")
+        if not self.server.ranges or not byte_range or not byte_range.startswith("bytes="):
+            return super().send_head()
+
+        path = self.translate_path(self.path)
+        try:
+            f = open(path, "rb")
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+
+        size = os.fstat(f.fileno()).st_size
+        start, end = byte_range[len("bytes=") :].split("-")
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+        self.range_length = end - start + 1
+
+        self.send_response(HTTPStatus.PARTIAL_CONTENT)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Range", "bytes {}-{}/{}".format(start, end, size))
+        self.send_header("Content-Length", str(self.range_length))
+        self.end_headers()
+        f.seek(start)
+        return f
+
+    def copyfile(self, source, outputfile):
+        length = self.range_length
+
+        # Simulate a dropped connection
+        if self.server.interruptions > 0:
+            self.server.interruptions -= 1
+            length = self.server.interrupt_after if length is None else min(length, self.server.interrupt_after)
+            self.close_connection = True
+
+        if length is None:
+            super().copyfile(source, outputfile)
+        else:
+            outputfile.write(source.read(length))
+
     def do_GET(self):
         try:
             super().do_GET()
@@ -77,6 +126,9 @@ class AuthHTTPServer(HTTPServer):
         self.users = {}
         self.anonymous_dir = None
         self.realm = "Realm"
+        self.ranges = False
+        self.interruptions = 0
+        self.interrupt_after = 0
         super().__init__(*args, **kwargs)
 
 
@@ -105,5 +157,15 @@ class SimpleHttpServer(multiprocessing.Process):
     def add_user(self, user, password, cwd):
         self.server.users[user] = (password, cwd)
 
+    # Serve ranged requests
+    def allow_ranges(self):
+        self.server.ranges = True
+
+    # Close the connection after sending `after` bytes of the
+    # body of the next `count` responses
+    def interrupt_downloads(self, count, after):
+        self.server.interruptions = count
+        self.server.interrupt_after = after
+
     def base_url(self):
         return "http://127.0.0.1:{}".format(self.server.server_port)